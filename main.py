@@ -1,7 +1,7 @@
 import sys
+from socless_repo_updater.discovery import discover_socless_repos
 from socless_repo_updater.updater import SoclessUpdater
 
-
 if __name__ == "__main__":
     repo_urls = sys.argv[1:]
 
@@ -22,7 +22,12 @@ if __name__ == "__main__":
             "Please edit `main.py` and supply the requested dependencies to update"
         )
 
-    updater = SoclessUpdater().update_with_regular_github(
+    updater = SoclessUpdater()
+
+    # OR update every SOCless repo of an org (or user) as they are discovered
+    # repo_urls = discover_socless_repos(updater.get_or_init_github(), "my-org")
+
+    updater.update_with_regular_github(
         repo_urls,
         pj_deps=pj_deps,
         socless_python_version=socless_python_version,
@@ -15,4 +15,7 @@ setup(
         "ruamel.yaml==0.17.4",
         "pygithub==1.55",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+    },
 )
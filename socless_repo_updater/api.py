@@ -6,4 +6,6 @@ from socless_repo_parser import (  # noqa
     get_github_domain,  # noqa
 )
 
+from socless_repo_updater.discovery import RepoFilter, discover_socless_repos  # noqa
+from socless_repo_updater.results import CallbackSink, JsonlSink, RepoResult  # noqa
 from socless_repo_updater.updater import SoclessUpdater  # noqa
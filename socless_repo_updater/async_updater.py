@@ -0,0 +1,393 @@
+"""asyncio engine for updating many repos without a thread per repo.
+
+Requires the optional `aiohttp` dependency:
+`pip install "socless_repo_updater[async]"`
+"""
+
+import asyncio
+import base64
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from github import GithubException
+from socless_repo_updater.cache import HttpCache
+from socless_repo_updater.exceptions import UpdaterError
+from socless_repo_updater.file_types.handlers import (
+    get_requested_handlers,
+    make_update_spec,
+)
+from socless_repo_updater.metrics import ApiMetrics
+from socless_repo_updater.scheduler import RateLimitScheduler, make_budget_key
+from socless_repo_updater.utils import make_branch_name
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+NEXT_PAGE_PATTERN = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+
+def require_aiohttp():
+    if aiohttp is None:
+        raise UpdaterError(
+            'The async updater requires aiohttp, install with `pip install "socless_repo_updater[async]"`'
+        )
+
+
+@dataclass
+class AsyncPullRequest:
+    """The parts of a pull request payload the updater reports on."""
+
+    number: int
+    html_url: str
+    raw_data: dict = field(repr=False, default_factory=dict)
+
+    @classmethod
+    def from_json(cls, data: dict) -> "AsyncPullRequest":
+        return cls(number=data["number"], html_url=data["html_url"], raw_data=data)
+
+
+@dataclass
+class AsyncContentFile:
+    """Mirror of the `ContentFile` attributes used by the updater."""
+
+    path: str
+    sha: str
+    decoded_content: bytes
+
+
+class AsyncGithubClient:
+    """Minimal async client for the Github REST endpoints `RepoUpdater` needs."""
+
+    def __init__(
+        self,
+        session: "aiohttp.ClientSession",
+        base_url: str = "https://api.github.com",
+        auth_header: Optional[str] = None,
+        user_agent: str = "socless_repo_updater",
+        scheduler: Optional[RateLimitScheduler] = None,
+        http_cache: Optional[HttpCache] = None,
+        metrics: Optional[ApiMetrics] = None,
+    ) -> None:
+        require_aiohttp()
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.http_cache = http_cache
+        self.metrics = metrics
+        self.budget_key = make_budget_key(urlparse(self.base_url).hostname, auth_header)
+        self.headers = {
+            "Accept": "application/vnd.github.v3+json",
+            "User-Agent": user_agent,
+        }
+        if auth_header:
+            self.headers["Authorization"] = auth_header
+
+    async def request(
+        self, verb: str, url: str, params: dict = None, body: dict = None
+    ) -> Tuple[Dict[str, str], Any]:
+        if url.startswith("/"):
+            url = f"{self.base_url}{url}"
+        request_headers = self.headers
+
+        cache_key, cached = None, None
+        if self.http_cache and verb == "GET":
+            full_url = str(URL(url).update_query(params)) if params else url
+            cache_key = HttpCache.make_key(
+                verb,
+                full_url,
+                self.headers.get("Authorization"),
+                self.headers["Accept"],
+            )
+            # sqlite calls block, so they run on the loop's default executor
+            loop = asyncio.get_running_loop()
+            cached = await loop.run_in_executor(None, self.http_cache.lookup, cache_key)
+            if cached:
+                request_headers = {**self.headers, **cached.conditional_headers()}
+
+        attempt = 0
+        while True:
+            await self.scheduler.await_slot(self.budget_key)
+            started = time.perf_counter()
+            async with self.session.request(
+                verb, url, params=params, json=body, headers=request_headers
+            ) as response:
+                status = response.status
+                text = await response.text()
+                headers = {k.lower(): v for k, v in response.headers.items()}
+            if self.metrics:
+                self.metrics.record(
+                    verb,
+                    url,
+                    status,
+                    time.perf_counter() - started,
+                    len(text.encode("utf-8")),
+                    cache_hit=bool(cached) and status == 304,
+                )
+            delay = self.scheduler.observe(
+                self.budget_key, status, headers, text, attempt
+            )
+            if delay is None:
+                break
+            print(
+                f"WARN | rate limited by {self.budget_key[0]} ({status}), retrying {verb} {url} in {delay:.0f}s"
+            )
+            attempt += 1
+
+        if cache_key:
+            cached_response = await loop.run_in_executor(
+                None,
+                self.http_cache.resolve,  # type: ignore
+                cache_key,
+                cached,
+                full_url,
+                status,
+                headers,
+                text,
+            )
+            if cached_response:
+                status, headers, text = (
+                    cached_response.status_code,
+                    cached_response.headers,
+                    cached_response.text,
+                )
+
+        data = json.loads(text) if text else None
+        if status >= 400:
+            raise GithubException(status, data, headers)
+        return headers, data
+
+    async def paginate(self, url: str, params: dict = None) -> List[Any]:
+        items: List[Any] = []
+        next_url: Optional[str] = url
+        while next_url:
+            headers, data = await self.request("GET", next_url, params=params)
+            items.extend(data)
+            match = NEXT_PAGE_PATTERN.search(headers.get("link", ""))
+            next_url = match.group(1) if match else None
+            # the next link already carries the query string
+            params = None
+        return items
+
+    async def get_repo(self, full_name: str) -> dict:
+        _, data = await self.request("GET", f"/repos/{full_name}")
+        return data
+
+    async def get_contents(self, full_name: str, path: str, ref: str) -> dict:
+        _, data = await self.request(
+            "GET", f"/repos/{full_name}/contents/{path}", params={"ref": ref}
+        )
+        return data
+
+    async def get_branch(self, full_name: str, branch: str) -> dict:
+        _, data = await self.request("GET", f"/repos/{full_name}/branches/{branch}")
+        return data
+
+    async def get_git_tree(
+        self, full_name: str, tree_sha: str, recursive: bool = False
+    ) -> dict:
+        params = {"recursive": "1"} if recursive else None
+        _, data = await self.request(
+            "GET", f"/repos/{full_name}/git/trees/{tree_sha}", params=params
+        )
+        return data
+
+    async def create_git_ref(self, full_name: str, ref: str, sha: str) -> dict:
+        _, data = await self.request(
+            "POST", f"/repos/{full_name}/git/refs", body={"ref": ref, "sha": sha}
+        )
+        return data
+
+    async def update_file(
+        self,
+        full_name: str,
+        path: str,
+        message: str,
+        content: str,
+        sha: str,
+        branch: str,
+    ) -> dict:
+        body = {
+            "message": message,
+            "content": base64.b64encode(content.encode("utf-8")).decode("utf-8"),
+            "sha": sha,
+            "branch": branch,
+        }
+        _, data = await self.request(
+            "PUT", f"/repos/{full_name}/contents/{path}", body=body
+        )
+        return data
+
+    async def get_pulls(
+        self, full_name: str, state: str = "open", base: str = "", head: str = ""
+    ) -> List[dict]:
+        params = {"state": state, "sort": "created", "per_page": "100"}
+        if base:
+            params["base"] = base
+        if head:
+            params["head"] = head
+        return await self.paginate(f"/repos/{full_name}/pulls", params=params)
+
+    async def create_pull(
+        self, full_name: str, title: str, body: str, base: str, head: str
+    ) -> dict:
+        _, data = await self.request(
+            "POST",
+            f"/repos/{full_name}/pulls",
+            body={"title": title, "body": body, "base": base, "head": head},
+        )
+        return data
+
+
+class AsyncRepoUpdater:
+    """asyncio counterpart of `RepoUpdater`, sharing the same file transforms."""
+
+    def __init__(
+        self, client: AsyncGithubClient, repo_data: dict, head_branch: str = ""
+    ) -> None:
+        self.client = client
+        self.full_name: str = repo_data["full_name"]
+        self.name: str = repo_data["name"]
+        self.head_branch = head_branch or make_branch_name()
+        self.default_branch: str = repo_data["default_branch"]
+        self.all_prs: List[AsyncPullRequest] = []
+        self.commits_made = 0
+
+    @classmethod
+    async def from_full_name(
+        cls, client: AsyncGithubClient, full_name: str, head_branch: str = ""
+    ) -> "AsyncRepoUpdater":
+        return cls(client, await client.get_repo(full_name), head_branch)
+
+    async def get_github_file(self, file_path, branch_name) -> AsyncContentFile:
+        file_contents = await self.client.get_contents(
+            self.full_name, file_path, branch_name
+        )
+        if isinstance(file_contents, list):
+            raise UpdaterError(
+                f"File path {file_path} branch: {branch_name} points to a directory"
+            )
+        return AsyncContentFile(
+            path=file_contents["path"],
+            sha=file_contents["sha"],
+            decoded_content=base64.b64decode(file_contents["content"]),
+        )
+
+    async def _create_head_branch_if_nonexistent(self):
+        try:
+            _ = await self.client.get_branch(self.full_name, self.head_branch)
+        except GithubException as e:
+            if e.status != 404:
+                raise
+            print(
+                f"Branch {self.head_branch} does not exist on {self.name}. Creating.."
+            )
+            gh_source = await self.client.get_branch(
+                self.full_name, self.default_branch
+            )
+            await self.client.create_git_ref(
+                self.full_name,
+                ref="refs/heads/" + self.head_branch,
+                sha=gh_source["commit"]["sha"],
+            )
+
+    async def update_in_github(
+        self,
+        pj_deps: dict = None,
+        pj_replace_only: bool = True,
+        sls_yml_changes: dict = None,
+        socless_python_version: str = "",
+        requirements_changes: dict = None,
+    ):
+        await self._create_head_branch_if_nonexistent()
+
+        spec = make_update_spec(
+            pj_deps,
+            pj_replace_only,
+            sls_yml_changes,
+            socless_python_version,
+            requirements_changes,
+        )
+        handlers = get_requested_handlers(spec)
+        tree_paths: List[str] = []
+        if any(handler.discovers_files(spec) for handler in handlers):
+            tree_paths = await self.list_files()
+        for handler in handlers:
+            for path in handler.get_paths(spec, tree_paths):
+                gh_file_object = await self.get_github_file(path, self.head_branch)
+                result = handler.transform(gh_file_object.decoded_content, spec)
+                if result:
+                    new_content, commit_message = result
+                    await self._commit_file_helper(
+                        gh_file_object, new_content, commit_message
+                    )
+
+        if self.commits_made:
+            # one head-filtered PR lookup per repo, after every commit has landed
+            self.all_prs.append(await self._get_or_create_pr())
+
+    async def list_files(self) -> List[str]:
+        """Path of every file on the head branch, see `RepoUpdater.list_files`."""
+        tree = await self.client.get_git_tree(
+            self.full_name, self.head_branch, recursive=True
+        )
+        if tree.get("truncated"):
+            print(
+                f"WARN | file tree of {self.full_name} is truncated, some files may not be updated"
+            )
+        return [
+            element["path"] for element in tree["tree"] if element["type"] == "blob"
+        ]
+
+    def report_pr_metrics(self):
+        pr_nums = [x.number for x in self.all_prs]
+        if len(set(pr_nums)) > 1:
+            print(
+                f"DEBUG | PRs not the same, issue with commit logic- {self.name}: {self.all_prs}"
+            )
+        if len(pr_nums) > 0:
+            return {"repo": self.name, "updated": True, "pr": self.all_prs[0]}
+        else:
+            return {"repo": self.name, "updated": False, "pr": False}
+
+    async def _commit_file_helper(
+        self, gh_file_object: AsyncContentFile, new_content: str, commit_message: str
+    ):
+        await self.client.update_file(
+            self.full_name,
+            path=gh_file_object.path,
+            message=commit_message,
+            content=new_content,
+            sha=gh_file_object.sha,
+            branch=self.head_branch,
+        )
+        self.commits_made += 1
+
+    async def _get_or_create_pr(self) -> AsyncPullRequest:
+        owner = self.full_name.split("/")[0]
+        for pull in await self.client.get_pulls(
+            self.full_name,
+            state="open",
+            base=self.default_branch,
+            head=f"{owner}:{self.head_branch}",
+        ):
+            if (
+                pull["base"]["ref"] == self.default_branch
+                and pull["head"]["ref"] == self.head_branch
+            ):
+                print(f"PR already exists: {pull['number']}")
+                return AsyncPullRequest.from_json(pull)
+
+        new_pr = await self.client.create_pull(
+            self.full_name,
+            title="CLI- dependency version bump",
+            body="updating dependencies, please check changed files",
+            base=self.default_branch,
+            head=self.head_branch,
+        )
+        return AsyncPullRequest.from_json(new_pr)
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+DEFAULT_HTTP_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "socless_repo_updater", "http_cache.sqlite3"
+)
+DEFAULT_HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+@dataclass
+class CachedResponse:
+    """A stored response, shaped like the parts of `requests.Response` PyGithub reads."""
+
+    status_code: int
+    headers: Dict[str, str]
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    from_cache: bool = field(default=True, repr=False)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """On-disk cache of Github GET responses, revalidated with conditional requests.
+
+    Entries are keyed by method, URL, Accept header and a hash of the token,
+    so responses are never shared between credentials. A cached entry turns
+    the next request into an `If-None-Match` / `If-Modified-Since` request;
+    Github answers unchanged resources with a 304 that does not count
+    against the rate limit. The least recently used entries are evicted
+    once the cache grows past `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_HTTP_CACHE_PATH,
+        max_bytes: int = DEFAULT_HTTP_CACHE_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._db.commit()
+        self._total_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(
+        verb: str, url: str, auth_header: Optional[str], accept: Optional[str] = None
+    ) -> str:
+        raw = "\n".join([verb.upper(), url, auth_header or "", accept or ""])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, etag, last_modified FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if not row:
+            return None
+        status, headers, body, etag, last_modified = row
+        return CachedResponse(status, json.loads(headers), body, etag, last_modified)
+
+    def store(
+        self, key: str, url: str, status: int, headers: Dict[str, str], body: str
+    ) -> bool:
+        """Store a response if it can be revalidated later, returning whether it was kept."""
+        headers = {k.lower(): v for k, v in headers.items()}
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if status != 200 or not (etag or last_modified):
+            return False
+
+        encoded_headers = json.dumps(headers)
+        size = len(body.encode("utf-8")) + len(encoded_headers) + len(url)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            previous = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    url,
+                    status,
+                    encoded_headers,
+                    body,
+                    etag,
+                    last_modified,
+                    size,
+                    time.time(),
+                ),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._db.commit()
+        return True
+
+    def resolve(
+        self,
+        key: str,
+        cached: Optional[CachedResponse],
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: str,
+    ) -> Optional[CachedResponse]:
+        """Settle a GET sent with `cached.conditional_headers()`.
+
+        Returns the cached response (refreshed with the 304's headers, e.g. the
+        current rate limit) when Github reports it unchanged. Otherwise the new
+        response is stored for next time and None is returned.
+        """
+        if status == 304 and cached:
+            self.record_hit(key)
+            fresh_headers = {k.lower(): v for k, v in headers.items()}
+            fresh_headers.pop("content-length", None)
+            return CachedResponse(
+                status_code=cached.status_code,
+                headers={**cached.headers, **fresh_headers},
+                text=cached.text,
+                etag=cached.etag,
+                last_modified=cached.last_modified,
+            )
+        self.record_miss()
+        self.store(key, url, status, headers, body)
+        return None
+
+    def record_hit(self, key: str):
+        with self._lock:
+            self.hits += 1
+            self._db.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _evict(self):
+        # caller holds self._lock
+        while self._total_bytes > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if not row:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._total_bytes -= row[1]
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
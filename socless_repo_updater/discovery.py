@@ -0,0 +1,148 @@
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from github import Github, GithubException
+from github.Repository import Repository
+from socless_repo_parser.models import RepoMetadata
+from socless_repo_updater.constants import REQUIREMENTS_FULL_PATH, SERVERLESS_YML
+from socless_repo_updater.utils import run_graphql_query
+
+DISCOVERY_BATCH_SIZE = 20
+# a repo is a SOCless repo if its default branch has all of these
+SOCLESS_MARKER_FILES = (SERVERLESS_YML, REQUIREMENTS_FULL_PATH)
+
+
+@dataclass
+class RepoFilter:
+    """Which of an owner's repos are worth checking for SOCless marker files."""
+
+    include_archived: bool = False
+    include_forks: bool = False
+    # if set, a repo needs at least one of these topics
+    topics: Tuple[str, ...] = ()
+
+    def matches(self, gh_repo: Repository) -> bool:
+        if gh_repo.archived and not self.include_archived:
+            return False
+        if gh_repo.fork and not self.include_forks:
+            return False
+        if self.topics and not set(self.topics) & set(get_repo_topics(gh_repo)):
+            return False
+        return True
+
+
+def get_repo_topics(gh_repo: Repository) -> List[str]:
+    # repo listings include topics, but PyGithub doesn't expose them
+    topics = gh_repo._rawData.get("topics")  # type: ignore
+    if topics is None:
+        # older GHE versions leave them out
+        topics = gh_repo.get_topics()
+    return topics
+
+
+def iter_owner_repos(gh: Github, owner: str) -> Iterator[Repository]:
+    """Every repo of an organization or user, one REST page at a time."""
+    try:
+        repos = gh.get_organization(owner).get_repos(type="all")
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        # not an organization
+        repos = gh.get_user(owner).get_repos()
+    yield from repos
+
+
+def build_marker_query(
+    full_names: List[str], file_paths: tuple = SOCLESS_MARKER_FILES
+) -> str:
+    repo_queries = []
+    for repo_index, full_name in enumerate(full_names):
+        owner, name = full_name.split("/")
+        file_queries = [
+            f"f{file_index}: object(expression: {json.dumps('HEAD:' + path)}) {{ ... on Blob {{ oid }} }}"
+            for file_index, path in enumerate(file_paths)
+        ]
+        repo_queries.append(
+            f"r{repo_index}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{ {' '.join(file_queries)} }}"
+        )
+    return "query {\n  " + "\n  ".join(repo_queries) + "\n}"
+
+
+def has_marker_files(
+    gh_repo: Repository, file_paths: tuple = SOCLESS_MARKER_FILES
+) -> bool:
+    """REST fallback for `filter_socless_repos`, one request per file."""
+    for path in file_paths:
+        try:
+            gh_repo.get_contents(path)
+        except GithubException as e:
+            if e.status == 404:
+                return False
+            raise
+    return True
+
+
+def filter_socless_repos(
+    gh: Github, gh_repos: List[Repository], file_paths: tuple = SOCLESS_MARKER_FILES
+) -> List[Repository]:
+    """The repos with every marker file, checked with one GraphQL query."""
+    try:
+        data = run_graphql_query(
+            gh, build_marker_query([repo.full_name for repo in gh_repos], file_paths)
+        )
+    except Exception as e:
+        print(
+            f"ERROR | marker file query failed for {len(gh_repos)} repos, falling back - {e}"
+        )
+        return [repo for repo in gh_repos if has_marker_files(repo, file_paths)]
+
+    socless_repos = []
+    for repo_index, gh_repo in enumerate(gh_repos):
+        repo_data: Dict[str, dict] = data.get(f"r{repo_index}") or {}
+        if all(repo_data.get(f"f{index}") for index in range(len(file_paths))):
+            socless_repos.append(gh_repo)
+    return socless_repos
+
+
+def discover_socless_repos(
+    gh: Github,
+    owners: Union[str, Iterable[str]],
+    repo_filter: RepoFilter = None,
+    batch_size: int = DISCOVERY_BATCH_SIZE,
+) -> Iterator[RepoMetadata]:
+    """Lazily yield every SOCless repo of `owners` on the host `gh` talks to.
+
+    Repos are listed page by page, and each `batch_size` repos that pass
+    `repo_filter` are checked for `SOCLESS_MARKER_FILES` in one GraphQL
+    query, so the updater can start on the first repos while later pages
+    are still being listed. Pass the generator as an updater's `repo_list`.
+    """
+    repo_filter = repo_filter or RepoFilter()
+    if isinstance(owners, str):
+        owners = [owners]
+
+    listed = found = 0
+    batch: List[Repository] = []
+    for owner in owners:
+        for gh_repo in iter_owner_repos(gh, owner):
+            listed += 1
+            if not repo_filter.matches(gh_repo):
+                continue
+            batch.append(gh_repo)
+            if len(batch) < batch_size:
+                continue
+            for socless_repo in filter_socless_repos(gh, batch):
+                found += 1
+                yield make_repo_metadata(socless_repo)
+            batch = []
+    if batch:
+        for socless_repo in filter_socless_repos(gh, batch):
+            found += 1
+            yield make_repo_metadata(socless_repo)
+    print(f"INFO | discovered {found} SOCless repos out of {listed} listed")
+
+
+def make_repo_metadata(gh_repo: Repository) -> RepoMetadata:
+    return RepoMetadata(
+        url=gh_repo.html_url, name=gh_repo.name, org=gh_repo.owner.login
+    )
@@ -4,3 +4,11 @@ class VersionUpdateException(Exception):
 
 class UpdaterError(Exception):
     pass
+
+
+class PlanConflictError(UpdaterError):
+    pass
+
+
+class GitMirrorError(UpdaterError):
+    pass
@@ -0,0 +1,223 @@
+import json
+import posixpath
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from github.ContentFile import ContentFile
+from socless_repo_updater.constants import (
+    PACKAGE_JSON,
+    REQUIREMENTS_FULL_PATH,
+    REQUIREMENTS_TXT_PATTERN,
+    SERVERLESS_YML,
+)
+from socless_repo_updater.file_types.package_json import (
+    apply_dependency_changes,
+    get_dependency_changes,
+    patch_package_json_text,
+)
+from socless_repo_updater.file_types.requirements_txt import (
+    SOCLESS_PYTHON_PACKAGE,
+    get_requirements_update,
+    update_requirements,
+)
+from socless_repo_updater.file_types.serverless_yml import (
+    load_serverless_yml,
+    patch_serverless_yml_document,
+)
+from socless_repo_updater.fingerprint import (
+    FINGERPRINTS,
+    make_fingerprint,
+    make_target_key,
+)
+from socless_repo_updater.models import RepoFile
+
+# (current file contents, campaign spec) -> (new contents, commit message), or None if current
+Transform = Callable[[bytes, dict], Optional[Tuple[str, str]]]
+
+# the campaign arguments that decide what each file should look like
+UPDATE_SPEC_KEYS = (
+    "pj_deps",
+    "pj_replace_only",
+    "sls_yml_changes",
+    "socless_python_version",
+    "requirements_changes",
+)
+
+
+def make_update_spec(
+    pj_deps: dict = None,
+    pj_replace_only: bool = True,
+    sls_yml_changes: dict = None,
+    socless_python_version: str = "",
+    requirements_changes: dict = None,
+) -> dict:
+    return dict(
+        pj_deps=pj_deps,
+        pj_replace_only=pj_replace_only,
+        sls_yml_changes=sls_yml_changes,
+        socless_python_version=socless_python_version,
+        requirements_changes=requirements_changes,
+    )
+
+
+@dataclass(frozen=True)
+class FileHandler:
+    """How one managed file is updated.
+
+    `transform` is pure CPU work (parse, update, compare) so it can run in
+    its own pool, apart from the network I/O that fetches and commits files.
+    It should be a module level function so process pools can pickle it.
+    """
+
+    path: str
+    # the campaign argument that turns this handler on, e.g. `pj_deps`
+    spec_key: str
+    transform: Transform
+    # basename glob of more files to update anywhere in the repo tree, e.g. `requirements*.txt`
+    pattern: str = ""
+    # the campaign argument that turns this handler on for every file matching `pattern`
+    pattern_spec_key: str = ""
+
+    def is_requested(self, spec: dict) -> bool:
+        return bool(spec.get(self.spec_key)) or self.discovers_files(spec)
+
+    def discovers_files(self, spec: dict) -> bool:
+        return bool(self.pattern and spec.get(self.pattern_spec_key))
+
+    def matches(self, file_path: str) -> bool:
+        return bool(self.pattern) and fnmatch(
+            posixpath.basename(file_path), self.pattern
+        )
+
+    def get_paths(self, spec: dict, tree_paths: List[str]) -> List[str]:
+        """The files to update in a repo whose tree has `tree_paths`."""
+        paths = [self.path] if spec.get(self.spec_key) else []
+        if self.discovers_files(spec):
+            paths += [
+                path for path in tree_paths if path not in paths and self.matches(path)
+            ]
+        return paths
+
+
+def transform_package_json(content: bytes, spec: dict) -> Optional[Tuple[str, str]]:
+    pj_replace_only = spec.get("pj_replace_only", True)
+    target_key = make_target_key(PACKAGE_JSON, [spec["pj_deps"], pj_replace_only])
+    if FINGERPRINTS.is_known_current(content, target_key):
+        print("No changes made, package.json dependencies are current.")
+        return None
+
+    text = content.decode("utf-8") if isinstance(content, bytes) else content
+    as_json = json.loads(text)
+    current_fingerprint = FINGERPRINTS.remember(content, make_fingerprint(as_json))
+    changes = get_dependency_changes(as_json, spec["pj_deps"], pj_replace_only)
+    new_package_json = apply_dependency_changes(as_json, changes)
+    # updating is idempotent, so the result is in the target state
+    new_fingerprint = make_fingerprint(new_package_json)
+    FINGERPRINTS.mark_current(target_key, new_fingerprint)
+
+    if new_fingerprint == current_fingerprint:
+        print("No changes made, package.json dependencies are current.")
+        return None
+
+    # only the changed versions are rewritten, the rest of the file is kept byte for byte
+    new_content = patch_package_json_text(text, changes)
+    if new_content is None:
+        new_content = json.dumps(new_package_json, indent=2)
+    # so a later run over the file written here doesn't parse it again
+    FINGERPRINTS.remember(new_content, new_fingerprint)
+    updated = {name: None for versions in changes.values() for name in versions}
+    return new_content, "updating versions for: " + " ".join(updated)
+
+
+def transform_serverless_yml(content: bytes, spec: dict) -> Optional[Tuple[str, str]]:
+    sls_yml_changes = spec["sls_yml_changes"]
+    target_key = make_target_key(SERVERLESS_YML, sls_yml_changes)
+    if FINGERPRINTS.is_known_current(content, target_key):
+        print("No changes made, serverless.yml files are the same.")
+        return None
+
+    text = content.decode("utf-8") if isinstance(content, bytes) else content
+    document = load_serverless_yml(text)
+    current_fingerprint = FINGERPRINTS.remember(content, make_fingerprint(document))
+    new_content = patch_serverless_yml_document(text, document, sls_yml_changes)
+
+    if new_content is None:
+        FINGERPRINTS.mark_current(target_key, current_fingerprint)
+        print("No changes made, serverless.yml files are the same.")
+        return None
+    # `document` was merged in place, merging is idempotent and `new_content` parses to it
+    new_fingerprint = make_fingerprint(document)
+    FINGERPRINTS.mark_current(target_key, new_fingerprint)
+    FINGERPRINTS.remember(new_content, new_fingerprint)
+
+    return (
+        new_content,
+        f"updating serverless.yml with: {json.dumps(sls_yml_changes)}",
+    )
+
+
+def get_requirements_versions(spec: dict) -> Dict[str, str]:
+    versions = dict(spec.get("requirements_changes") or {})
+    if spec.get("socless_python_version"):
+        versions[SOCLESS_PYTHON_PACKAGE] = spec["socless_python_version"]
+    return versions
+
+
+def transform_requirements_txt(content: bytes, spec: dict) -> Optional[Tuple[str, str]]:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    result = update_requirements(
+        content, get_requirements_update(get_requirements_versions(spec))
+    )
+
+    if result is None:
+        print("No changes made, requirements.txt files are the same.")
+        return None
+
+    new_requirements, updated_packages = result
+    if updated_packages == [SOCLESS_PYTHON_PACKAGE] and spec.get(
+        "socless_python_version"
+    ):
+        message = f"updating requirements.txt to socless_python v{spec['socless_python_version']}"
+    else:
+        message = "updating requirements.txt versions for: " + " ".join(
+            updated_packages
+        )
+    return new_requirements.decode("utf-8"), message
+
+
+FetchedFile = Tuple[FileHandler, Union[RepoFile, ContentFile]]
+
+
+def run_transforms(
+    contents: List[Tuple[FileHandler, bytes]], spec: dict
+) -> List[Optional[Tuple[str, str]]]:
+    return [handler.transform(content, spec) for handler, content in contents]
+
+
+FILE_HANDLERS: Dict[str, FileHandler] = {}
+
+
+def register_file_handler(handler: FileHandler) -> FileHandler:
+    """Add (or replace) the handler for `handler.path`. Handlers run in registration order."""
+    FILE_HANDLERS[handler.path] = handler
+    return handler
+
+
+def get_requested_handlers(spec: dict) -> List[FileHandler]:
+    return [handler for handler in FILE_HANDLERS.values() if handler.is_requested(spec)]
+
+
+register_file_handler(FileHandler(PACKAGE_JSON, "pj_deps", transform_package_json))
+register_file_handler(
+    FileHandler(SERVERLESS_YML, "sls_yml_changes", transform_serverless_yml)
+)
+register_file_handler(
+    FileHandler(
+        REQUIREMENTS_FULL_PATH,
+        "socless_python_version",
+        transform_requirements_txt,
+        pattern=REQUIREMENTS_TXT_PATTERN,
+        pattern_spec_key="requirements_changes",
+    )
+)
@@ -1,15 +1,152 @@
-from copy import deepcopy
+import json
+import re
+from json.decoder import scanstring
+from typing import Dict, List, Optional, Tuple
 
+# sections `pj_deps` versions are set in, new dependencies go in the first
+DEPENDENCY_SECTIONS = ("dependencies", "devDependencies", "peerDependencies")
 
-def update_package_json_contents(
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+json_decoder = json.JSONDecoder()
+
+
+def get_dependency_changes(
     package_json: dict,
     pj_deps: dict,
     pj_replace_only: bool = True,
-) -> dict:
-    new_package_json = deepcopy(package_json)
+) -> Dict[str, Dict[str, str]]:
+    """section -> {dependency: new version} for every version `pj_deps` changes.
+
+    A dependency is updated in each section that lists it. One listed in no
+    section is added to `dependencies`, unless `pj_replace_only`.
+    """
+    changes: Dict[str, Dict[str, str]] = {}
     for name, version in pj_deps.items():
-        if name not in new_package_json["dependencies"] and pj_replace_only:
-            print(f"Skipping {name}. {name} not in dependencies and replace_only=True")
-        else:
-            new_package_json["dependencies"][name] = version
+        sections = [
+            section
+            for section in DEPENDENCY_SECTIONS
+            if name in (package_json.get(section) or {})
+        ]
+        if not sections:
+            if pj_replace_only:
+                print(
+                    f"Skipping {name}. {name} not in dependencies and replace_only=True"
+                )
+                continue
+            sections = [DEPENDENCY_SECTIONS[0]]
+        for section in sections:
+            if (package_json.get(section) or {}).get(name) != version:
+                changes.setdefault(section, {})[name] = version
+    return changes
+
+
+def apply_dependency_changes(
+    package_json: dict, changes: Dict[str, Dict[str, str]]
+) -> dict:
+    """A copy of `package_json` with `changes`, sharing every section they don't touch."""
+    new_package_json = dict(package_json)
+    for section, versions in changes.items():
+        new_package_json[section] = {**(package_json.get(section) or {}), **versions}
     return new_package_json
+
+
+def update_package_json_contents(
+    package_json: dict,
+    pj_deps: dict,
+    pj_replace_only: bool = True,
+) -> dict:
+    return apply_dependency_changes(
+        package_json, get_dependency_changes(package_json, pj_deps, pj_replace_only)
+    )
+
+
+def scan_object(text: str, start: int) -> Dict[str, Tuple[int, int, int, int]]:
+    """Locate the members of the JSON object starting at `text[start]`.
+
+    Returns key -> (key start, key end, value start, value end). Values are
+    skipped with the stdlib decoder, so this is as strict as `json.loads`.
+    """
+    members: Dict[str, Tuple[int, int, int, int]] = {}
+    index = WHITESPACE.match(text, start + 1).end()  # type: ignore
+    if text[index] == "}":
+        return members
+    while True:
+        if text[index] != '"':
+            raise ValueError(f"Expected a key at {index}")
+        key, key_end = scanstring(text, index + 1)
+        colon = WHITESPACE.match(text, key_end).end()  # type: ignore
+        if text[colon] != ":":
+            raise ValueError(f"Expected ':' at {colon}")
+        value_start = WHITESPACE.match(text, colon + 1).end()  # type: ignore
+        _, value_end = json_decoder.raw_decode(text, value_start)
+        members[key] = (index, key_end, value_start, value_end)
+
+        index = WHITESPACE.match(text, value_end).end()  # type: ignore
+        if text[index] == "}":
+            return members
+        if text[index] != ",":
+            raise ValueError(f"Expected ',' or '}}' at {index}")
+        index = WHITESPACE.match(text, index + 1).end()  # type: ignore
+
+
+def patch_package_json_text(
+    text: str, changes: Dict[str, Dict[str, str]]
+) -> Optional[str]:
+    """Write `changes` into the original package.json text, None if it can't be done in place.
+
+    Changed versions are replaced where they are, and new dependencies are
+    added after the last one in their section, laid out like it. Indentation,
+    key order and everything else in the file are kept as is. Adding a
+    section, or a dependency to an empty one, falls back to re-emitting.
+    """
+    try:
+        root = WHITESPACE.match(text).end()  # type: ignore
+        if text[root] != "{":
+            return None
+        sections = scan_object(text, root)
+        # (start, end, replacement), applied right to left
+        edits: List[Tuple[int, int, str]] = []
+        for section, versions in changes.items():
+            if section not in sections:
+                return None
+            _, _, section_start, _ = sections[section]
+            if text[section_start] != "{":
+                return None
+            members = scan_object(text, section_start)
+            added = ""
+            for name, version in versions.items():
+                if name in members:
+                    _, _, value_start, value_end = members[name]
+                    edits.append((value_start, value_end, dump_json_string(version)))
+                    continue
+                if not members:
+                    return None
+                # laid out like the last dependency: same indent, same colon spacing
+                key_start, key_end, value_start, _ = members[next(reversed(members))]
+                leading = text[get_whitespace_start(text, key_start) : key_start]
+                if len(members) == 1 and not leading:
+                    # `{"a": "1"}` has no separator to copy
+                    leading = " "
+                added += f",{leading}{dump_json_string(name)}{text[key_end:value_start]}{dump_json_string(version)}"
+            if added:
+                last_value_end = members[next(reversed(members))][3]
+                edits.append((last_value_end, last_value_end, added))
+    except (ValueError, IndexError):
+        return None
+
+    for start, end, replacement in sorted(
+        edits, key=lambda edit: edit[0], reverse=True
+    ):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def get_whitespace_start(text: str, end: int) -> int:
+    start = end
+    while start > 0 and text[start - 1] in " \t\n\r":
+        start -= 1
+    return start
+
+
+def dump_json_string(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False)
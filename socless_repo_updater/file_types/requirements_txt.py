@@ -1,7 +1,23 @@
 import re
-from typing import Union
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Tuple, Union
 from socless_repo_updater.constants import SOCLESS_PYTHON_PIP_PATTERN
 
+SOCLESS_PYTHON_PACKAGE = "socless"
+MAX_CACHED_UPDATES = 64
+
+PYPI_REQUIREMENT = re.compile(
+    rb"^(?P<head>\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*)"
+    rb"(?P<spec>(?:===|==|~=|!=|<=|>=|<|>)\s*[^\s;,#]+"
+    rb"(?:\s*,\s*(?:===|==|~=|!=|<=|>=|<|>)\s*[^\s;,#]+)*)?"
+    rb"(?P<tail>\s*(?:;[^#]*)?(?:#.*)?)$"
+)
+GIT_URL = re.compile(rb"git\+[^\s]+")
+PEP508_URL_NAME = re.compile(rb"^\s*(?:-e\s+)?(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)")
+EGG_FRAGMENT = re.compile(rb"egg=(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)")
+NAME_SEPARATORS = re.compile(r"[-_.]+")
+
 
 def build_replacement_pip_string(socless_python_release_tag: str) -> str:
     return f"git+https://github.com/twilio-labs/socless_python.git@{socless_python_release_tag}#egg=socless"
@@ -27,3 +43,140 @@ def requirements_txt_are_equal(first: Union[str, bytes], second: Union[str, byte
     if isinstance(second, bytes):
         second = second.decode("UTF-8")
     return first == second
+
+
+def normalize_package_name(name: Union[str, bytes]) -> str:
+    """PEP 503 normalized name, so `Socless_Python` and `socless-python` match."""
+    if isinstance(name, bytes):
+        name = name.decode("utf-8")
+    return NAME_SEPARATORS.sub("-", name).lower()
+
+
+@dataclass(frozen=True)
+class RequirementsUpdate:
+    """Package versions to set in requirements files, compiled once per batch.
+
+    `matcher` finds any line that mentions one of the packages, so files
+    (and lines) that don't mention any are never parsed.
+    """
+
+    # normalized package name -> version (PyPI) or git ref
+    versions: Dict[str, bytes]
+    matcher: Pattern[bytes]
+
+
+def compile_requirements_update(versions: Dict[str, str]) -> RequirementsUpdate:
+    normalized = {
+        normalize_package_name(name): version.encode("utf-8")
+        for name, version in versions.items()
+    }
+    # `-`, `_` and `.` are interchangeable in package names
+    alternatives = [
+        rb"[-_.]+".join(re.escape(part.encode("utf-8")) for part in name.split("-"))
+        for name in sorted(normalized, key=len, reverse=True)
+    ]
+    matcher = re.compile(rb"(?i)(?:" + rb"|".join(alternatives) + rb")")
+    return RequirementsUpdate(normalized, matcher)
+
+
+_updates: Dict[Tuple[Tuple[str, str], ...], RequirementsUpdate] = {}
+_updates_lock = threading.Lock()
+
+
+def get_requirements_update(versions: Dict[str, str]) -> RequirementsUpdate:
+    """The compiled update for `versions`, shared by every repo in a batch."""
+    key = tuple(sorted(versions.items()))
+    with _updates_lock:
+        update = _updates.get(key)
+        if update is None:
+            if len(_updates) >= MAX_CACHED_UPDATES:
+                del _updates[next(iter(_updates))]
+            update = _updates[key] = compile_requirements_update(versions)
+        return update
+
+
+def update_requirements(
+    content: bytes, update: RequirementsUpdate
+) -> Optional[Tuple[bytes, List[str]]]:
+    """Set the versions in `update` in one pass over a requirements file.
+
+    Handles PyPI requirements (with extras, markers and comments) and git
+    URLs (`git+...@ref#egg=name`, `name @ git+...@ref`, `-e git+...`).
+    Returns the new content and the updated package names, or None if
+    nothing changed. Works on bytes, so nothing is decoded or re-encoded.
+    """
+    if not update.matcher.search(content):
+        return None
+
+    lines = content.splitlines(keepends=True)
+    updated: List[str] = []
+    for index, line in enumerate(lines):
+        if not update.matcher.search(line):
+            continue
+        body = line.rstrip(b"\r\n")
+        result = update_requirement_line(body, update.versions)
+        if result and result[0] != body:
+            lines[index] = result[0] + line[len(body) :]
+            if result[1] not in updated:
+                updated.append(result[1])
+
+    if not updated:
+        return None
+    return b"".join(lines), updated
+
+
+def update_requirement_line(
+    line: bytes, versions: Dict[str, bytes]
+) -> Optional[Tuple[bytes, str]]:
+    """(new line, package name) if `line` is a requirement for a package in `versions`."""
+    stripped = line.lstrip()
+    if not stripped or stripped.startswith(b"#"):
+        return None
+
+    git_url = GIT_URL.search(line)
+    if git_url:
+        return update_git_requirement(line, git_url, versions)
+    if stripped.startswith(b"-"):
+        # pip options, e.g. `-r other.txt` or `--index-url`
+        return None
+
+    match = PYPI_REQUIREMENT.match(line)
+    if not match:
+        return None
+    name = normalize_package_name(match.group("name"))
+    if name not in versions:
+        return None
+    tail = match.group("tail")
+    if tail.startswith(b";"):
+        tail = b" " + tail
+    return match.group("head").rstrip() + b"==" + versions[name] + tail, name
+
+
+def update_git_requirement(
+    line: bytes, git_url: "re.Match[bytes]", versions: Dict[str, bytes]
+) -> Optional[Tuple[bytes, str]]:
+    url = git_url.group()
+    fragment_start = url.find(b"#")
+    base = url if fragment_start == -1 else url[:fragment_start]
+    fragment = b"" if fragment_start == -1 else url[fragment_start:]
+
+    egg = EGG_FRAGMENT.search(fragment)
+    if egg:
+        name = normalize_package_name(egg.group("name"))
+    elif b" @ " in line[: git_url.start()] or b"@git+" in line:
+        name = normalize_package_name(PEP508_URL_NAME.match(line).group("name"))  # type: ignore
+    else:
+        # e.g. git+https://github.com/org/my-package.git
+        repo_name = base.rsplit(b"/", 1)[-1].split(b"@")[0]
+        if repo_name.endswith(b".git"):
+            repo_name = repo_name[:-4]
+        name = normalize_package_name(repo_name)
+    if name not in versions:
+        return None
+
+    # the ref follows the last `@` after the last `/`, git+ssh URLs have a `git@` user part
+    ref_at = base.rfind(b"@")
+    if ref_at > base.rfind(b"/"):
+        base = base[:ref_at]
+    new_url = base + b"@" + versions[name] + fragment
+    return line[: git_url.start()] + new_url + line[git_url.end() :], name
@@ -1,36 +1,224 @@
+import json
+import threading
 from io import StringIO
-from typing import Union
+from typing import Dict, List, Optional, Union
 import ruamel.yaml
-from socless_repo_updater.utils import dict_merge
+from ruamel.yaml.comments import CommentedMap
+from socless_repo_updater.fingerprint import FINGERPRINTS
+from socless_repo_updater.merge_plan import (
+    APPENDED,
+    INSERTED,
+    MergeChange,
+    get_merge_plan,
+)
 
+# `YAML` instances keep parser and emitter state, so each thread gets its own
+_yaml_instances = threading.local()
 
-# setup yaml parser
-yaml = ruamel.yaml.YAML()
-yaml.indent(mapping=2, sequence=4, offset=2)
-yaml.explicit_start = False
-yaml.preserve_quotes = True
+
+def get_yaml() -> ruamel.yaml.YAML:
+    """This thread's round-trip parser and emitter."""
+    yaml = getattr(_yaml_instances, "round_trip", None)
+    if yaml is None:
+        yaml = ruamel.yaml.YAML()
+        yaml.indent(mapping=2, sequence=4, offset=2)
+        yaml.explicit_start = False
+        yaml.preserve_quotes = True
+        _yaml_instances.round_trip = yaml
+    return yaml
+
+
+def get_safe_yaml() -> ruamel.yaml.YAML:
+    """This thread's safe loader, only used to check that a plain scalar reads back as the same string."""
+    safe_yaml = getattr(_yaml_instances, "safe", None)
+    if safe_yaml is None:
+        safe_yaml = ruamel.yaml.YAML(typ="safe", pure=True)
+        _yaml_instances.safe = safe_yaml
+    return safe_yaml
+
+
+def load_yaml(content: Union[bytes, str]):
+    return get_yaml().load(content)
+
+
+# a value starting with one of these is not a single-line scalar we can splice
+UNPATCHABLE_VALUE_STARTS = set("|>&!*{[")
 
 
 def update_serverless_yml_content(
     raw_file: Union[bytes, str], update_data: dict, add_keys=False
 ) -> str:
-    serverless_yaml_as_dict = yaml.load(raw_file)
-    modified_serverless_yml_dict = dict_merge(
-        serverless_yaml_as_dict, update_data, add_keys
-    )
-    new_serverless_yaml = object_to_yaml_str(modified_serverless_yml_dict)
+    new_serverless_yaml = apply_serverless_yml_changes(raw_file, update_data, add_keys)
+    if new_serverless_yaml is None:
+        return raw_file.decode("utf-8") if isinstance(raw_file, bytes) else raw_file
     return new_serverless_yaml
 
 
+def apply_serverless_yml_changes(
+    raw_file: Union[bytes, str], update_data: dict, add_keys=False
+) -> Optional[str]:
+    """Merge `update_data` into a serverless.yml, returning the new text or None if nothing changed.
+
+    The file is parsed once. Changes that replace existing single-line
+    scalars or add scalars to block sequences are spliced into the original
+    text at the positions the parser recorded, so every other byte
+    (comments, quoting, spacing) is kept as is. Anything else, like adding
+    keys, falls back to re-emitting the merged document.
+    """
+    text = raw_file.decode("utf-8") if isinstance(raw_file, bytes) else raw_file
+    return patch_serverless_yml_document(
+        text, load_serverless_yml(text), update_data, add_keys
+    )
+
+
+def load_serverless_yml(text: str) -> CommentedMap:
+    document = load_yaml(text)
+    return CommentedMap() if document is None else document
+
+
+def patch_serverless_yml_document(
+    text: str, document: CommentedMap, update_data: dict, add_keys=False
+) -> Optional[str]:
+    """`apply_serverless_yml_changes` for a document already parsed from `text`.
+
+    `document` must come from `load_serverless_yml(text)`, and is merged in place.
+    """
+    changes = get_merge_plan(update_data, add_keys).apply(document)
+    if not changes:
+        return None
+
+    # inserted keys and containers can only be written out by re-emitting the document
+    if not any(change.action == INSERTED for change in changes):
+        patched = patch_text(text, changes)
+        # the spliced text must read back as the merged document, otherwise re-emit it
+        if patched is not None and load_yaml(patched) == document:
+            return patched
+    return object_to_yaml_str(document)
+
+
+def patch_text(text: str, edits: List[MergeChange]) -> Optional[str]:
+    """Splice replaced and appended scalars into the source text, None if any can't be located."""
+    lines = text.splitlines(keepends=True)
+    replacements = []
+    # line -> new lines to add after it, in edit order
+    insertions: Dict[int, List[str]] = {}
+    for edit in edits:
+        try:
+            if edit.action == APPENDED:
+                line, column = edit.container.lc.item(edit.key)
+            else:
+                line, column = edit.container.lc.value(edit.key)
+        except (KeyError, TypeError):
+            # e.g. an append to an empty list, there is no item to line up with
+            return None
+
+        if edit.action == APPENDED:
+            new_line = make_sequence_line(lines[line], column, edit.value)
+            if new_line is None:
+                return None
+            insertions.setdefault(line, []).append(new_line)
+            continue
+        end = find_scalar_end(lines[line], column)
+        if end is None:
+            return None
+        replacements.append(
+            (line, column, end, render_scalar(edit.value, lines[line][column]))
+        )
+
+    # right to left, so earlier columns on the same line stay valid
+    for line, column, end, rendered in sorted(replacements, reverse=True):
+        lines[line] = lines[line][:column] + rendered + lines[line][end:]
+    # bottom to top, so line numbers above stay valid
+    for line in sorted(insertions, reverse=True):
+        if not lines[line].endswith("\n"):
+            lines[line] += "\n"
+        lines[line + 1 : line + 1] = insertions[line]
+    return "".join(lines)
+
+
+def make_sequence_line(last_item_line: str, column: int, value) -> Optional[str]:
+    """A `- value` line indented like the block sequence item at `column`, None if it isn't one."""
+    prefix = last_item_line[:column]
+    end = find_scalar_end(last_item_line, column)
+    if end is None or not prefix.rstrip().endswith("-") or prefix.rstrip()[:-1].strip():
+        return None
+    # the item must end its line, so the new one can start on the next
+    rest = last_item_line[end:].strip()
+    if rest and not rest.startswith("#"):
+        return None
+    newline = "\r\n" if last_item_line.endswith("\r\n") else "\n"
+    return prefix + render_scalar(value, "") + newline
+
+
+def find_scalar_end(line: str, start: int) -> Optional[int]:
+    """End column of the single-line scalar starting at `start`, None if it isn't one."""
+    if start >= len(line) or line[start] in UNPATCHABLE_VALUE_STARTS:
+        return None
+    quote = line[start]
+    if quote == '"':
+        index = start + 1
+        while index < len(line):
+            if line[index] == "\\":
+                index += 2
+                continue
+            if line[index] == '"':
+                return index + 1
+            index += 1
+        return None
+    if quote == "'":
+        index = start + 1
+        while index < len(line):
+            if line[index] == "'":
+                if line[index + 1 : index + 2] == "'":
+                    index += 2
+                    continue
+                return index + 1
+            index += 1
+        return None
+
+    content = line.rstrip("\r\n")
+    comment = content.find(" #", start)
+    if comment != -1:
+        content = content[:comment]
+    return start + len(content[start:].rstrip())
+
+
+def render_scalar(value, original_start: str) -> str:
+    """YAML text for a scalar, keeping the quote style of the value it replaces."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if not isinstance(value, str):
+        return str(value)
+    if original_start == "'":
+        return "'" + value.replace("'", "''") + "'"
+    if original_start == '"' or not is_plain_safe(value):
+        return json.dumps(value)
+    return value
+
+
+def is_plain_safe(value: str) -> bool:
+    if not value or value != value.strip() or "\n" in value:
+        return False
+    try:
+        return get_safe_yaml().load(f"key: {value}") == {"key": value}
+    except ruamel.yaml.YAMLError:
+        return False
+
+
 def yaml_files_are_equal(first, second) -> bool:
-    return yaml.load(first) == yaml.load(second)
+    # fingerprints are memoized by blob sha, so a file is parsed at most once
+    return FINGERPRINTS.fingerprint(first, load_yaml) == FINGERPRINTS.fingerprint(
+        second, load_yaml
+    )
 
 
 def object_to_yaml_str(obj, options=None):
     if options is None:
         options = {}
     string_stream = StringIO()
-    yaml.dump(obj, string_stream, **options)
+    get_yaml().dump(obj, string_stream, **options)
     output_str = string_stream.getvalue()
     string_stream.close()
     return output_str
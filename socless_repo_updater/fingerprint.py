@@ -0,0 +1,132 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+DEFAULT_MAX_FINGERPRINTS = 50_000
+
+
+def make_fingerprint(document: Any) -> str:
+    """Stable hash of a parsed JSON/YAML document's structure and values.
+
+    Key order, formatting, comments and quoting don't change it, so two
+    files with the same fingerprint parse to equal documents.
+    """
+    try:
+        canonical = dump_canonical(document)
+    except TypeError:
+        # YAML mappings can mix key types, which `sort_keys` can't order
+        canonical = dump_canonical(make_sortable(document))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def dump_canonical(document: Any) -> str:
+    return json.dumps(
+        document, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+
+
+def make_sortable(document: Any) -> Any:
+    """Copy of `document` with each mapping that has non-string keys as sorted pairs."""
+    if isinstance(document, dict):
+        if all(isinstance(key, str) for key in document):
+            return {key: make_sortable(value) for key, value in document.items()}
+        pairs = sorted(
+            (
+                [type(key).__name__, str(key), make_sortable(value)]
+                for key, value in document.items()
+            ),
+            key=lambda pair: pair[:2],
+        )
+        return {"__mapping__": pairs}
+    if isinstance(document, (list, tuple)):
+        return [make_sortable(item) for item in document]
+    return document
+
+
+def make_target_key(file_path: str, spec: Any) -> str:
+    """Identify "this file updated with this spec", see `FingerprintCache.mark_current`."""
+    raw = json.dumps([file_path, spec], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_blob_sha(content: Union[bytes, str]) -> str:
+    """The git blob sha of `content`, the same sha Github reports for the file."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FingerprintCache:
+    """Memoized document fingerprints, keyed by blob sha.
+
+    Fleets of templated repos share most of their file contents, so a
+    parsed file's fingerprint is remembered by its blob sha and never
+    computed twice. Fingerprints known to already be in the target state of
+    an update are remembered too. Once a blob's fingerprint is known,
+    `is_known_current` answers "does this file need changes" without parsing it.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_FINGERPRINTS) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self._fingerprints: Dict[str, str] = {}
+        # (target key, fingerprint) pairs, bounded like `_fingerprints`
+        self._current: Dict[Tuple[str, str], None] = {}
+        self._lock = threading.Lock()
+
+    def get(self, content: Union[bytes, str]) -> Optional[str]:
+        with self._lock:
+            return self._fingerprints.get(get_blob_sha(content))
+
+    def remember(self, content: Union[bytes, str], fingerprint: str) -> str:
+        with self._lock:
+            self._fingerprints[get_blob_sha(content)] = fingerprint
+            self._evict(self._fingerprints)
+        return fingerprint
+
+    def _evict(self, entries: dict):
+        # caller holds self._lock
+        if len(entries) > self.max_entries:
+            # dicts keep insertion order, drop the oldest entry
+            del entries[next(iter(entries))]
+
+    def fingerprint(
+        self, content: Union[bytes, str], parse: Callable[[Union[bytes, str]], Any]
+    ) -> str:
+        """Fingerprint of `content`, parsed with `parse` only if its blob wasn't seen before."""
+        known = self.get(content)
+        if known:
+            with self._lock:
+                self.hits += 1
+            return known
+        return self.remember(content, make_fingerprint(parse(content)))
+
+    def mark_current(self, target_key: str, fingerprint: str):
+        """Record that a document with `fingerprint` needs no changes for `target_key`."""
+        with self._lock:
+            self._current[(target_key, fingerprint)] = None
+            self._evict(self._current)
+
+    def is_current(self, target_key: str, fingerprint: str) -> bool:
+        with self._lock:
+            return (target_key, fingerprint) in self._current
+
+    def is_known_current(self, content: Union[bytes, str], target_key: str) -> bool:
+        """True if `content` is known to need no changes for `target_key`, without parsing it."""
+        fingerprint = self.get(content)
+        if not fingerprint or not self.is_current(target_key, fingerprint):
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._fingerprints.clear()
+            self._current.clear()
+            self.hits = 0
+
+
+# shared by every transform in the process, see `file_types.handlers`
+FINGERPRINTS = FingerprintCache()
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from socless_repo_updater.file_types.handlers import FILE_HANDLERS, UPDATE_SPEC_KEYS
+
+DEFAULT_FLEET_INDEX_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "socless_repo_updater", "fleet_index.sqlite3"
+)
+
+
+def make_spec_hash(update_kwargs: dict) -> str:
+    """Hash the parts of a campaign that decide what a compliant repo looks like."""
+    spec = {key: update_kwargs.get(key) for key in UPDATE_SPEC_KEYS}
+    raw = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def can_skip_compliant(update_kwargs: dict) -> bool:
+    """False if the campaign discovers files from each repo's tree.
+
+    Those files aren't part of the snapshot compliance is checked against,
+    so a repo that gained one since it was verified would be skipped.
+    """
+    spec = {key: update_kwargs.get(key) for key in UPDATE_SPEC_KEYS}
+    return not any(handler.discovers_files(spec) for handler in FILE_HANDLERS.values())
+
+
+class FleetIndex:
+    """On-disk record of which repos were verified compliant with which campaign spec.
+
+    A repo is stored with the blob shas of the files its check read. As long
+    as those blobs and the spec are unchanged, re-running the same check
+    cannot find anything to change, so the repo can be skipped without
+    fetching or parsing its files.
+    """
+
+    def __init__(self, path: str = DEFAULT_FLEET_INDEX_PATH) -> None:
+        self.path = path
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS compliant_repos (
+                repo TEXT PRIMARY KEY,
+                spec_hash TEXT NOT NULL,
+                file_shas TEXT NOT NULL,
+                verified_at REAL NOT NULL
+            )""")
+        self._db.commit()
+
+    def _get(self, repo: str) -> Optional[tuple]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT spec_hash, file_shas FROM compliant_repos WHERE repo = ?",
+                (repo,),
+            ).fetchone()
+
+    def is_compliant(
+        self, repo: str, spec_hash: str, current_file_shas: Dict[str, str]
+    ) -> bool:
+        row = self._get(repo)
+        if not row or row[0] != spec_hash:
+            return False
+        verified_shas = json.loads(row[1])
+        if not verified_shas or any(
+            current_file_shas.get(path) != sha for path, sha in verified_shas.items()
+        ):
+            return False
+        with self._lock:
+            self.skipped += 1
+        return True
+
+    def mark_compliant(self, repo: str, spec_hash: str, file_shas: Dict[str, str]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO compliant_repos VALUES (?, ?, ?, ?)",
+                (repo, spec_hash, json.dumps(file_shas, sort_keys=True), time.time()),
+            )
+            self._db.commit()
+
+    def forget(self, repo: str):
+        with self._lock:
+            self._db.execute("DELETE FROM compliant_repos WHERE repo = ?", (repo,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM compliant_repos")
+            self._db.commit()
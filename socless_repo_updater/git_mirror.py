@@ -0,0 +1,259 @@
+import base64
+import os
+import re
+import subprocess
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from github import Github
+from socless_repo_updater.constants import GITHUB_DOMAIN
+from socless_repo_updater.exceptions import GitMirrorError
+from socless_repo_updater.models import FileChange, RepoFile
+from socless_repo_updater.utils import get_github_credentials
+
+DEFAULT_GIT_MIRROR_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "socless_repo_updater", "mirrors"
+)
+
+
+def get_clone_url(gh: Github, full_name: str) -> str:
+    """The https clone URL of a repo on the host a Github instance talks to."""
+    base_url, _ = get_github_credentials(gh)
+    parsed = urlparse(base_url)
+    host = parsed.netloc
+    if parsed.hostname == f"api.{GITHUB_DOMAIN}":
+        host = GITHUB_DOMAIN
+    return f"{parsed.scheme}://{host}/{full_name}.git"
+
+
+def make_git_auth_header(api_auth_header: Optional[str]) -> Optional[str]:
+    """Turn PyGithub's `token <token>` header into one git's smart HTTP accepts."""
+    if not api_auth_header:
+        return None
+    scheme, _, credential = api_auth_header.partition(" ")
+    if scheme.lower() == "basic":
+        return api_auth_header
+    basic = base64.b64encode(f"x-access-token:{credential}".encode("utf-8"))
+    return f"Basic {basic.decode('utf-8')}"
+
+
+def get_mirror_path(cache_dir: str, remote_url: str) -> str:
+    parsed = urlparse(remote_url)
+    if parsed.hostname:
+        location = f"{parsed.hostname}{parsed.path}"
+    else:
+        location = os.path.abspath(remote_url)
+    name = re.sub(r"[^\w.-]+", "_", location.strip("/"))
+    if not name.endswith(".git"):
+        name += ".git"
+    return os.path.join(cache_dir, name)
+
+
+class GitMirror:
+    """A bare local mirror of one repo, kept current with incremental fetches.
+
+    Reads go through `git cat-file --batch`, so any number of files cost a
+    single process and no API calls. Commits are built locally with a
+    throwaway index and leave the machine in one non-forced push.
+    `remote_url` may be an https URL or a path to a plain local repo.
+    """
+
+    def __init__(
+        self,
+        remote_url: str,
+        cache_dir: str = DEFAULT_GIT_MIRROR_DIR,
+        auth_header: Optional[str] = None,
+        author: Optional[Tuple[str, str]] = None,
+    ) -> None:
+        """
+        Args:
+            remote_url: repo to mirror, an https URL or a local path
+            cache_dir: directory holding every mirror
+            auth_header: `Authorization` header value sent on fetch and push
+            author: (name, email) for commits, defaults to the git config
+        """
+        self.remote_url = remote_url
+        self.path = get_mirror_path(cache_dir, remote_url)
+        self.auth_header = auth_header
+        self.author = author
+        self._synced = False
+
+    def _env(self) -> Dict[str, str]:
+        env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        if self.auth_header:
+            # passed as env config so the credential never shows up in argv or on disk
+            env.update(
+                GIT_CONFIG_COUNT="1",
+                GIT_CONFIG_KEY_0="http.extraHeader",
+                GIT_CONFIG_VALUE_0=f"Authorization: {self.auth_header}",
+            )
+        if self.author:
+            name, email = self.author
+            env.update(
+                GIT_AUTHOR_NAME=name,
+                GIT_AUTHOR_EMAIL=email,
+                GIT_COMMITTER_NAME=name,
+                GIT_COMMITTER_EMAIL=email,
+            )
+        return env
+
+    def _git(
+        self,
+        *args: str,
+        input: bytes = None,
+        env: Optional[Dict[str, str]] = None,
+        check: bool = True,
+    ) -> subprocess.CompletedProcess:
+        result = subprocess.run(
+            ["git", "--git-dir", self.path, *args],
+            input=input,
+            capture_output=True,
+            env=env or self._env(),
+        )
+        if check and result.returncode != 0:
+            raise GitMirrorError(
+                f"git {args[0]} failed for {self.remote_url}: {result.stderr.decode('utf-8', 'replace').strip()}"
+            )
+        return result
+
+    def sync(self, force: bool = False):
+        """Clone the mirror on first use, otherwise fetch only what changed since."""
+        if self._synced and not force:
+            return
+        if not os.path.isdir(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            result = subprocess.run(
+                ["git", "clone", "--bare", "--quiet", self.remote_url, self.path],
+                capture_output=True,
+                env=self._env(),
+            )
+            if result.returncode != 0:
+                raise GitMirrorError(
+                    f"git clone failed for {self.remote_url}: {result.stderr.decode('utf-8', 'replace').strip()}"
+                )
+        else:
+            self._git(
+                "fetch", "--quiet", "--prune", "origin", "+refs/heads/*:refs/heads/*"
+            )
+        self._synced = True
+
+    def default_branch(self) -> str:
+        return self._git("symbolic-ref", "--short", "HEAD").stdout.decode().strip()
+
+    def resolve(self, rev: str) -> Optional[str]:
+        """Return the object sha `rev` points to, or None if it does not exist."""
+        result = self._git("rev-parse", "--verify", "--quiet", rev, check=False)
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode().strip()
+
+    def resolve_branch(self, branch: str) -> Optional[str]:
+        return self.resolve(f"refs/heads/{branch}^{{commit}}")
+
+    def list_files(self, commit_sha: str) -> List[str]:
+        """Path of every file in the tree of `commit_sha`."""
+        return list(self.list_file_modes(commit_sha))
+
+    def list_file_modes(
+        self, commit_sha: str, paths: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """path -> git file mode of every file (or just `paths`) in the tree of `commit_sha`."""
+        output = self._git(
+            "ls-tree", "-r", "-z", commit_sha, "--", *(paths or [])
+        ).stdout
+        modes = {}
+        for entry in output.decode().split("\0"):
+            if not entry:
+                continue
+            # "<mode> <type> <sha>\t<path>"
+            info, path = entry.split("\t", 1)
+            mode, object_type, _ = info.split(" ")
+            if object_type == "blob":
+                modes[path] = mode
+        return modes
+
+    def read_files(self, commit_sha: str, paths: List[str]) -> Dict[str, RepoFile]:
+        """Read every path at `commit_sha` in one `git cat-file --batch` call.
+
+        Paths that do not exist at that commit are left out.
+        """
+        batch_input = "".join(f"{commit_sha}:{path}\n" for path in paths)
+        output = self._git("cat-file", "--batch", input=batch_input.encode()).stdout
+
+        files: Dict[str, RepoFile] = {}
+        position = 0
+        for path in paths:
+            header_end = output.index(b"\n", position)
+            header = output[position:header_end].decode().split()
+            position = header_end + 1
+            if header[-1] == "missing":
+                continue
+            size = int(header[2])
+            if header[1] != "blob":
+                # e.g. a directory, its contents are printed all the same
+                position += size + 1
+                continue
+            files[path] = RepoFile(
+                path=path,
+                sha=header[0],
+                decoded_content=output[position : position + size],
+            )
+            # contents are followed by a newline
+            position += size + 1
+        return files
+
+    def commit_files(
+        self, parent_sha: str, changes: List[FileChange], message: str
+    ) -> str:
+        """Write `changes` as one commit on top of `parent_sha`, returning its sha.
+
+        Uses a temporary index, so no branch or working tree is touched.
+        """
+        index_fd, index_path = tempfile.mkstemp(prefix="index-", dir=self.path)
+        os.close(index_fd)
+        env = dict(self._env(), GIT_INDEX_FILE=index_path)
+        # keep the mode of files that exist, e.g. executable bits
+        modes = self.list_file_modes(parent_sha, [change.path for change in changes])
+        try:
+            self._git("read-tree", parent_sha, env=env)
+            for change in changes:
+                blob_sha = self._git(
+                    "hash-object",
+                    "-w",
+                    "--stdin",
+                    input=change.new_content.encode("utf-8"),
+                    env=env,
+                ).stdout.decode()
+                self._git(
+                    "update-index",
+                    "--add",
+                    "--cacheinfo",
+                    f"{modes.get(change.path, change.mode)},{blob_sha.strip()},{change.path}",
+                    env=env,
+                )
+            tree_sha = self._git("write-tree", env=env).stdout.decode().strip()
+            return (
+                self._git(
+                    "commit-tree",
+                    tree_sha,
+                    "-p",
+                    parent_sha,
+                    "-F",
+                    "-",
+                    input=message.encode("utf-8"),
+                    env=env,
+                )
+                .stdout.decode()
+                .strip()
+            )
+        finally:
+            os.remove(index_path)
+
+    def push(self, commit_sha: str, branch: str):
+        """Point `branch` on the remote at `commit_sha`.
+
+        The push is never forced, so the remote refuses it if the branch
+        moved since the mirror was fetched.
+        """
+        self._git("push", "--quiet", "origin", f"{commit_sha}:refs/heads/{branch}")
+        self._git("update-ref", f"refs/heads/{branch}", commit_sha)
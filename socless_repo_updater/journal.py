@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+DEFAULT_JOURNAL_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "socless_repo_updater", "journals"
+)
+
+CAMPAIGN_STARTED = "campaign_started"
+BRANCH_CREATED = "branch_created"
+FILE_COMMITTED = "file_committed"
+PR_OPENED = "pr_opened"
+REPO_DONE = "repo_done"
+
+
+@dataclass
+class JournaledPullRequest:
+    """The parts of a `PullRequest` a journal keeps, enough for metrics and reports."""
+
+    number: int
+    html_url: str
+
+
+@dataclass
+class RepoProgress:
+    """What a campaign already finished for one repo."""
+
+    branch_created: bool = False
+    # path -> sha of the commit that wrote it
+    committed_files: Dict[str, str] = field(default_factory=dict)
+    pr: Optional[JournaledPullRequest] = None
+    done: bool = False
+    updated: bool = False
+
+
+class CampaignJournal:
+    """Durable, append-only JSONL record of a campaign's per-repo progress.
+
+    Every step (branch created, file committed, PR opened, repo done) is
+    appended and fsynced as it happens. Reopening the journal of the same
+    campaign replays it, so an interrupted run can resume where it stopped
+    instead of redoing finished repos and steps.
+    """
+
+    def __init__(self, campaign_id: str, directory: str = DEFAULT_JOURNAL_DIR) -> None:
+        self.campaign_id = campaign_id
+        self.path = os.path.join(directory, f"{campaign_id}.jsonl")
+        self.head_branch: Optional[str] = None
+        self._progress: Dict[str, RepoProgress] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            self._replay()
+
+    def _replay(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a crash mid-write can leave a torn last line
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry: dict):
+        step = entry["step"]
+        if step == CAMPAIGN_STARTED:
+            self.head_branch = entry["head_branch"]
+            return
+        progress = self._progress.setdefault(entry["repo"], RepoProgress())
+        if step == BRANCH_CREATED:
+            progress.branch_created = True
+        elif step == FILE_COMMITTED:
+            progress.committed_files[entry["path"]] = entry["sha"]
+        elif step == PR_OPENED:
+            progress.pr = JournaledPullRequest(entry["number"], entry["html_url"])
+        elif step == REPO_DONE:
+            progress.done = True
+            progress.updated = entry["updated"]
+
+    def _append(self, entry: dict):
+        entry = {
+            "campaign_id": self.campaign_id,
+            "ts": datetime.now(timezone.utc).isoformat(),
+            **entry,
+        }
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def start(self, head_branch: str) -> str:
+        """Pin the campaign to a head branch, returning the one a previous run used if any."""
+        if self.head_branch is None:
+            self._append({"step": CAMPAIGN_STARTED, "head_branch": head_branch})
+        return self.head_branch  # type: ignore
+
+    def progress(self, repo: str) -> RepoProgress:
+        with self._lock:
+            return self._progress.get(repo, RepoProgress())
+
+    def for_repo(self, repo: str) -> "RepoJournal":
+        return RepoJournal(self, repo)
+
+
+class RepoJournal:
+    """One repo's view of a `CampaignJournal`, handed to its `RepoUpdater`."""
+
+    def __init__(self, journal: CampaignJournal, repo: str) -> None:
+        self.journal = journal
+        self.repo = repo
+
+    @property
+    def progress(self) -> RepoProgress:
+        return self.journal.progress(self.repo)
+
+    def record_branch_created(self):
+        self.journal._append({"step": BRANCH_CREATED, "repo": self.repo})
+
+    def record_file_committed(self, path: str, sha: str):
+        self.journal._append(
+            {"step": FILE_COMMITTED, "repo": self.repo, "path": path, "sha": sha}
+        )
+
+    def record_pr_opened(self, number: int, html_url: str):
+        self.journal._append(
+            {
+                "step": PR_OPENED,
+                "repo": self.repo,
+                "number": number,
+                "html_url": html_url,
+            }
+        )
+
+    def record_done(self, updated: bool):
+        self.journal._append({"step": REPO_DONE, "repo": self.repo, "updated": updated})
@@ -0,0 +1,195 @@
+import collections.abc
+import json
+import threading
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Tuple, Union
+
+MAX_CACHED_PLANS = 64
+
+# what a `MergeChange` did to the document
+REPLACED = "replaced"
+APPENDED = "appended"
+INSERTED = "inserted"
+
+
+def get_value_kind(value) -> str:
+    """Compare parsed and requested values by kind, so `CommentedMap` matches `dict`."""
+    if isinstance(value, collections.abc.Mapping):
+        return "mapping"
+    if isinstance(value, list):
+        return "list"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "str"
+    return type(value).__name__
+
+
+def is_scalar(value) -> bool:
+    return not isinstance(value, (collections.abc.Mapping, list))
+
+
+def freeze(value) -> Hashable:
+    """A hashable stand-in for `value` that is equal wherever `value` is equal."""
+    if isinstance(value, collections.abc.Mapping):
+        return frozenset((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+@dataclass
+class MergeChange:
+    """One change a `MergePlan` made to a document."""
+
+    # the mapping or list that was changed
+    container: Any
+    # key of the replaced or inserted value, or index of the list item `value` was added after
+    key: Union[str, int]
+    value: Any
+    action: str
+
+
+@dataclass(frozen=True)
+class MergeOp:
+    # keys from the document root to the mapping that holds `key`
+    parents: Tuple[str, ...]
+    # the update value at each parent, set as a whole where the document has nothing
+    parent_values: Tuple[Any, ...]
+    key: str
+    value: Any
+    kind: str
+    # `freeze`d list items, so appends check membership by hash
+    frozen_items: Tuple[Hashable, ...] = ()
+
+
+class MergePlan:
+    """A change spec compiled into flat, path-targeted operations.
+
+    Applying the plan gives the same result as `utils.dict_merge` with the
+    same spec and `add_keys`: missing or empty values are set, mappings are
+    merged, missing list items are appended and other values are replaced.
+    The spec is walked once at compile time instead of once per document,
+    and list appends check membership by hash instead of scanning the list.
+    """
+
+    def __init__(self, ops: List[MergeOp], add_keys: bool) -> None:
+        self.ops = ops
+        self.add_keys = add_keys
+
+    def apply(self, document: dict) -> List[MergeChange]:
+        """Merge the plan into `document` in place, returning what changed."""
+        changes: List[MergeChange] = []
+        for op in self.ops:
+            node = document
+            for parent, parent_value in zip(op.parents, op.parent_values):
+                if parent not in node and not self.add_keys:
+                    break
+                child = node.get(parent)
+                if not child:
+                    node[parent] = deepcopy(parent_value)
+                    changes.append(MergeChange(node, parent, parent_value, INSERTED))
+                    break
+                if get_value_kind(child) != "mapping":
+                    raise TypeError(
+                        f"Overlapping keys exist with different types: original is {type(child)}, new value is {type(parent_value)}"
+                    )
+                node = child
+            else:
+                self._apply_op(op, node, changes)
+        return changes
+
+    def _apply_op(self, op: MergeOp, node: dict, changes: List[MergeChange]):
+        if op.key not in node and not self.add_keys:
+            return
+        current = node.get(op.key)
+        if not current:
+            if current == op.value and type(current) == type(op.value):  # noqa
+                return
+            # an empty value has no text to replace in place
+            replaced = (
+                current is not None and is_scalar(current) and is_scalar(op.value)
+            )
+            node[op.key] = op.value if is_scalar(op.value) else deepcopy(op.value)
+            changes.append(
+                MergeChange(node, op.key, op.value, REPLACED if replaced else INSERTED)
+            )
+        elif get_value_kind(current) != op.kind:
+            raise TypeError(
+                f"Overlapping keys exist with different types: original is {type(current)}, new value is {type(op.value)}"
+            )
+        elif op.kind == "mapping":
+            # only empty mappings are left as ops, merging one changes nothing
+            return
+        elif op.kind == "list":
+            present = {freeze(item) for item in current}
+            last_index = len(current) - 1
+            for item, frozen_item in zip(op.value, op.frozen_items):
+                if frozen_item in present:
+                    continue
+                present.add(frozen_item)
+                current.append(item if is_scalar(item) else deepcopy(item))
+                changes.append(
+                    MergeChange(
+                        current,
+                        last_index,
+                        item,
+                        APPENDED if is_scalar(item) else INSERTED,
+                    )
+                )
+        elif current != op.value:
+            node[op.key] = op.value
+            changes.append(MergeChange(node, op.key, op.value, REPLACED))
+
+
+def compile_merge_plan(update_data: dict, add_keys: bool = False) -> MergePlan:
+    ops: List[MergeOp] = []
+
+    def compile_mapping(mapping: dict, parents: tuple, parent_values: tuple):
+        for key, value in mapping.items():
+            if isinstance(value, collections.abc.Mapping) and value:
+                compile_mapping(value, parents + (key,), parent_values + (value,))
+                continue
+            ops.append(
+                MergeOp(
+                    parents=parents,
+                    parent_values=parent_values,
+                    key=key,
+                    value=value,
+                    kind=get_value_kind(value),
+                    frozen_items=(
+                        tuple(freeze(item) for item in value)
+                        if isinstance(value, list)
+                        else ()
+                    ),
+                )
+            )
+
+    compile_mapping(update_data, (), ())
+    return MergePlan(ops, add_keys)
+
+
+_plans: Dict[Tuple[str, bool], MergePlan] = {}
+_plans_lock = threading.Lock()
+
+
+def get_merge_plan(update_data: dict, add_keys: bool = False) -> MergePlan:
+    """The compiled plan for `update_data`, compiled once and reused for every repo in a batch."""
+    key = (json.dumps(update_data, default=repr), add_keys)
+    with _plans_lock:
+        plan = _plans.get(key)
+    if plan is None:
+        # compiled from a copy, so later changes to `update_data` can't leak into the plan
+        plan = compile_merge_plan(deepcopy(update_data), add_keys)
+        with _plans_lock:
+            if len(_plans) >= MAX_CACHED_PLANS:
+                del _plans[next(iter(_plans))]
+            _plans[key] = plan
+    return plan
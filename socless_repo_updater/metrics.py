@@ -0,0 +1,176 @@
+import json
+import math
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# (pattern for the path after /repos/{owner}/{repo}, template it is reported as)
+REPO_ENDPOINT_TEMPLATES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(pattern), template)
+    for pattern, template in [
+        (r"^/branches/.+$", "/branches/{branch}"),
+        (r"^/contents/.+$", "/contents/{path}"),
+        (r"^/git/refs/.+$", "/git/refs/{ref}"),
+        (r"^/git/ref/.+$", "/git/ref/{ref}"),
+        (r"^/git/(commits|trees|blobs|tags)/\w+$", "/git/\\1/{sha}"),
+        (r"^/pulls/\d+(/.*)?$", "/pulls/{number}\\1"),
+        (r"^/issues/\d+(/.*)?$", "/issues/{number}\\1"),
+        (r"^/releases/tags/.+$", "/releases/tags/{tag}"),
+        (r"^/commits/[^/]+(/.*)?$", "/commits/{ref}\\1"),
+    ]
+]
+REPO_PATH = re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)(?P<rest>/.*)?$")
+
+
+def parse_endpoint(url: str) -> Tuple[str, Optional[str]]:
+    """Reduce a request URL to its endpoint template and the repo it targets.
+
+    `https://api.github.com/repos/o/r/contents/a/b.txt?ref=x` becomes
+    (`/repos/{owner}/{repo}/contents/{path}`, `o/r`). Enterprise API prefixes
+    such as `/api/v3` are dropped so both hosts report the same templates.
+    """
+    path = urlparse(url).path
+    match = REPO_PATH.search(path)
+    if not match:
+        for prefix in ("/api/v3", "/api"):
+            if path.startswith(prefix + "/"):
+                path = path[len(prefix) :]
+                break
+        return path or "/", None
+
+    rest = match.group("rest") or ""
+    for pattern, template in REPO_ENDPOINT_TEMPLATES:
+        if pattern.match(rest):
+            rest = pattern.sub(template, rest)
+            break
+    repo = f"{match.group('owner')}/{match.group('repo')}"
+    return f"/repos/{{owner}}/{{repo}}{rest}", repo
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class ApiCall:
+    method: str
+    endpoint: str
+    status: int
+    latency: float
+    bytes: int
+    cache_hit: bool
+    host: str
+    repo: Optional[str] = None
+
+    @property
+    def uses_rate_budget(self) -> bool:
+        # Github does not charge the rate limit for conditional requests answered with a 304
+        return self.status != 304
+
+
+def rollup(calls: List[ApiCall]) -> dict:
+    """Counts, latency percentiles (ms), bytes and rate budget used by `calls`."""
+    latencies = [call.latency * 1000 for call in calls]
+    return {
+        "requests": len(calls),
+        "errors": sum(1 for call in calls if call.status >= 400),
+        "cache_hits": sum(1 for call in calls if call.cache_hit),
+        "bytes": sum(call.bytes for call in calls),
+        "rate_budget_consumed": sum(1 for call in calls if call.uses_rate_budget),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies, default=0.0), 2),
+        },
+    }
+
+
+def rollup_by_endpoint(calls: List[ApiCall]) -> Dict[str, dict]:
+    by_endpoint: Dict[str, List[ApiCall]] = {}
+    for call in calls:
+        by_endpoint.setdefault(f"{call.method} {call.endpoint}", []).append(call)
+    return {
+        endpoint: rollup(endpoint_calls)
+        for endpoint, endpoint_calls in sorted(by_endpoint.items())
+    }
+
+
+class ApiMetrics:
+    """Records every Github request a transport sends, see `GithubTransport`.
+
+    Each call is kept with its endpoint template, so a batch report can show
+    which endpoints, and which repos, the time and rate budget went to.
+    Requests that don't target a repo (GraphQL, rate limit checks) only
+    appear in the batch totals.
+    """
+
+    def __init__(self) -> None:
+        self.calls: List[ApiCall] = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        status: int,
+        latency: float,
+        size: int,
+        cache_hit: bool = False,
+    ) -> ApiCall:
+        endpoint, repo = parse_endpoint(url)
+        call = ApiCall(
+            method=method,
+            endpoint=endpoint,
+            status=status,
+            latency=latency,
+            bytes=size,
+            cache_hit=cache_hit,
+            host=urlparse(url).hostname or "",
+            repo=repo,
+        )
+        with self._lock:
+            self.calls.append(call)
+        return call
+
+    def _snapshot(self) -> List[ApiCall]:
+        with self._lock:
+            return list(self.calls)
+
+    def batch_report(self) -> dict:
+        calls = self._snapshot()
+        return {**rollup(calls), "endpoints": rollup_by_endpoint(calls)}
+
+    def repo_reports(self) -> Dict[str, dict]:
+        by_repo: Dict[str, List[ApiCall]] = {}
+        for call in self._snapshot():
+            if call.repo:
+                by_repo.setdefault(call.repo, []).append(call)
+        return {
+            repo: {**rollup(calls), "endpoints": rollup_by_endpoint(calls)}
+            for repo, calls in sorted(by_repo.items())
+        }
+
+    def report(self) -> dict:
+        return {"batch": self.batch_report(), "repos": self.repo_reports()}
+
+    def to_json(self, include_calls: bool = False) -> str:
+        report = self.report()
+        if include_calls:
+            report["calls"] = [asdict(call) for call in self._snapshot()]
+        return json.dumps(report, indent=2)
+
+    def write(self, path: str, include_calls: bool = False):
+        with open(path, "w") as f:
+            f.write(self.to_json(include_calls))
+
+    def clear(self):
+        with self._lock:
+            self.calls = []
@@ -0,0 +1,23 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FileChange:
+    """A new version of one repo file, staged until it is committed."""
+
+    path: str
+    base_sha: str
+    new_content: str
+    commit_message: str
+    base_content: bytes = field(default=b"", repr=False)
+    # git file mode, e.g. 100755 for an executable file
+    mode: str = "100644"
+
+
+@dataclass
+class RepoFile:
+    """Contents of one repo file at a known blob sha."""
+
+    path: str
+    sha: str
+    decoded_content: bytes
@@ -0,0 +1,168 @@
+import threading
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+from socless_repo_updater.file_types.handlers import UPDATE_SPEC_KEYS, run_transforms
+
+if TYPE_CHECKING:
+    from socless_repo_updater.updater import RepoUpdater
+
+
+class RepoPipeline:
+    """Runs repo updates as fetch -> transform -> commit stages, each in its own bounded pool.
+
+    Fetch and commit are network bound and get a thread pool per host, so
+    each host's limit holds per stage. Transform (parse, update, compare)
+    is CPU bound and gets one shared pool, which may be a
+    `ProcessPoolExecutor`. While one repo is being parsed, others are being
+    fetched or committed. On a thread pool the stage runs the updater's
+    own (traced) `transform_files`; a process pool only gets the file
+    contents, so its transforms are not traced.
+
+    At most `max_pending` repos are inside the pipeline at once and
+    `submit` blocks beyond that, so a slow stage holds back new fetches
+    instead of queueing up the whole fleet.
+    """
+
+    def __init__(
+        self,
+        io_workers_per_host: Dict[str, int],
+        transform_workers: int = 2,
+        max_pending: Optional[int] = None,
+        transform_executor: Optional[Executor] = None,
+    ) -> None:
+        """
+        Args:
+            io_workers_per_host: fetch and commit pool size for each host
+            transform_workers: size of the transform pool, if one is not given
+            max_pending: repos allowed in the pipeline at once, defaults to
+                twice the I/O workers
+            transform_executor: pool for the transform stage, not shut down here
+        """
+        self._fetch_pools = self._make_io_pools(io_workers_per_host, "fetch")
+        self._commit_pools = self._make_io_pools(io_workers_per_host, "commit")
+        self._owns_transform_pool = transform_executor is None
+        self._transform_pool = transform_executor or ThreadPoolExecutor(
+            max_workers=transform_workers, thread_name_prefix="pipeline-transform"
+        )
+        if max_pending is None:
+            max_pending = 2 * sum(max(1, n) for n in io_workers_per_host.values())
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._in_flight = 0
+        self._done = threading.Condition()
+
+    @staticmethod
+    def _make_io_pools(
+        workers_per_host: Dict[str, int], stage: str
+    ) -> Dict[str, ThreadPoolExecutor]:
+        return {
+            host: ThreadPoolExecutor(
+                max_workers=max(1, limit), thread_name_prefix=f"pipeline-{stage}-{host}"
+            )
+            for host, limit in workers_per_host.items()
+        }
+
+    def submit(
+        self,
+        host: str,
+        make_repo_updater: Callable[[], "RepoUpdater"],
+        update_kwargs: dict,
+        on_done: Callable[["RepoUpdater"], Any],
+        on_error: Callable[[Exception], Any],
+    ):
+        """Queue one repo, blocking while the pipeline is full.
+
+        `make_repo_updater` runs in the fetch stage, so any API calls it
+        makes count against the host's I/O pool. Exactly one of `on_done`
+        or `on_error` is called once the repo leaves the pipeline.
+        """
+        spec = {
+            key: update_kwargs[key] for key in UPDATE_SPEC_KEYS if key in update_kwargs
+        }
+        atomic_commit = update_kwargs.get("atomic_commit", False)
+
+        def fail(e: Exception):
+            try:
+                on_error(e)
+            finally:
+                self._finish()
+
+        def then(future: Future, next_step: Callable[[Any], None]):
+            try:
+                next_step(future.result())
+            except Exception as e:
+                fail(e)
+
+        def fetch():
+            repo_updater = make_repo_updater()
+            return repo_updater, repo_updater.fetch_files(spec)
+
+        def after_fetch(result):
+            repo_updater, fetched = result
+            if not isinstance(self._transform_pool, ProcessPoolExecutor):
+                self._transform_pool.submit(
+                    repo_updater.transform_files, fetched, spec
+                ).add_done_callback(
+                    lambda future: then(
+                        future, lambda changes: after_transform(repo_updater, changes)
+                    )
+                )
+                return
+            # updaters hold API clients and can't be pickled, so only contents are sent
+            contents = [(handler, file.decoded_content) for handler, file in fetched]
+            self._transform_pool.submit(
+                run_transforms, contents, spec
+            ).add_done_callback(
+                lambda future: then(
+                    future,
+                    lambda results: after_transform(
+                        repo_updater, repo_updater.build_changes(fetched, results)
+                    ),
+                )
+            )
+
+        def after_transform(repo_updater, changes):
+            self._commit_pools[host].submit(
+                repo_updater.commit_changes, changes, atomic_commit
+            ).add_done_callback(
+                lambda future: then(future, lambda _: after_commit(repo_updater))
+            )
+
+        def after_commit(repo_updater):
+            on_done(repo_updater)
+            self._finish()
+
+        self._slots.acquire()
+        with self._done:
+            self._in_flight += 1
+        try:
+            self._fetch_pools[host].submit(fetch).add_done_callback(
+                lambda future: then(future, after_fetch)
+            )
+        except Exception as e:
+            fail(e)
+
+    def _finish(self):
+        with self._done:
+            self._in_flight -= 1
+            self._done.notify_all()
+        self._slots.release()
+
+    def join(self):
+        """Wait for every submitted repo to leave the pipeline, then shut the pools down."""
+        with self._done:
+            self._done.wait_for(lambda: self._in_flight == 0)
+        for pool in [*self._fetch_pools.values(), *self._commit_pools.values()]:
+            pool.shutdown(wait=True)
+        if self._owns_transform_pool:
+            self._transform_pool.shutdown(wait=True)
+
+    def __enter__(self) -> "RepoPipeline":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.join()
@@ -0,0 +1,129 @@
+import difflib
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+from socless_repo_updater.models import FileChange
+from socless_repo_updater.prefetch import RepoSnapshot
+
+PLAN_FORMAT_VERSION = 1
+
+
+def make_unified_diff(path: str, old_content: bytes, new_content: str) -> str:
+    return "".join(
+        difflib.unified_diff(
+            old_content.decode("utf-8").splitlines(keepends=True),
+            new_content.splitlines(keepends=True),
+            fromfile=f"a/{path}",
+            tofile=f"b/{path}",
+        )
+    )
+
+
+@dataclass
+class PlannedFile:
+    path: str
+    base_sha: str
+    new_content: str
+    commit_message: str
+    diff: str
+    mode: str = "100644"
+
+    @classmethod
+    def from_change(cls, change: FileChange) -> "PlannedFile":
+        return cls(
+            path=change.path,
+            base_sha=change.base_sha,
+            new_content=change.new_content,
+            commit_message=change.commit_message,
+            diff=make_unified_diff(
+                change.path, change.base_content, change.new_content
+            ),
+            mode=change.mode,
+        )
+
+    def to_change(self) -> FileChange:
+        return FileChange(
+            path=self.path,
+            base_sha=self.base_sha,
+            new_content=self.new_content,
+            commit_message=self.commit_message,
+            mode=self.mode,
+        )
+
+
+@dataclass
+class RepoPlan:
+    """The changes planned for one repo and the exact state they were planned against."""
+
+    url: str
+    full_name: str
+    default_branch: str
+    head_branch_exists: bool
+    base_commit_sha: str
+    base_tree_sha: str
+    files: List[PlannedFile] = field(default_factory=list)
+
+    def to_changes(self) -> List[FileChange]:
+        return [planned_file.to_change() for planned_file in self.files]
+
+
+def find_plan_conflict(
+    repo_plan: RepoPlan, snapshot: Optional[RepoSnapshot]
+) -> Optional[str]:
+    """Describe how a repo moved on since it was planned, or return None if it did not."""
+    if snapshot is None:
+        return f"could not verify {repo_plan.full_name} before applying the plan"
+    if snapshot.head_branch_exists != repo_plan.head_branch_exists:
+        state = "created" if snapshot.head_branch_exists else "deleted"
+        return f"head branch {snapshot.head_branch} was {state} after planning"
+    for planned_file in repo_plan.files:
+        current_sha = snapshot.file_shas.get(planned_file.path, "")
+        if current_sha != planned_file.base_sha:
+            return f"{planned_file.path} changed after planning ({planned_file.base_sha} -> {current_sha})"
+    return None
+
+
+@dataclass
+class CampaignPlan:
+    """A serializable record of what a campaign would change, written by the plan phase.
+
+    Apply replays it with write calls only, see `SoclessUpdater.apply_plan`.
+    """
+
+    head_branch: str
+    repos: List[RepoPlan] = field(default_factory=list)
+    errors: List[dict] = field(default_factory=list)
+    created_at: str = field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat()
+    )
+    version: int = PLAN_FORMAT_VERSION
+
+    @property
+    def changed_repos(self) -> List[RepoPlan]:
+        return [repo_plan for repo_plan in self.repos if repo_plan.files]
+
+    def write(self, file_path: str):
+        with open(file_path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def read(cls, file_path: str) -> "CampaignPlan":
+        with open(file_path) as f:
+            raw_plan = json.load(f)
+        if raw_plan.get("version") != PLAN_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported plan version {raw_plan.get('version')} in {file_path}"
+            )
+        repos = [
+            RepoPlan(
+                **{
+                    **raw_repo,
+                    "files": [
+                        PlannedFile(**raw_file) for raw_file in raw_repo["files"]
+                    ],
+                }
+            )
+            for raw_repo in raw_plan.pop("repos")
+        ]
+        return cls(repos=repos, **raw_plan)
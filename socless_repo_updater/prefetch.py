@@ -0,0 +1,172 @@
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from github import Github
+from github.Repository import Repository
+from socless_repo_updater.file_types.handlers import FILE_HANDLERS
+from socless_repo_updater.models import RepoFile
+from socless_repo_updater.utils import make_lazy_repository, run_graphql_query
+
+PREFETCH_BATCH_SIZE = 20
+
+
+def get_prefetch_file_paths() -> tuple:
+    """Every file a registered `FileHandler` manages, in registration order."""
+    return tuple(FILE_HANDLERS)
+
+
+@dataclass
+class RepoSnapshot:
+    """Everything `RepoUpdater` needs to read from a repo, fetched ahead of time.
+
+    `files` are read from the head branch if it already existed when the
+    snapshot was taken, otherwise from the default branch.
+    """
+
+    full_name: str
+    default_branch: str
+    default_branch_sha: str
+    head_branch: str
+    head_branch_sha: Optional[str] = None
+    default_tree_sha: str = ""
+    head_tree_sha: Optional[str] = None
+    # blob shas are always fetched, file contents only when asked for
+    file_shas: Dict[str, str] = field(default_factory=dict)
+    files: Dict[str, RepoFile] = field(default_factory=dict)
+
+    @property
+    def head_branch_exists(self) -> bool:
+        return self.head_branch_sha is not None
+
+    @property
+    def base_commit_sha(self) -> str:
+        """The commit `files` were read from."""
+        return self.head_branch_sha or self.default_branch_sha
+
+    @property
+    def base_tree_sha(self) -> str:
+        return self.head_tree_sha or self.default_tree_sha
+
+    def to_repository(self, gh: Github) -> Repository:
+        """Build a lazy `Repository` prefilled from the snapshot, costing no API call."""
+        return make_lazy_repository(gh, self.full_name, self.default_branch)
+
+
+def build_prefetch_query(
+    full_names: List[str],
+    head_branch: str,
+    file_paths: Optional[tuple] = None,
+    include_text: bool = True,
+    extra_file_paths: Optional[Dict[str, tuple]] = None,
+) -> str:
+    """`extra_file_paths` maps a lowercased full name to more paths to read from that repo."""
+    file_paths = file_paths or get_prefetch_file_paths()
+    if include_text:
+        blob_fields = "... on Blob { oid text isBinary isTruncated }"
+    else:
+        blob_fields = "... on Blob { oid }"
+    target_fields = "target { oid ... on Commit { tree { oid } } }"
+    repo_queries = []
+    for repo_index, full_name in enumerate(full_names):
+        owner, name = full_name.split("/")
+        repo_file_paths = get_repo_file_paths(full_name, file_paths, extra_file_paths)
+        file_queries = []
+        for file_index, path in enumerate(repo_file_paths):
+            for prefix, ref in (("default", "HEAD"), ("head", head_branch)):
+                expression = json.dumps(f"{ref}:{path}")
+                file_queries.append(
+                    f"{prefix}{file_index}: object(expression: {expression}) {{ {blob_fields} }}"
+                )
+        repo_queries.append(
+            f"""r{repo_index}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{
+    nameWithOwner
+    defaultBranchRef {{ name {target_fields} }}
+    headRef: ref(qualifiedName: {json.dumps("refs/heads/" + head_branch)}) {{ {target_fields} }}
+    {" ".join(file_queries)}
+  }}"""
+        )
+    return "query {\n  " + "\n  ".join(repo_queries) + "\n}"
+
+
+def get_repo_file_paths(
+    full_name: str, file_paths: tuple, extra_file_paths: Optional[Dict[str, tuple]]
+) -> tuple:
+    extra_paths = (extra_file_paths or {}).get(full_name.lower(), ())
+    return tuple(dict.fromkeys(file_paths + tuple(extra_paths)))
+
+
+def parse_repo_snapshot(
+    repo_data: dict, head_branch: str, file_paths: Optional[tuple] = None
+) -> RepoSnapshot:
+    file_paths = file_paths or get_prefetch_file_paths()
+    default_target = repo_data["defaultBranchRef"]["target"]
+    head_target = (repo_data.get("headRef") or {}).get("target")
+    snapshot = RepoSnapshot(
+        full_name=repo_data["nameWithOwner"],
+        default_branch=repo_data["defaultBranchRef"]["name"],
+        default_branch_sha=default_target["oid"],
+        default_tree_sha=default_target.get("tree", {}).get("oid", ""),
+        head_branch=head_branch,
+        head_branch_sha=head_target["oid"] if head_target else None,
+        head_tree_sha=head_target.get("tree", {}).get("oid") if head_target else None,
+    )
+    prefix = "head" if snapshot.head_branch_exists else "default"
+    for file_index, path in enumerate(file_paths):
+        blob = repo_data.get(f"{prefix}{file_index}")
+        if not blob:
+            continue
+        snapshot.file_shas[path] = blob["oid"]
+        # binary or truncated (>100kb) blobs are left for the REST fallback
+        if "text" in blob and not blob["isBinary"] and not blob["isTruncated"]:
+            snapshot.files[path] = RepoFile(
+                path=path, sha=blob["oid"], decoded_content=blob["text"].encode("utf-8")
+            )
+    return snapshot
+
+
+def prefetch_repo_snapshots(
+    gh: Github,
+    full_names: List[str],
+    head_branch: str,
+    batch_size: int = PREFETCH_BATCH_SIZE,
+    include_text: bool = True,
+    extra_file_paths: Optional[Dict[str, tuple]] = None,
+) -> Dict[str, RepoSnapshot]:
+    """Fetch a `RepoSnapshot` for every repo with one GraphQL query per batch.
+
+    Returns snapshots keyed by lowercased full name. Repos that could not be
+    fetched are left out, so callers fall back to the REST API for them.
+    Without `include_text` only blob shas are fetched, which is enough to
+    tell whether a file changed. `extra_file_paths` adds per-repo paths
+    the registered handlers don't know, keyed by lowercased full name.
+    """
+    snapshots: Dict[str, RepoSnapshot] = {}
+    for start in range(0, len(full_names), batch_size):
+        batch = full_names[start : start + batch_size]
+        try:
+            data = run_graphql_query(
+                gh,
+                build_prefetch_query(
+                    batch,
+                    head_branch,
+                    include_text=include_text,
+                    extra_file_paths=extra_file_paths,
+                ),
+            )
+        except Exception as e:
+            print(f"ERROR | prefetch failed for {len(batch)} repos, falling back - {e}")
+            continue
+        for repo_data in data.values():
+            if not repo_data or not repo_data.get("defaultBranchRef"):
+                continue
+            snapshot = parse_repo_snapshot(
+                repo_data,
+                head_branch,
+                get_repo_file_paths(
+                    repo_data["nameWithOwner"],
+                    get_prefetch_file_paths(),
+                    extra_file_paths,
+                ),
+            )
+            snapshots[snapshot.full_name.lower()] = snapshot
+    return snapshots
@@ -0,0 +1,287 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+import requests
+from github import Github, GithubException
+from github.Repository import Repository
+from socless_repo_updater.constants import GITHUB_DOMAIN
+from socless_repo_updater.exceptions import VersionUpdateException
+
+DEFAULT_RELEASE_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "socless_repo_updater", "releases.sqlite3"
+)
+DEFAULT_RELEASE_TTL = 60 * 60
+DEFAULT_RESOLVER_WORKERS = 8
+NPM_REGISTRY_URL = "https://registry.npmjs.org"
+SOCLESS_PYTHON_REPO = "twilio-labs/socless_python"
+LATEST = "latest"
+
+GITHUB = "github"
+NPM = "npm"
+
+# git+https://github.com/org/repo.git#tag, git+ssh://git@host/org/repo.git#tag
+GIT_DEPENDENCY = re.compile(
+    r"^git\+(?:https?|ssh)://(?:[^@/]+@)?(?P<host>[^/:]+)(?::\d+)?/"
+    r"(?P<full_name>[^/]+/[^/#]+?)(?:\.git)?#(?P<ref>[^#]+)$"
+)
+# npm versions that name one release, ranges like `^1.2.0` are left as they are
+NPM_EXACT_VERSION = re.compile(r"^v?\d+\.\d+\.\d+(?:[-+][0-9A-Za-z.-]+)?$")
+NPM_DIST_TAG = re.compile(r"^[A-Za-z][A-Za-z0-9._-]*$")
+# git refs shaped like release tags, checked as tags only
+TAG_LIKE_REF = re.compile(r"^v?\d+(?:\.\d+)*(?:[-+][0-9A-Za-z.-]+)?$")
+COMMIT_SHA = re.compile(r"^[0-9a-fA-F]{7,40}$")
+# `#semver:^1.2.0` is a range npm resolves at install time
+GIT_SEMVER_RANGE_PREFIX = "semver:"
+
+
+@dataclass(frozen=True)
+class ReleaseTarget:
+    """A requested version to check before a batch starts.
+
+    `name` is a repo full name for `GITHUB` targets and a package name for `NPM` ones.
+    """
+
+    kind: str
+    name: str
+    version: str
+    host: str = GITHUB_DOMAIN
+
+    @property
+    def cache_key(self) -> str:
+        return json.dumps([self.kind, self.host, self.name, self.version])
+
+
+class ReleaseCache:
+    """On-disk record of resolved versions, trusted for `ttl` seconds.
+
+    Only successful resolutions are stored, so a tag published after a
+    failed run is found by the next one.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_RELEASE_CACHE_PATH, ttl: float = DEFAULT_RELEASE_TTL
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS resolved_versions (
+                key TEXT PRIMARY KEY,
+                resolved TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )""")
+        self._db.commit()
+
+    def get(self, target: ReleaseTarget) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT resolved, resolved_at FROM resolved_versions WHERE key = ?",
+                (target.cache_key,),
+            ).fetchone()
+            if not row or time.time() - row[1] > self.ttl:
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, target: ReleaseTarget, resolved: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO resolved_versions VALUES (?, ?, ?)",
+                (target.cache_key, resolved, time.time()),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM resolved_versions")
+            self._db.commit()
+
+
+def get_pj_deps_targets(pj_deps: Optional[dict]) -> Dict[str, ReleaseTarget]:
+    """dependency -> target for every `pj_deps` version that can be checked."""
+    targets = {}
+    for name, version in (pj_deps or {}).items():
+        git_dependency = GIT_DEPENDENCY.match(version)
+        if git_dependency:
+            if git_dependency.group("ref").startswith(GIT_SEMVER_RANGE_PREFIX):
+                continue
+            targets[name] = ReleaseTarget(
+                GITHUB,
+                git_dependency.group("full_name"),
+                git_dependency.group("ref"),
+                git_dependency.group("host"),
+            )
+        elif NPM_EXACT_VERSION.match(version) or NPM_DIST_TAG.match(version):
+            targets[name] = ReleaseTarget(NPM, name, version)
+    return targets
+
+
+def ref_exists(gh_repo: Repository, ref: str) -> bool:
+    """True if exactly `ref`, e.g. "tags/1.2.0", exists.
+
+    PyGithub's `get_git_ref` uses the legacy /git/refs/ endpoint, which
+    answers a missing ref with every ref it is a prefix of instead of a 404,
+    so the singular /git/ref/ endpoint is used.
+    """
+    try:
+        _, data = gh_repo._requester.requestJsonAndCheck(
+            "GET", f"{gh_repo.url}/git/ref/{ref}"
+        )
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        return False
+    return isinstance(data, dict) and data.get("ref") == f"refs/{ref}"
+
+
+def commit_exists(gh_repo: Repository, sha: str) -> bool:
+    try:
+        gh_repo.get_commit(sha)
+    except GithubException as e:
+        # 422 for a sha that isn't a commit
+        if e.status not in (404, 422):
+            raise
+        return False
+    return True
+
+
+class ReleaseResolver:
+    """Checks every requested version exists before a batch branches any repo.
+
+    Github refs and npm versions are looked up concurrently, and what they
+    resolve to is cached in a `ReleaseCache`, so a rerun within the TTL
+    makes no lookups at all. `latest` resolves to the newest release tag.
+    """
+
+    def __init__(
+        self,
+        select_github: Callable[[str], Optional[Github]],
+        cache: Optional[ReleaseCache] = None,
+        max_workers: int = DEFAULT_RESOLVER_WORKERS,
+        npm_registry_url: str = NPM_REGISTRY_URL,
+    ) -> None:
+        """
+        Args:
+            select_github: the Github instance for a host, None if it isn't known
+            cache: where resolved versions are kept, in memory if not given
+        """
+        self.select_github = select_github
+        self.cache = cache or ReleaseCache(":memory:")
+        self.max_workers = max_workers
+        self.npm_registry_url = npm_registry_url.rstrip("/")
+        self.session = requests.Session()
+
+    def resolve(self, targets: List[ReleaseTarget]) -> Dict[ReleaseTarget, str]:
+        """Resolve every target at once, raising one error that names all the bad ones."""
+        resolved: Dict[ReleaseTarget, str] = {}
+        missing = []
+        for target in dict.fromkeys(targets):
+            cached = self.cache.get(target)
+            if cached is None:
+                missing.append(target)
+            else:
+                resolved[target] = cached
+
+        errors: List[str] = []
+        if missing:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(missing))
+            ) as executor:
+                results = executor.map(self._resolve_target, missing)
+                for target, (version, error) in zip(missing, results):
+                    if error:
+                        errors.append(error)
+                        continue
+                    resolved[target] = version  # type: ignore
+                    self.cache.set(target, version)  # type: ignore
+        if errors:
+            raise VersionUpdateException("; ".join(sorted(errors)))
+        print(
+            f"INFO | resolved {len(resolved)} requested versions, {len(resolved) - len(missing)} from cache"
+        )
+        return resolved
+
+    def resolve_update_versions(
+        self, socless_python_version: str = "", pj_deps: dict = None
+    ) -> str:
+        """Validate a campaign's versions, returning the socless_python tag to use."""
+        targets = list(get_pj_deps_targets(pj_deps).values())
+        socless_python_target = None
+        if socless_python_version:
+            socless_python_target = ReleaseTarget(
+                GITHUB, SOCLESS_PYTHON_REPO, socless_python_version
+            )
+            targets.append(socless_python_target)
+        if not targets:
+            return socless_python_version
+
+        resolved = self.resolve(targets)
+        if socless_python_target:
+            return resolved[socless_python_target]
+        return socless_python_version
+
+    def _resolve_target(
+        self, target: ReleaseTarget
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """(resolved version, None) or (None, error)."""
+        try:
+            if target.kind == NPM:
+                return self._resolve_npm_version(target), None
+            return self._resolve_github_ref(target), None
+        except (GithubException, requests.RequestException) as e:
+            return None, f"{target.name}@{target.version} could not be resolved: {e}"
+        except VersionUpdateException as e:
+            return None, str(e)
+
+    def _resolve_github_ref(self, target: ReleaseTarget) -> str:
+        """Check a tag exists, or for refs that don't look like versions, a tag, branch or commit."""
+        gh = self.select_github(target.host)
+        if gh is None:
+            print(
+                f"WARN | no Github instance for {target.host}, not validating {target.name}#{target.version}"
+            )
+            return target.version
+        gh_repo = gh.get_repo(target.name)
+        if target.version == LATEST:
+            return gh_repo.get_latest_release().tag_name
+        if TAG_LIKE_REF.match(target.version):
+            if not ref_exists(gh_repo, f"tags/{target.version}"):
+                raise VersionUpdateException(
+                    f"Tag {target.version} not found for {target.name}"
+                )
+            return target.version
+
+        # e.g. `#master` or `#<commit sha>`, written as given
+        if ref_exists(gh_repo, f"tags/{target.version}") or ref_exists(
+            gh_repo, f"heads/{target.version}"
+        ):
+            return target.version
+        if COMMIT_SHA.match(target.version) and commit_exists(gh_repo, target.version):
+            return target.version
+        raise VersionUpdateException(
+            f"No tag, branch or commit {target.version} found for {target.name}"
+        )
+
+    def _resolve_npm_version(self, target: ReleaseTarget) -> str:
+        response = self.session.get(
+            f"{self.npm_registry_url}/{quote(target.name, safe='@')}/{quote(target.version)}",
+            timeout=10,
+        )
+        if response.status_code == 404:
+            raise VersionUpdateException(
+                f"Version {target.version} not found for npm package {target.name}"
+            )
+        response.raise_for_status()
+        # dist-tags resolve too, but the requested spec is what gets written
+        return target.version
@@ -0,0 +1,99 @@
+import json
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+
+@dataclass
+class RepoResult:
+    """The outcome of one repo in a batch, emitted as soon as the repo finishes."""
+
+    repo: str
+    url: str
+    updated: bool = False
+    pr_url: Optional[str] = None
+    # set instead of `updated` when the repo failed
+    error: Optional[str] = None
+    finished_at: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def make_repo_result(
+    url: str, metrics: Optional[dict] = None, error: Optional[Exception] = None
+) -> RepoResult:
+    """Build a result from a repo's `report_pr_metrics` dict, or the error that stopped it."""
+    metrics = metrics or {}
+    pr = metrics.get("pr")
+    return RepoResult(
+        repo=metrics.get("repo") or url.rstrip("/").rsplit("/", 1)[-1],
+        url=url,
+        updated=bool(metrics.get("updated")),
+        pr_url=getattr(pr, "html_url", None) if pr else None,
+        error=str(error) if error is not None else None,
+        finished_at=time.time(),
+    )
+
+
+class ResultSink(ABC):
+    """Receives every `RepoResult` of a batch, see `SoclessUpdater.add_result_sink`.
+
+    `emit` is called from the worker thread that finished the repo, so
+    sinks must be safe to call concurrently.
+    """
+
+    @abstractmethod
+    def emit(self, result: RepoResult): ...
+
+    def close(self):
+        return
+
+
+class CallbackSink(ResultSink):
+    """Calls `callback` with each result, e.g. to update a dashboard."""
+
+    def __init__(self, callback: Callable[[RepoResult], None]) -> None:
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def emit(self, result: RepoResult):
+        # one result at a time, so callbacks don't need their own locking
+        with self._lock:
+            self.callback(result)
+
+
+class JsonlSink(ResultSink):
+    """Appends each result to a JSONL file as one line, flushed as it is written."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def emit(self, result: RepoResult):
+        line = json.dumps(result.to_dict())
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class QueueSink(ResultSink):
+    """Hands results to another thread, used by `SoclessUpdater.iter_update`."""
+
+    def __init__(self) -> None:
+        self.queue: "queue.Queue[RepoResult]" = queue.Queue()
+
+    def emit(self, result: RepoResult):
+        self.queue.put(result)
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+RATE_LIMITED_STATUSES = (403, 429)
+SECONDARY_RATE_LIMIT_MARKERS = ("secondary rate limit", "abuse detection")
+
+BudgetKey = Tuple[str, str]
+
+
+def make_budget_key(host: str, auth_header: Optional[str]) -> BudgetKey:
+    """Rate limits are tracked per host and per token, never storing the raw token."""
+    if not auth_header:
+        return host, "anonymous"
+    return host, hashlib.sha256(auth_header.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class RateBudget:
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    reset_at: Optional[float] = None
+    blocked_until: float = 0.0
+    tokens: float = 0.0
+    last_refill: float = 0.0
+    throttled_responses: int = 0
+
+
+class RateLimitScheduler:
+    """Paces Github requests and backs off when a host reports rate limiting.
+
+    Every request reserves a slot with `reserve` (or the blocking `wait` /
+    async `await_slot` helpers) and reports its response with `observe`.
+    Slots come from a token bucket per (host, token), and the bucket is
+    closed entirely while Github's primary budget is spent or a
+    `Retry-After` / secondary rate limit is in effect.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = 10.0,
+        burst: int = 10,
+        max_retries: int = 5,
+        secondary_backoff: float = 60.0,
+        max_backoff: float = 900.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.secondary_backoff = secondary_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._budgets: Dict[BudgetKey, RateBudget] = {}
+        self._lock = threading.Lock()
+
+    def _get_budget(self, key: BudgetKey, now: float) -> RateBudget:
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = RateBudget(tokens=self.burst, last_refill=now)
+            self._budgets[key] = budget
+        return budget
+
+    def reserve(self, key: BudgetKey) -> float:
+        """Claim a request slot, returning how many seconds to wait before sending."""
+        with self._lock:
+            now = self.clock()
+            budget = self._get_budget(key, now)
+
+            budget.tokens = min(
+                self.burst,
+                budget.tokens + (now - budget.last_refill) * self.requests_per_second,
+            )
+            budget.last_refill = now
+            budget.tokens -= 1
+            delay = max(0.0, -budget.tokens / self.requests_per_second)
+
+            if budget.reset_at and now >= budget.reset_at:
+                # the window has rolled over, the next response reports the new budget
+                budget.remaining = None
+            if budget.remaining is not None:
+                # count down locally so concurrent callers don't overshoot the budget
+                budget.remaining -= 1
+                if budget.remaining < 0 and budget.reset_at:
+                    delay = max(delay, budget.reset_at - now)
+
+            return max(delay, budget.blocked_until - now)
+
+    def wait(self, key: BudgetKey):
+        delay = self.reserve(key)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_slot(self, key: BudgetKey):
+        delay = self.reserve(key)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def observe(
+        self,
+        key: BudgetKey,
+        status: int,
+        headers: Mapping[str, str],
+        body: str = "",
+        attempt: int = 0,
+    ) -> Optional[float]:
+        """Record a response, returning a retry delay if it was rate limited.
+
+        Returns None when the response should be handed back to the caller,
+        either because it was not throttled or `max_retries` is exhausted.
+        """
+        headers = {k.lower(): v for k, v in headers.items()}
+        with self._lock:
+            now = self.clock()
+            budget = self._get_budget(key, now)
+
+            if "x-ratelimit-limit" in headers:
+                budget.limit = int(headers["x-ratelimit-limit"])
+            if "x-ratelimit-remaining" in headers:
+                budget.remaining = int(headers["x-ratelimit-remaining"])
+            if "x-ratelimit-reset" in headers:
+                budget.reset_at = float(headers["x-ratelimit-reset"])
+
+            if status not in RATE_LIMITED_STATUSES:
+                return None
+
+            delay = self._get_backoff(budget, status, headers, body, attempt, now)
+            if delay is None:
+                return None
+
+            budget.throttled_responses += 1
+            budget.blocked_until = max(budget.blocked_until, now + delay)
+            if attempt >= self.max_retries:
+                return None
+            return delay
+
+    def _get_backoff(
+        self,
+        budget: RateBudget,
+        status: int,
+        headers: Dict[str, str],
+        body: str,
+        attempt: int,
+        now: float,
+    ) -> Optional[float]:
+        if "retry-after" in headers:
+            return min(float(headers["retry-after"]), self.max_backoff)
+        if budget.remaining == 0 and budget.reset_at:
+            # +1s of slack for clock skew between us and Github
+            return min(max(budget.reset_at - now, 0.0) + 1, self.max_backoff)
+        if status == 429 or any(
+            marker in body.lower() for marker in SECONDARY_RATE_LIMIT_MARKERS
+        ):
+            return min(self.secondary_backoff * 2**attempt, self.max_backoff)
+        # a plain 403 is a permissions problem, not throttling
+        return None
+
+    def budget(self) -> Dict[str, dict]:
+        """Report the remaining rate budget for every (host, token) seen so far."""
+        with self._lock:
+            now = self.clock()
+            return {
+                f"{host}/{token_id}": {
+                    "limit": budget.limit,
+                    "remaining": budget.remaining,
+                    "reset_at": budget.reset_at,
+                    "blocked_for": max(0.0, budget.blocked_until - now),
+                    "throttled_responses": budget.throttled_responses,
+                }
+                for (host, token_id), budget in self._budgets.items()
+            }
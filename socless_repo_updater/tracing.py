@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, List
+
+
+class Tracer:
+    """Collects timed spans and exports them in the Chrome trace-event format.
+
+    Each span becomes a complete ("X") event on the thread that ran it, so a
+    written trace opens in `chrome://tracing` or https://ui.perfetto.dev as
+    one timeline row per worker thread. Span arguments (repo, file path)
+    show up when a span is selected.
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self._events: List[dict] = []
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, category: str = "updater", **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), category, **args)
+
+    def add_span(
+        self, name: str, start: float, end: float, category: str = "updater", **args
+    ):
+        """Record a span measured elsewhere, `start` and `end` are `time.perf_counter()` values."""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 3),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": self._pid,
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)  # type: ignore
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in thread_names.items()
+        ]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+
+class NullTracer:
+    """Stands in for `Tracer` when tracing is off, every span is one shared no-op."""
+
+    enabled = False
+    _null_span = nullcontext()
+
+    def span(self, name: str, category: str = "updater", **args) -> ContextManager:
+        return self._null_span
+
+    def add_span(self, *args, **kwargs):
+        return
+
+    def to_dict(self) -> dict:
+        return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+
+NULL_TRACER = NullTracer()
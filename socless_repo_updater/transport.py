@@ -0,0 +1,279 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+import requests
+from github import Github
+from github.Requester import RequestsResponse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from socless_repo_updater.cache import CachedResponse, HttpCache
+from socless_repo_updater.metrics import ApiMetrics
+from socless_repo_updater.scheduler import RateLimitScheduler, make_budget_key
+from socless_repo_updater.utils import get_requester
+
+DEFAULT_POOL_MAXSIZE = 50
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 3
+# answers from a proxy or load balancer in front of Github, not from the API itself
+DEFAULT_RETRY_STATUSES = (502, 503, 504)
+
+
+@dataclass
+class TransportConfig:
+    """Connection pooling, timeouts and retries of a `GithubTransport`.
+
+    Each host gets its own connection pool, sized by `host_pool_sizes` or
+    `pool_maxsize`, so concurrent workers reuse kept-alive connections
+    instead of waiting on (or re-handshaking past) urllib3's default of 10.
+    """
+
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE
+    # host (e.g. `api.github.com` or a GHE hostname) -> pool size
+    host_pool_sizes: Dict[str, int] = field(default_factory=dict)
+    # block instead of opening (and discarding) extra connections once a pool is full
+    pool_block: bool = True
+    keep_alive: bool = True
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    # None uses the timeout the `Github` instance was created with
+    read_timeout: Optional[float] = None
+    # connection errors, and `retry_statuses` of idempotent requests, are retried this often
+    max_retries: int = DEFAULT_MAX_RETRIES
+    retry_backoff: float = 0.5
+    retry_statuses: Tuple[int, ...] = DEFAULT_RETRY_STATUSES
+    gzip: bool = True
+
+    def make_retry(self) -> Retry:
+        # rate limits are retried by `RateLimitScheduler`, which knows the reset times
+        return Retry(
+            total=self.max_retries,
+            backoff_factor=self.retry_backoff,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+
+    def make_headers(self) -> Dict[str, str]:
+        headers = {"Accept-Encoding": "gzip, deflate" if self.gzip else "identity"}
+        if not self.keep_alive:
+            headers["Connection"] = "close"
+        return headers
+
+
+class TransportConnection:
+    """httplib-style connection that PyGithub's `Requester` drives.
+
+    `request` keeps the request on the instance until `getresponse` sends
+    it, so an instance must not be shared between threads. `install` turns
+    off the requester's connection reuse, so PyGithub creates one per
+    request. All of them hand the actual request to the `GithubTransport`
+    they are bound to, whose session does the pooling.
+    """
+
+    transport: "GithubTransport"
+    protocol = "https"
+
+    def __init__(
+        self,
+        host,
+        port=None,
+        strict=False,
+        timeout=None,
+        retry=None,
+        pool_size=None,
+        **kwargs,
+    ):
+        self.host = host
+        self.port = port if port else (443 if self.protocol == "https" else 80)
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+
+    def request(self, verb, url, input, headers):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self):
+        response = self.transport.send(
+            self.verb,
+            f"{self.protocol}://{self.host}:{self.port}{self.url}",
+            headers=self.headers,
+            data=self.input,
+            timeout=self.timeout,
+            verify=self.verify,
+        )
+        return RequestsResponse(response)
+
+    def close(self):
+        return
+
+
+class GithubTransport:
+    """Sends every Github request through one `RateLimitScheduler`.
+
+    Call `install` on a `Github` instance to route its requests here.
+    Rate limited responses are retried after the scheduler's backoff instead
+    of surfacing as a `GithubException`. With an `HttpCache`, GET requests are
+    revalidated with conditional headers and 304s are answered from the cache.
+    With `ApiMetrics`, every request sent (retries included) is recorded.
+    Connections are pooled per host as set by `TransportConfig`, see
+    `connection_stats` for how often they were reused.
+    """
+
+    def __init__(
+        self,
+        scheduler: Optional[RateLimitScheduler] = None,
+        http_cache: Optional[HttpCache] = None,
+        metrics: Optional[ApiMetrics] = None,
+        config: Optional[TransportConfig] = None,
+    ) -> None:
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.http_cache = http_cache
+        self.metrics = metrics
+        self.config = config or TransportConfig()
+        # one session, and so one set of pools, for every client and thread
+        self.session = requests.Session()
+        self.session.headers.update(self.config.make_headers())
+        # host -> the adapter holding that host's connection pool
+        self._adapters: Dict[str, HTTPAdapter] = {}
+        self._adapters_lock = threading.Lock()
+        # hosts without their own pool, e.g. redirects, still get the retry policy
+        for prefix in ("http://", "https://"):
+            self.session.mount(prefix, self._make_adapter(self.config.pool_maxsize))
+        self._connection_classes = {
+            protocol: type(
+                f"{protocol.upper()}TransportConnection",
+                (TransportConnection,),
+                {"transport": self, "protocol": protocol},
+            )
+            for protocol in ("http", "https")
+        }
+
+    def install(self, gh: Github) -> Github:
+        requester = get_requester(gh)
+        scheme = requester._Requester__scheme  # type: ignore
+        self._mount_adapter(
+            scheme,
+            requester._Requester__hostname,  # type: ignore
+            requester._Requester__port,  # type: ignore
+        )
+        requester._Requester__connectionClass = self._connection_classes[scheme]  # type: ignore
+        # a persisted connection would be shared by every worker thread using `gh`
+        requester._Requester__persist = False  # type: ignore
+        return gh
+
+    def _mount_adapter(self, scheme: str, host: str, port: Optional[int]):
+        """Give `host` its own pool, mounted before any worker sends to it."""
+        with self._adapters_lock:
+            if host in self._adapters:
+                return
+            adapter = self._make_adapter(
+                self.config.host_pool_sizes.get(host, self.config.pool_maxsize)
+            )
+            # `TransportConnection` always puts the port in the URL
+            port = port or (443 if scheme == "https" else 80)
+            self.session.mount(f"{scheme}://{host}:{port}/", adapter)
+            self._adapters[host] = adapter
+
+    def _make_adapter(self, pool_maxsize: int) -> HTTPAdapter:
+        return HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_maxsize,
+            max_retries=self.config.make_retry(),
+            pool_block=self.config.pool_block,
+        )
+
+    def connection_stats(self) -> Dict[str, dict]:
+        """Connections opened and requests sent per host, and the share that reused a connection."""
+        stats = {}
+        with self._adapters_lock:
+            adapters = dict(self._adapters)
+        for host, adapter in adapters.items():
+            pools = adapter.poolmanager.pools
+            connections = requests_sent = 0
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    requests_sent += pool.num_requests
+            reused = max(requests_sent - connections, 0)
+            stats[host] = {
+                "pool_maxsize": self.config.host_pool_sizes.get(
+                    host, self.config.pool_maxsize
+                ),
+                "connections": connections,
+                "requests": requests_sent,
+                "reused": reused,
+                "reuse_rate": (
+                    round(reused / requests_sent, 3) if requests_sent else 0.0
+                ),
+            }
+        return stats
+
+    def send(
+        self, verb: str, url: str, headers: dict, **kwargs
+    ) -> Union[requests.Response, CachedResponse]:
+        key = make_budget_key(
+            urlparse(url).hostname or "", headers.get("Authorization")
+        )
+        timeout = kwargs.pop("timeout", None)
+        kwargs["timeout"] = (
+            self.config.connect_timeout,
+            (
+                self.config.read_timeout
+                if self.config.read_timeout is not None
+                else timeout
+            ),
+        )
+
+        cache_key, cached = None, None
+        if self.http_cache and verb == "GET":
+            cache_key = HttpCache.make_key(
+                verb, url, headers.get("Authorization"), headers.get("Accept")
+            )
+            cached = self.http_cache.lookup(cache_key)
+            if cached:
+                headers = {**headers, **cached.conditional_headers()}
+
+        attempt = 0
+        while True:
+            self.scheduler.wait(key)
+            started = time.perf_counter()
+            response = self.session.request(
+                verb, url, headers=headers, allow_redirects=False, **kwargs
+            )
+            if self.metrics:
+                self.metrics.record(
+                    verb,
+                    url,
+                    response.status_code,
+                    time.perf_counter() - started,
+                    len(response.content),
+                    cache_hit=bool(cached) and response.status_code == 304,
+                )
+            delay = self.scheduler.observe(
+                key, response.status_code, response.headers, response.text, attempt
+            )
+            if delay is None:
+                break
+            print(
+                f"WARN | rate limited by {key[0]} ({response.status_code}), retrying {verb} {url} in {delay:.0f}s"
+            )
+            # the scheduler holds the key closed until the backoff has passed
+            attempt += 1
+
+        if cache_key:
+            cached_response = self.http_cache.resolve(  # type: ignore
+                cache_key,
+                cached,
+                url,
+                response.status_code,
+                response.headers,
+                response.text,
+            )
+            if cached_response:
+                return cached_response
+        return response
@@ -1,6 +1,10 @@
-import json
-from typing import List, Tuple, Union
-from github import GithubException
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+from github import Github, GithubException
 from github.ContentFile import ContentFile
 from github.PullRequest import PullRequest
 from github.Repository import Repository
@@ -11,34 +15,112 @@ from socless_repo_parser import (
     get_github_domain,
 )
 from socless_repo_parser.models import RepoMetadata
+from socless_repo_updater.async_updater import (
+    AsyncGithubClient,
+    AsyncRepoUpdater,
+    aiohttp,
+    require_aiohttp,
+)
+from socless_repo_updater.cache import HttpCache
 from socless_repo_updater.constants import (
-    PACKAGE_JSON,
-    REQUIREMENTS_FULL_PATH,
-    SERVERLESS_YML,
+    GITHUB_DOMAIN,
+)
+from socless_repo_updater.exceptions import PlanConflictError, UpdaterError
+from socless_repo_updater.file_types.handlers import (
+    FILE_HANDLERS,
+    FetchedFile,
+    get_requested_handlers,
+    make_update_spec,
+    run_transforms,
+)
+from socless_repo_updater.fleet_index import (
+    FleetIndex,
+    can_skip_compliant,
+    make_spec_hash,
+)
+from socless_repo_updater.git_mirror import (
+    GitMirror,
+    get_clone_url,
+    make_git_auth_header,
+)
+from socless_repo_updater.journal import (
+    DEFAULT_JOURNAL_DIR,
+    CampaignJournal,
+    RepoJournal,
+    RepoProgress,
 )
-from socless_repo_updater.exceptions import UpdaterError
-from socless_repo_updater.file_types.package_json import update_package_json_contents
-from socless_repo_updater.file_types.requirements_txt import (
-    requirements_txt_are_equal,
-    update_socless_python_in_requirements_txt,
+from socless_repo_updater.metrics import ApiMetrics
+from socless_repo_updater.models import FileChange, RepoFile
+from socless_repo_updater.pipeline import RepoPipeline
+from socless_repo_updater.plan import (
+    CampaignPlan,
+    PlannedFile,
+    RepoPlan,
+    find_plan_conflict,
 )
-from socless_repo_updater.file_types.serverless_yml import (
-    update_serverless_yml_content,
-    yaml_files_are_equal,
+from socless_repo_updater.prefetch import RepoSnapshot, prefetch_repo_snapshots
+from socless_repo_updater.releases import ReleaseCache, ReleaseResolver
+from socless_repo_updater.results import (
+    QueueSink,
+    RepoResult,
+    ResultSink,
+    make_repo_result,
 )
+from socless_repo_updater.scheduler import RateLimitScheduler
+from socless_repo_updater.tracing import NULL_TRACER, Tracer
+from socless_repo_updater.transport import GithubTransport, TransportConfig
 from socless_repo_updater.utils import (
-    commit_file_with_pr,
+    build_combined_commit_message,
+    create_commit_from_changes,
+    create_commit_on_branch,
+    get_github_credentials,
+    get_or_create_pr,
+    is_reference_exists_error,
     make_branch_name,
-    validate_socless_python_release,
+    make_lazy_git_ref,
+    make_lazy_repository,
 )
 
 
 class RepoUpdater:
-    def __init__(self, gh_repo: Repository, head_branch: str = "") -> None:
+    def __init__(
+        self,
+        gh_repo: Repository,
+        head_branch: str = "",
+        snapshot: Optional[RepoSnapshot] = None,
+        journal: Optional[RepoJournal] = None,
+        tracer: Optional[Tracer] = None,
+        optimistic_branch: bool = False,
+    ) -> None:
         self.gh_repo = gh_repo
         self.head_branch = head_branch or make_branch_name()
+        # a prefetched snapshot replaces the per-file and per-branch reads
+        self.snapshot = (
+            snapshot if snapshot and snapshot.head_branch == self.head_branch else None
+        )
         self.default_branch = self.gh_repo.default_branch
+        # files are read from the head branch unless planning against a fixed commit
+        self.read_ref = self.head_branch
         self.all_prs: List[PullRequest] = []
+        # resolved at most once per run, see `_get_or_create_pr`
+        self._pr: Optional[PullRequest] = None
+        # steps a previous run of the same campaign finished are skipped
+        self.journal = journal
+        # path -> blob sha of every managed file this run read, see `FleetIndex`
+        self.read_shas: Dict[str, str] = {}
+        self.tracer = tracer or NULL_TRACER
+        # every file path in the tree, see `list_files`
+        self._tree_paths: Optional[List[str]] = None
+        # path -> git file mode, filled in with `_tree_paths`
+        self._tree_modes: Dict[str, str] = {}
+        # create the head branch without checking for it first, see `_create_head_branch_if_nonexistent`
+        self.optimistic_branch = optimistic_branch
+        # the head branch's commit, when a call this run made already returned it
+        self._head_sha: Optional[str] = None
+
+    @property
+    def progress(self) -> RepoProgress:
+        return self.journal.progress if self.journal else RepoProgress()
 
     def get_github_file(self, file_path, branch_name) -> ContentFile:
         file_contents = self.gh_repo.get_contents(path=file_path, ref=branch_name)
@@ -48,17 +130,68 @@ class RepoUpdater:
             )
         return file_contents
 
+    def read_file(self, file_path: str) -> Union[RepoFile, ContentFile]:
+        """Read a managed file from the head branch, preferring the prefetched snapshot.
+
+        Files the snapshot has no text for (binary, too large, or not
+        prefetched at all) are read through the API.
+        """
+        if self.snapshot and file_path in self.snapshot.files:
+            return self.snapshot.files[file_path]
+        return self.get_github_file(file_path, self.read_ref)
+
+    def _read_managed_file(self, file_path: str) -> Union[RepoFile, ContentFile]:
+        with self.tracer.span(
+            "fetch_file", repo=self.gh_repo.full_name, path=file_path
+        ):
+            gh_file_object = self.read_file(file_path)
+        self.read_shas[file_path] = gh_file_object.sha
+        return gh_file_object
+
     def _create_head_branch_if_nonexistent(self):
-        try:
-            _ = self.gh_repo.get_branch(self.head_branch)
-        except GithubException:
+        """Make sure the head branch exists.
+
+        In optimistic mode the branch is created straight from the default
+        branch, and Github refusing because it already exists counts as
+        success. That saves probing for the head branch first, which almost
+        always doesn't exist yet.
+        """
+        if self.snapshot:
+            if self.snapshot.head_branch_exists:
+                self._head_sha = self.snapshot.head_branch_sha
+            else:
+                print(
+                    f"Branch {self.head_branch} does not exist on {self.gh_repo.name}. Creating.."
+                )
+                self._create_head_branch(self.snapshot.default_branch_sha)
+            return
+
+        if not self.optimistic_branch:
+            try:
+                self._head_sha = self.gh_repo.get_branch(self.head_branch).commit.sha
+                return
+            except GithubException as e:
+                if e.status != 404:
+                    raise
             print(
                 f"Branch {self.head_branch} does not exist on {self.gh_repo.name}. Creating.."
             )
-            gh_source = self.gh_repo.get_branch(self.default_branch)
+        gh_source = self.gh_repo.get_branch(self.default_branch)
+        self._create_head_branch(gh_source.commit.sha)
+
+    def _create_head_branch(self, commit_sha: str):
+        try:
             self.gh_repo.create_git_ref(
-                ref="refs/heads/" + self.head_branch, sha=gh_source.commit.sha
+                ref="refs/heads/" + self.head_branch, sha=commit_sha
+            )
+        except GithubException as e:
+            if not is_reference_exists_error(e):
+                raise
+            print(
+                f"INFO | Branch {self.head_branch} already exists on {self.gh_repo.name}"
             )
+            return
+        self._head_sha = commit_sha
 
     def update_in_github(
         self,
@@ -66,19 +199,243 @@ class RepoUpdater:
         pj_replace_only: bool = True,
         sls_yml_changes: dict = None,
         socless_python_version: str = "",
+        requirements_changes: dict = None,
+        atomic_commit: bool = False,
     ):
-        self._create_head_branch_if_nonexistent()
+        """Commit every needed file update to the head branch and open a PR.
+
+        By default each changed file gets its own commit. With `atomic_commit`
+        all changes are written as a single commit on the head branch. Either
+        way the PR is looked up (or opened) once, after the last commit.
+
+        Runs the `fetch_files`, `transform_files` and `commit_changes` stages
+        back to back, `RepoPipeline` overlaps them across repos instead.
+        """
+        spec = make_update_spec(
+            pj_deps,
+            pj_replace_only,
+            sls_yml_changes,
+            socless_python_version,
+            requirements_changes,
+        )
+        fetched = self.fetch_files(spec)
+        self.commit_changes(self.transform_files(fetched, spec), atomic_commit)
+
+    def fetch_files(self, spec: dict) -> List[FetchedFile]:
+        """I/O stage: make sure the head branch exists and read the files `spec` touches."""
+        if not self.progress.branch_created:
+            with self.tracer.span("create_branch", repo=self.gh_repo.full_name):
+                self._create_head_branch_if_nonexistent()
+            if self.journal:
+                self.journal.record_branch_created()
+        return self.read_requested_files(spec)
 
-        if pj_deps:
-            ## update package.json
-            self._update_package_json(pj_deps, pj_replace_only)
+    def read_requested_files(self, spec: dict) -> List[FetchedFile]:
+        """Read the files of every handler `spec` turns on.
 
-        if sls_yml_changes:
-            ## update serverless.yml
-            self._update_serverless_yml(sls_yml_changes)
+        Handlers that discover their files (e.g. every `requirements*.txt`)
+        list the repo tree once. Files a previous run of the same campaign
+        already committed are not read again.
+        """
+        committed_files = self.progress.committed_files
+        handlers = get_requested_handlers(spec)
+        tree_paths = (
+            self.list_files()
+            if any(handler.discovers_files(spec) for handler in handlers)
+            else []
+        )
+        return [
+            (handler, self._read_managed_file(path))
+            for handler in handlers
+            for path in handler.get_paths(spec, tree_paths)
+            if path not in committed_files
+        ]
+
+    def list_files(self) -> List[str]:
+        """Path of every file in the tree files are read from, listed once per run."""
+        if self._tree_paths is None:
+            tree_ref = self.read_ref
+            if self.snapshot and self.snapshot.base_tree_sha:
+                tree_ref = self.snapshot.base_tree_sha
+            tree = self.gh_repo.get_git_tree(tree_ref, recursive=True)
+            if tree.raw_data.get("truncated"):
+                print(
+                    f"WARN | file tree of {self.gh_repo.full_name} is truncated, some files may not be updated"
+                )
+            self._tree_paths = [
+                element.path for element in tree.tree if element.type == "blob"
+            ]
+            self._tree_modes = {
+                element.path: element.mode
+                for element in tree.tree
+                if element.type == "blob"
+            }
+        return self._tree_paths
+
+    def get_file_modes(self) -> Dict[str, str]:
+        """Git file mode of every file in the tree files are read from."""
+        self.list_files()
+        return self._tree_modes
+
+    def transform_files(
+        self, fetched: List[FetchedFile], spec: dict
+    ) -> List[FileChange]:
+        """CPU stage: parse, update and compare each fetched file, without any I/O."""
+        if not self.tracer.enabled:
+            contents = [(handler, file.decoded_content) for handler, file in fetched]
+            return self.build_changes(fetched, run_transforms(contents, spec))
+
+        results = []
+        for handler, file in fetched:
+            with self.tracer.span(
+                "transform", repo=self.gh_repo.full_name, path=file.path
+            ):
+                results.append(handler.transform(file.decoded_content, spec))
+        return self.build_changes(fetched, results)
+
+    @staticmethod
+    def build_changes(
+        fetched: List[FetchedFile], results: List[Optional[Tuple[str, str]]]
+    ) -> List[FileChange]:
+        """Pair each fetched file with its transform result, keeping only the ones that changed."""
+        return [
+            FileChange(
+                path=file.path,
+                base_sha=file.sha,
+                base_content=file.decoded_content,
+                new_content=result[0],
+                commit_message=result[1],
+            )
+            for (_, file), result in zip(fetched, results)
+            if result
+        ]
+
+    def commit_changes(self, changes: List[FileChange], atomic_commit: bool = False):
+        """I/O stage: commit `changes` to the head branch and find or open the PR."""
+        # a resumed run may have committed everything but not opened the PR yet
+        if not changes and not self.progress.committed_files:
+            return
+
+        if atomic_commit:
+            # an empty createCommitOnBranch would still push an empty commit
+            if changes:
+                self._commit_changes_atomically(changes)
+        else:
+            for change in changes:
+                self._commit_file(change)
 
-        if socless_python_version:
-            self._update_socless_python_version(socless_python_version)
+        # save pr for metrics analysis
+        self.all_prs.append(self._get_or_create_pr())
+
+    def collect_changes(
+        self,
+        pj_deps: dict = None,
+        pj_replace_only: bool = True,
+        sls_yml_changes: dict = None,
+        socless_python_version: str = "",
+        requirements_changes: dict = None,
+    ) -> List[FileChange]:
+        """Read and transform each managed file, returning only the ones that changed."""
+        spec = make_update_spec(
+            pj_deps,
+            pj_replace_only,
+            sls_yml_changes,
+            socless_python_version,
+            requirements_changes,
+        )
+        return self.transform_files(self.read_requested_files(spec), spec)
+
+    def plan_changes(
+        self,
+        repo_url: str = "",
+        pj_deps: dict = None,
+        pj_replace_only: bool = True,
+        sls_yml_changes: dict = None,
+        socless_python_version: str = "",
+        requirements_changes: dict = None,
+    ) -> RepoPlan:
+        """Work out this repo's changes without writing anything to Github.
+
+        Files are read from the head branch if it exists, otherwise from the
+        default branch, pinned to that branch's current commit.
+        """
+        head_branch_exists, base_commit_sha, base_tree_sha = self._get_base_commit()
+        self.read_ref = base_commit_sha
+        changes = self.collect_changes(
+            pj_deps,
+            pj_replace_only,
+            sls_yml_changes,
+            socless_python_version,
+            requirements_changes,
+        )
+        if changes:
+            # applying writes a whole tree entry, so keep e.g. executable bits
+            file_modes = self.get_file_modes()
+            for change in changes:
+                change.mode = file_modes.get(change.path, change.mode)
+        return RepoPlan(
+            url=repo_url,
+            full_name=self.gh_repo.full_name,
+            default_branch=self.default_branch,
+            head_branch_exists=head_branch_exists,
+            base_commit_sha=base_commit_sha,
+            base_tree_sha=base_tree_sha,
+            files=[PlannedFile.from_change(change) for change in changes],
+        )
+
+    def apply_plan(self, repo_plan: RepoPlan):
+        """Replay a `RepoPlan` using only write calls.
+
+        The planned commit is built on the planned base commit, and the head
+        branch is created at it (or fast-forwarded to it, never forced).
+        Github refuses both if the branch changed since planning, which
+        surfaces as a `PlanConflictError`.
+        """
+        if not repo_plan.files:
+            return
+
+        commit = create_commit_from_changes(
+            self.gh_repo,
+            repo_plan.to_changes(),
+            repo_plan.base_commit_sha,
+            repo_plan.base_tree_sha,
+        )
+        try:
+            if repo_plan.head_branch_exists:
+                make_lazy_git_ref(self.gh_repo, self.head_branch).edit(sha=commit.sha)
+            else:
+                self.gh_repo.create_git_ref(
+                    ref="refs/heads/" + self.head_branch, sha=commit.sha
+                )
+        except GithubException as e:
+            if e.status == 422:
+                raise PlanConflictError(
+                    f"{self.head_branch} on {repo_plan.full_name} changed since planning"
+                ) from e
+            raise
+
+        # save pr for metrics analysis
+        self.all_prs.append(
+            self._get_or_create_pr(new_branch=not repo_plan.head_branch_exists)
+        )
+
+    def _get_base_commit(self) -> Tuple[bool, str, str]:
+        """Return (head branch exists, commit sha, tree sha) of the branch to read from."""
+        if self.snapshot:
+            return (
+                self.snapshot.head_branch_exists,
+                self.snapshot.base_commit_sha,
+                self.snapshot.base_tree_sha,
+            )
+        try:
+            branch = self.gh_repo.get_branch(self.head_branch)
+            head_branch_exists = True
+        except GithubException as e:
+            if e.status != 404:
+                raise
+            branch = self.gh_repo.get_branch(self.default_branch)
+            head_branch_exists = False
+        return head_branch_exists, branch.commit.sha, branch.commit.commit.tree.sha
 
     def report_pr_metrics(self):
         ## check if all update commits went to same PR
@@ -92,192 +449,1113 @@ class RepoUpdater:
         else:
             return {"repo": self.gh_repo.name, "updated": False, "pr": False}
 
-    def _update_package_json(self, pj_deps, pj_replace_only):
-        gh_file_object = self.get_github_file(PACKAGE_JSON, self.head_branch)
-        as_json = json.loads(gh_file_object.decoded_content)
-        new_package_json = update_package_json_contents(
-            as_json, pj_deps, pj_replace_only
-        )
+    def _commit_file(self, change: FileChange):
+        with self.tracer.span(
+            "commit_file", repo=self.gh_repo.full_name, path=change.path
+        ):
+            result = self.gh_repo.update_file(
+                path=change.path,
+                message=change.commit_message,
+                content=change.new_content,
+                sha=change.base_sha,
+                branch=self.head_branch,
+            )
+        self._head_sha = result["commit"].sha
+        if self.journal:
+            self.journal.record_file_committed(change.path, result["commit"].sha)
+
+    def _get_or_create_pr(self, new_branch: bool = False) -> PullRequest:
+        if self._pr is not None:
+            return self._pr
+
+        with self.tracer.span("pr_lookup", repo=self.gh_repo.full_name):
+            return self._find_or_open_pr(new_branch)
 
-        if as_json == new_package_json:
-            print("No changes made, package.json dependencies are current.")
+    def _find_or_open_pr(self, new_branch: bool) -> PullRequest:
+        if self.progress.pr:
+            # opened by a previous run of this campaign
+            self._pr = self.progress.pr  # type: ignore
+        elif new_branch:
+            # a branch created just now can't have a PR yet
+            self._pr = self.gh_repo.create_pull(
+                title="CLI- dependency version bump",
+                body="updating dependencies, please check changed files",
+                base=self.default_branch,
+                head=self.head_branch,
+            )
         else:
-            ## file has changed, commit changes & update PR
-            new_content = json.dumps(new_package_json, indent=2)
-            pr = self._commit_file_helper(
-                gh_file_object,
-                new_content,
-                commit_message="updating versions for: "
-                + " ".join(new_package_json["dependencies"].keys()),
+            self._pr = get_or_create_pr(
+                self.gh_repo,
+                self.default_branch,
+                self.head_branch,
+                head_owner=self.gh_repo.owner.login,
             )
-            # save pr for metrics analysis
-            self.all_prs.append(pr)
 
-    def _update_serverless_yml(self, sls_yml_changes: dict):
-        gh_file_object = self.get_github_file(SERVERLESS_YML, self.head_branch)
+        if self.journal and not self.progress.pr:
+            self.journal.record_pr_opened(self._pr.number, self._pr.html_url)
+        return self._pr  # type: ignore
 
-        new_content = update_serverless_yml_content(
-            gh_file_object.decoded_content, sls_yml_changes
-        )
+    def _commit_changes_atomically(self, changes: List[FileChange]) -> str:
+        """Write all changes as one commit on the head branch, returning its sha.
 
-        if yaml_files_are_equal(gh_file_object.decoded_content, new_content):
-            print("No changes made, serverless.yml files are the same.")
-        else:
-            pr = self._commit_file_helper(
-                gh_file_object,
-                new_content,
-                commit_message=f"updating serverless.yml with: {json.dumps(sls_yml_changes)}",
+        One `createCommitOnBranch` GraphQL mutation is the only write, so
+        either every file lands or none do. The head branch's commit is
+        usually known from creating or probing the branch, otherwise it is
+        read once.
+        """
+        with self.tracer.span(
+            "commit", repo=self.gh_repo.full_name, files=len(changes)
+        ):
+            head_sha = (
+                self._head_sha or self.gh_repo.get_branch(self.head_branch).commit.sha
+            )
+            # refused if the branch moved since `head_sha`, so it is never overwritten
+            commit_sha = create_commit_on_branch(
+                self.gh_repo, self.head_branch, changes, head_sha
             )
-            # save pr for metrics analysis
-            self.all_prs.append(pr)
+            self._head_sha = commit_sha
+        if self.journal:
+            for change in changes:
+                self.journal.record_file_committed(change.path, commit_sha)
+        return commit_sha
 
-    def _update_socless_python_version(self, socless_python_version: str):
-        gh_file_object = self.get_github_file(REQUIREMENTS_FULL_PATH, self.head_branch)
 
-        new_requirements = update_socless_python_in_requirements_txt(
-            gh_file_object.decoded_content, socless_python_version
-        )
+class GitMirrorRepoUpdater(RepoUpdater):
+    """`RepoUpdater` that reads and commits through a local bare mirror of the repo.
 
-        if requirements_txt_are_equal(gh_file_object.decoded_content, new_requirements):
-            print("No changes made, requirements.txt files are the same.")
-        else:
-            pr = self._commit_file_helper(
-                gh_file_object,
-                new_requirements,
-                commit_message=f"updating requirements.txt to socless_python v{socless_python_version}",
+    The mirror is fetched once, every managed file is read in a single
+    `git cat-file --batch`, and all changes are pushed as one commit, so the
+    API is only used to find or open the PR.
+    """
+
+    def __init__(
+        self,
+        gh_repo: Repository,
+        mirror: GitMirror,
+        head_branch: str = "",
+        journal: Optional[RepoJournal] = None,
+        tracer: Optional[Tracer] = None,
+    ) -> None:
+        super().__init__(gh_repo, head_branch, journal=journal, tracer=tracer)
+        self.mirror = mirror
+        self._base: Optional[Tuple[bool, str, str]] = None
+        self._files: Optional[Dict[str, RepoFile]] = None
+
+    def _get_base_commit(self) -> Tuple[bool, str, str]:
+        if self._base is None:
+            with self.tracer.span("mirror_sync", repo=self.gh_repo.full_name):
+                self.mirror.sync()
+            head_sha = self.mirror.resolve_branch(self.head_branch)
+            base_sha = head_sha or self.mirror.resolve_branch(self.default_branch)
+            if not base_sha:
+                raise UpdaterError(
+                    f"Default branch {self.default_branch} not found in mirror of {self.gh_repo.full_name}"
+                )
+            tree_sha = self.mirror.resolve(f"{base_sha}^{{tree}}")
+            self._base = (head_sha is not None, base_sha, tree_sha)  # type: ignore
+        return self._base
+
+    def read_file(self, file_path: str) -> RepoFile:
+        _, base_sha, _ = self._get_base_commit()
+        if self._files is None:
+            self._files = self.mirror.read_files(base_sha, list(FILE_HANDLERS))
+        if file_path not in self._files and file_path in self.list_files():
+            # discovered files, e.g. per-function requirements.txt, are read in one more batch
+            discovered = [
+                path
+                for path in self.list_files()
+                if path not in self._files
+                and any(handler.matches(path) for handler in FILE_HANDLERS.values())
+            ]
+            self._files.update(
+                self.mirror.read_files(base_sha, [file_path] + discovered)
             )
-            # save pr for metrics analysis
-            self.all_prs.append(pr)
+        if file_path not in self._files:
+            raise UpdaterError(
+                f"{file_path} not found in mirror of {self.gh_repo.full_name}"
+            )
+        return self._files[file_path]
 
-    def _commit_file_helper(
-        self, gh_file_object: ContentFile, new_content: str, commit_message: str
-    ) -> PullRequest:
-        pr = commit_file_with_pr(
-            self.gh_repo,
-            gh_file_object,
-            new_content,
-            gh_file_object.path,
-            self.head_branch,
-            self.default_branch,
-            commit_message,
-        )
-        return pr
+    def list_files(self) -> List[str]:
+        if self._tree_paths is None:
+            _, base_sha, _ = self._get_base_commit()
+            self._tree_modes = self.mirror.list_file_modes(base_sha)
+            self._tree_paths = list(self._tree_modes)
+        return self._tree_paths
+
+    def fetch_files(self, spec: dict) -> List[FetchedFile]:
+        # the head branch is created by the push
+        self._get_base_commit()
+        return self.read_requested_files(spec)
+
+    def commit_changes(self, changes: List[FileChange], atomic_commit: bool = False):
+        """Push `changes` to the head branch as one commit and open a PR.
+
+        Changes always land atomically, `atomic_commit` is accepted for
+        compatibility with `RepoUpdater`.
+        """
+        head_branch_exists, base_sha, _ = self._get_base_commit()
+        if not changes and not self.progress.committed_files:
+            return
+
+        if changes:
+            with self.tracer.span(
+                "commit", repo=self.gh_repo.full_name, files=len(changes)
+            ):
+                commit_sha = self.mirror.commit_files(
+                    base_sha, changes, build_combined_commit_message(changes)
+                )
+                self.mirror.push(commit_sha, self.head_branch)
+            if self.journal:
+                for change in changes:
+                    self.journal.record_file_committed(change.path, commit_sha)
+
+        # save pr for metrics analysis
+        self.all_prs.append(self._get_or_create_pr(new_branch=not head_branch_exists))
 
 
 class SoclessUpdater(SoclessGithubWrapper):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        scheduler: Optional[RateLimitScheduler] = None,
+        http_cache: Optional[HttpCache] = None,
+        journal_dir: str = DEFAULT_JOURNAL_DIR,
+        fleet_index: Optional[FleetIndex] = None,
+        tracer: Optional[Tracer] = None,
+        release_cache: Optional[ReleaseCache] = None,
+        optimistic_branch: bool = False,
+        transport_config: Optional[TransportConfig] = None,
+        result_sinks: Optional[List[ResultSink]] = None,
+    ) -> None:
+        """
+        Args:
+            scheduler: paces every Github request, one is created if not given
+            http_cache: optional on-disk response cache, see `HttpCache`
+            journal_dir: where campaign journals are kept, see `CampaignJournal`
+            fleet_index: optional record of compliant repos to skip, see `FleetIndex`
+            tracer: records phase timings for `export_trace`, off if not given
+            release_cache: optional on-disk cache of resolved versions, see `ReleaseResolver`
+            optimistic_branch: create head branches without checking for them first,
+                see `RepoUpdater._create_head_branch_if_nonexistent`
+            transport_config: connection pool sizes, timeouts and retries shared by
+                the Github and GHE clients, see `TransportConfig`
+            result_sinks: receive each repo's `RepoResult` as soon as it finishes,
+                see `JsonlSink` and `CallbackSink`
+        """
         super().__init__()
         self.prs_for_all_repos: List[PullRequest] = []
         self.metrics_for_all_repos: List[dict] = []
         self.errors: List[Tuple[RepoMetadata, Exception]] = []
         self.all_repos: List[RepoMetadata] = []
+        # repos may be updated from several worker threads at once
+        self._results_lock = threading.Lock()
+        self.result_sinks: List[ResultSink] = list(result_sinks or [])
+        # every github request made by this updater is paced by one scheduler
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.http_cache = http_cache
+        # every request sent through the transport, rolled up by `report_all_metrics`
+        self.api_metrics = ApiMetrics()
+        self.transport = GithubTransport(
+            self.scheduler, http_cache, self.api_metrics, transport_config
+        )
+        self.journal_dir = journal_dir
+        self.fleet_index = fleet_index
+        self.tracer = tracer or NULL_TRACER
+        # requested versions are checked once per batch, before any repo is touched
+        self.release_resolver = ReleaseResolver(
+            self._select_release_github, release_cache
+        )
+        self.optimistic_branch = optimistic_branch
+        # set for the duration of a run started with a campaign_id
+        self.journal: Optional[CampaignJournal] = None
+
+    def get_or_init_github(self, *args, **kwargs) -> Github:
+        return self.transport.install(super().get_or_init_github(*args, **kwargs))
+
+    def get_or_init_github_enterprise(self, *args, **kwargs) -> Github:
+        return self.transport.install(
+            super().get_or_init_github_enterprise(*args, **kwargs)
+        )
+
+    def _select_release_github(self, host: str) -> Optional[Github]:
+        if host == GITHUB_DOMAIN:
+            return self.get_or_init_github()
+        if self.github_enterprise and host == get_github_domain(self.github_enterprise):
+            return self.get_or_init_github_enterprise()
+        return None
+
+    def resolve_versions(
+        self, socless_python_version: str = "", pj_deps: dict = None
+    ) -> str:
+        """Check every requested version exists, returning the socless_python tag to use.
+
+        Raises `VersionUpdateException` naming every bad version, before any
+        repo has been branched, see `ReleaseResolver`.
+        """
+        return self.release_resolver.resolve_update_versions(
+            socless_python_version, pj_deps
+        )
+
+    def rate_budget(self) -> Dict[str, dict]:
+        """Remaining Github rate budget per host and token, see `RateLimitScheduler`."""
+        return self.scheduler.budget()
+
+    def http_cache_stats(self) -> dict:
+        """Hit rate and size of the response cache, empty if caching is off."""
+        return self.http_cache.stats() if self.http_cache else {}
+
+    def export_api_metrics(self, path: str, include_calls: bool = False):
+        """Write the per-repo and batch API call rollups to `path` as JSON.
+
+        With `include_calls`, every recorded request is written out as well.
+        """
+        self.api_metrics.write(path, include_calls)
+
+    def export_trace(self, path: str):
+        """Write the recorded phase spans to `path` as a Chrome trace-event JSON file.
+
+        Open it in `chrome://tracing` or https://ui.perfetto.dev. Empty unless
+        the updater was created with a `Tracer`.
+        """
+        self.tracer.write(path)
 
     def update_with_github_enterprise(
         self,
-        repo_list: Union[str, List[str]],
+        repo_list: Union[str, List[str], Iterable[RepoMetadata]],
         token: str = "",
         domain: str = "",
         pj_deps: dict = None,
         pj_replace_only: bool = True,
         sls_yml_changes: dict = None,
         socless_python_version: str = "",
+        requirements_changes: dict = None,
         head_branch="",
+        max_workers: int = 1,
+        max_ghe_workers: int = 1,
+        atomic_commit: bool = False,
+        prefetch: bool = False,
+        git_mirror_dir: str = "",
+        campaign_id: str = "",
+        pipeline: bool = False,
     ):
-        self.get_or_init_github_enterprise(token, domain)
-        ghe_domain = get_github_domain(self.github_enterprise)  # type: ignore
+        """Update repos hosted on github.com and on a Github Enterprise host.
+
+        `max_workers` bounds how many github.com repos are updated at once and
+        `max_ghe_workers` does the same for the enterprise host. With
+        `atomic_commit` each repo's file updates land as a single commit, and
+        `prefetch` reads every repo's branches and files up front in batched
+        GraphQL queries instead of per-file REST calls. With `git_mirror_dir`
+        repos are read and pushed through bare mirrors kept in that directory,
+        see `GitMirrorRepoUpdater`. Runs given a `campaign_id` journal their
+        progress, and rerunning the same campaign resumes where it stopped.
+        With `pipeline`, fetching, parsing and committing overlap across repos,
+        see `RepoPipeline`. `requirements_changes` maps package names to the
+        versions to set in every `requirements*.txt` in each repo, while
+        `socless_python_version` only updates `functions/requirements.txt`.
+        `repo_list` can also be a generator of repos, see `discover_socless_repos`,
+        which is read as the batch runs so updates start before it is exhausted.
+        """
+        ghe_domain, select_github = self._get_enterprise_selector(token, domain)
+
+        # validate args to update _before_ starting the batch
+        socless_python_version = self.resolve_versions(socless_python_version, pj_deps)
+
+        self._update_batch(
+            self._parse_repos(repo_list),
+            select_github,
+            max_workers_per_host={
+                GITHUB_DOMAIN: max_workers,
+                ghe_domain: max_ghe_workers,
+            },
+            head_branch=self._start_campaign(campaign_id, head_branch),
+            update_kwargs=dict(
+                pj_deps=pj_deps,
+                pj_replace_only=pj_replace_only,
+                sls_yml_changes=sls_yml_changes,
+                socless_python_version=socless_python_version,
+                requirements_changes=requirements_changes,
+                atomic_commit=atomic_commit,
+            ),
+            check_auth=True,
+            prefetch=prefetch,
+            git_mirror_dir=git_mirror_dir,
+            pipeline=pipeline,
+        )
 
+        return self.report_all_metrics()
+
+    def update_with_regular_github(
+        self,
+        repo_list: Union[str, List[str], Iterable[RepoMetadata]],
+        token: str = "",
+        pj_deps: dict = None,
+        pj_replace_only: bool = True,
+        sls_yml_changes: dict = None,
+        socless_python_version: str = "",
+        requirements_changes: dict = None,
+        head_branch="",
+        max_workers: int = 1,
+        atomic_commit: bool = False,
+        prefetch: bool = False,
+        git_mirror_dir: str = "",
+        campaign_id: str = "",
+        pipeline: bool = False,
+    ):
+        """Update repos hosted on github.com, `max_workers` of them at a time."""
+        gh = self.get_or_init_github(token=token, required=True)
         # validate args to update _before_ starting the batch
-        if socless_python_version:
-            socless_python_version = validate_socless_python_release(
-                self.get_or_init_github(), socless_python_version
+        socless_python_version = self.resolve_versions(socless_python_version, pj_deps)
+
+        self._update_batch(
+            self._parse_repos(repo_list),
+            lambda _: (GITHUB_DOMAIN, gh),
+            max_workers_per_host={GITHUB_DOMAIN: max_workers},
+            head_branch=self._start_campaign(campaign_id, head_branch),
+            update_kwargs=dict(
+                pj_deps=pj_deps,
+                pj_replace_only=pj_replace_only,
+                sls_yml_changes=sls_yml_changes,
+                socless_python_version=socless_python_version,
+                requirements_changes=requirements_changes,
+                atomic_commit=atomic_commit,
+            ),
+            prefetch=prefetch,
+            git_mirror_dir=git_mirror_dir,
+            pipeline=pipeline,
+        )
+
+        return self.report_all_metrics()
+
+    def plan_with_github_enterprise(
+        self,
+        repo_list: Union[str, List[str], Iterable[RepoMetadata]],
+        plan_path: str,
+        token: str = "",
+        domain: str = "",
+        pj_deps: dict = None,
+        pj_replace_only: bool = True,
+        sls_yml_changes: dict = None,
+        socless_python_version: str = "",
+        requirements_changes: dict = None,
+        head_branch="",
+        max_workers: int = 1,
+        max_ghe_workers: int = 1,
+        prefetch: bool = False,
+    ) -> CampaignPlan:
+        """Read-only counterpart of `update_with_github_enterprise`.
+
+        Fetches and transforms every repo without writing to Github, and saves
+        the resulting `CampaignPlan` to `plan_path` for `apply_plan`.
+        """
+        ghe_domain, select_github = self._get_enterprise_selector(token, domain)
+
+        socless_python_version = self.resolve_versions(socless_python_version, pj_deps)
+
+        plan = CampaignPlan(head_branch=head_branch or make_branch_name())
+        self._update_batch(
+            self._parse_repos(repo_list),
+            select_github,
+            max_workers_per_host={
+                GITHUB_DOMAIN: max_workers,
+                ghe_domain: max_ghe_workers,
+            },
+            head_branch=plan.head_branch,
+            update_kwargs=dict(
+                pj_deps=pj_deps,
+                pj_replace_only=pj_replace_only,
+                sls_yml_changes=sls_yml_changes,
+                socless_python_version=socless_python_version,
+                requirements_changes=requirements_changes,
+            ),
+            check_auth=True,
+            prefetch=prefetch,
+            plan=plan,
+        )
+        return self._write_plan(plan, plan_path)
+
+    def plan_with_regular_github(
+        self,
+        repo_list: Union[str, List[str], Iterable[RepoMetadata]],
+        plan_path: str,
+        token: str = "",
+        pj_deps: dict = None,
+        pj_replace_only: bool = True,
+        sls_yml_changes: dict = None,
+        socless_python_version: str = "",
+        requirements_changes: dict = None,
+        head_branch="",
+        max_workers: int = 1,
+        prefetch: bool = False,
+    ) -> CampaignPlan:
+        """Read-only counterpart of `update_with_regular_github`, see `plan_with_github_enterprise`."""
+        gh = self.get_or_init_github(token=token, required=True)
+        socless_python_version = self.resolve_versions(socless_python_version, pj_deps)
+
+        plan = CampaignPlan(head_branch=head_branch or make_branch_name())
+        self._update_batch(
+            self._parse_repos(repo_list),
+            lambda _: (GITHUB_DOMAIN, gh),
+            max_workers_per_host={GITHUB_DOMAIN: max_workers},
+            head_branch=plan.head_branch,
+            update_kwargs=dict(
+                pj_deps=pj_deps,
+                pj_replace_only=pj_replace_only,
+                sls_yml_changes=sls_yml_changes,
+                socless_python_version=socless_python_version,
+                requirements_changes=requirements_changes,
+            ),
+            prefetch=prefetch,
+            plan=plan,
+        )
+        return self._write_plan(plan, plan_path)
+
+    def apply_plan(
+        self,
+        plan_path: str,
+        token: str = "",
+        domain: str = "",
+        max_workers: int = 1,
+        max_ghe_workers: int = 1,
+        verify: bool = True,
+    ):
+        """Apply a plan written by `plan_with_*`, opening one commit and PR per changed repo.
+
+        With `verify`, the current blob shas of every planned file are checked
+        in batched GraphQL queries first, and repos whose files changed since
+        planning are refused. Everything else is write calls only.
+        """
+        plan = CampaignPlan.read(plan_path)
+        repo_plans = {repo_plan.url: repo_plan for repo_plan in plan.changed_repos}
+        repos_metadata = self._parse_repos(list(repo_plans))
+
+        max_workers_per_host = {GITHUB_DOMAIN: max_workers}
+        if any(urlparse(url).hostname != GITHUB_DOMAIN for url in repo_plans):
+            ghe_domain, select_github = self._get_enterprise_selector(token, domain)
+            max_workers_per_host[ghe_domain] = max_ghe_workers
+        else:
+            gh = self.get_or_init_github(token=token, required=True)
+            select_github = lambda _: (GITHUB_DOMAIN, gh)  # noqa: E731
+
+        conflicts: Dict[str, str] = {}
+        if verify:
+            # discovered files, e.g. per-function requirements, aren't handler paths
+            planned_paths = {
+                repo_plan.full_name.lower(): tuple(
+                    planned_file.path for planned_file in repo_plan.files
+                )
+                for repo_plan in repo_plans.values()
+            }
+            snapshots = self._prefetch_snapshots(
+                repos_metadata,
+                select_github,
+                plan.head_branch,
+                include_text=False,
+                extra_file_paths=planned_paths,
+            )
+            for url, repo_plan in repo_plans.items():
+                snapshot = snapshots.get(repo_plan.full_name.lower())
+                conflict = find_plan_conflict(repo_plan, snapshot)
+                if conflict:
+                    conflicts[url] = conflict
+
+        def apply_repo(gh: Github, repo_meta: RepoMetadata):
+            try:
+                repo_plan = repo_plans[repo_meta.url]
+                if repo_meta.url in conflicts:
+                    raise PlanConflictError(conflicts[repo_meta.url])
+                gh_repo = make_lazy_repository(
+                    gh, repo_plan.full_name, repo_plan.default_branch
+                )
+                repo_updater = RepoUpdater(gh_repo, plan.head_branch)
+                repo_updater.apply_plan(repo_plan)
+                self._record_repo_result(
+                    repo_meta, repo_updater.report_pr_metrics(), repo_updater.all_prs
+                )
+            except Exception as e:
+                self._record_repo_error(repo_meta, e)
+
+        self._run_in_pools(
+            (
+                (host, partial(apply_repo, gh, repo_meta))
+                for repo_meta in repos_metadata
+                for host, gh in [select_github(repo_meta)]
+            ),
+            max_workers_per_host,
+        )
+
+        return self.report_all_metrics()
+
+    def _start_campaign(self, campaign_id: str, head_branch: str) -> str:
+        """Open the campaign's journal, returning the head branch the campaign uses."""
+        self.journal = None
+        if not campaign_id:
+            return head_branch
+
+        self.journal = CampaignJournal(campaign_id, self.journal_dir)
+        if self.journal.head_branch:
+            if head_branch and head_branch != self.journal.head_branch:
+                raise UpdaterError(
+                    f"Campaign {campaign_id} uses branch {self.journal.head_branch}, not {head_branch}"
+                )
+            print(
+                f"INFO | Resuming campaign {campaign_id} on branch {self.journal.head_branch}"
             )
+        return self.journal.start(head_branch or make_branch_name())
+
+    def _write_plan(self, plan: CampaignPlan, plan_path: str) -> CampaignPlan:
+        plan.repos.sort(key=lambda x: x.url)
+        plan.errors = [
+            {"url": repo_meta.url, "error": str(e)} for repo_meta, e in self.errors
+        ]
+        plan.write(plan_path)
+        print(f"INFO | Number of repos planned: {len(plan.repos)}")
+        print(f"INFO | Number of repos with changes: {len(plan.changed_repos)}")
+        print(f"INFO | Plan written to {plan_path}")
+        return plan
 
+    def _parse_repos(
+        self, repo_list: Union[str, List[str], Iterable[RepoMetadata]]
+    ) -> Iterable[RepoMetadata]:
+        if not isinstance(repo_list, (str, list)):
+            # e.g. `discover_socless_repos`, consumed as the batch runs
+            self.all_repos = []
+            return self._stream_repos(repo_list)
         repos_metadata = parse_repo_names(cli_repo_input=repo_list)
         repos_metadata.sort(key=lambda x: x.url)
         self.all_repos = repos_metadata
+        return repos_metadata
 
-        # update each repo
-        for repo_meta in repos_metadata:
+    def _stream_repos(self, repos: Iterable[RepoMetadata]) -> Iterator[RepoMetadata]:
+        for repo_meta in repos:
+            self.all_repos.append(repo_meta)
+            yield repo_meta
+
+    def _get_enterprise_selector(
+        self, token: str = "", domain: str = ""
+    ) -> Tuple[str, Callable[[RepoMetadata], Tuple[str, Github]]]:
+        self.get_or_init_github_enterprise(token, domain)
+        ghe_domain = get_github_domain(self.github_enterprise)  # type: ignore
+
+        def select_github(repo_meta: RepoMetadata) -> Tuple[str, Github]:
             # select correct github instance
             if ghe_domain in repo_meta.url:
-                gh = self.get_or_init_github_enterprise()
-            else:
-                gh = self.get_or_init_github(required=True)
+                return ghe_domain, self.get_or_init_github_enterprise()
+            return GITHUB_DOMAIN, self.get_or_init_github(required=True)
 
-            try:
-                if not is_github_authenticated(gh):
-                    raise UpdaterError(
-                        f"Stopping update, github instance for {repo_meta.url} is not authenticated."
+        return ghe_domain, select_github
+
+    def _update_batch(
+        self,
+        repos_metadata: Iterable[RepoMetadata],
+        select_github: Callable[[RepoMetadata], Tuple[str, Github]],
+        max_workers_per_host: Dict[str, int],
+        head_branch: str,
+        update_kwargs: dict,
+        check_auth: bool = False,
+        prefetch: bool = False,
+        plan: Optional[CampaignPlan] = None,
+        git_mirror_dir: str = "",
+        pipeline: bool = False,
+    ):
+        # every repo in the batch shares one branch, so name it before any work starts
+        head_branch = head_branch or make_branch_name()
+
+        use_fleet_index = bool(self.fleet_index) and not plan
+        if use_fleet_index and not can_skip_compliant(update_kwargs):
+            print(
+                "INFO | not skipping compliant repos, files are discovered from each repo's tree"
+            )
+            use_fleet_index = False
+
+        # a stream of repos is updated as it is read, unless every repo is needed up front
+        streamed = not isinstance(repos_metadata, list)
+        if streamed and ((prefetch and not git_mirror_dir) or use_fleet_index):
+            repos_metadata = list(repos_metadata)
+            streamed = False
+
+        if self.journal and not plan:
+            unfinished = (
+                repo_meta
+                for repo_meta in repos_metadata
+                if not self._restore_finished_repo(repo_meta)
+            )
+            repos_metadata = unfinished if streamed else list(unfinished)
+
+        snapshots: Dict[str, RepoSnapshot] = {}
+        # mirrors already read every file locally, a prefetch would be wasted
+        if prefetch and not git_mirror_dir:
+            snapshots = self._prefetch_snapshots(
+                repos_metadata, select_github, head_branch
+            )
+
+        spec_hash = ""
+        if use_fleet_index:
+            spec_hash = make_spec_hash(update_kwargs)
+            # blob shas alone tell whether a repo changed since it was last verified
+            file_shas = snapshots or self._prefetch_snapshots(
+                repos_metadata, select_github, head_branch, include_text=False
+            )
+            repos_metadata = [
+                repo_meta
+                for repo_meta in repos_metadata
+                if not self._skip_compliant_repo(repo_meta, spec_hash, file_shas)
+            ]
+
+        # a streamed batch's size is only known once it has been read
+        batch_args = {} if streamed else {"repos": len(repos_metadata)}  # type: ignore
+        if pipeline and not plan:
+            with self.tracer.span("update_repos", "batch", **batch_args), RepoPipeline(
+                max_workers_per_host
+            ) as repo_pipeline:
+                for repo_meta in repos_metadata:
+                    host, gh = select_github(repo_meta)
+                    repo_pipeline.submit(
+                        host,
+                        partial(
+                            self._make_repo_updater,
+                            gh,
+                            repo_meta,
+                            head_branch,
+                            check_auth,
+                            snapshots.get(repo_meta.get_full_name().lower()),
+                            None,
+                            git_mirror_dir,
+                        ),
+                        update_kwargs,
+                        on_done=partial(
+                            self._finish_repo, repo_meta, spec_hash=spec_hash
+                        ),
+                        on_error=partial(self._record_repo_error, repo_meta),
+                    )
+            return
+
+        def make_job(repo_meta: RepoMetadata) -> Tuple[str, Callable[[], None]]:
+            host, gh = select_github(repo_meta)
+            return host, partial(
+                self._update_repo,
+                gh,
+                repo_meta,
+                head_branch,
+                update_kwargs,
+                check_auth,
+                snapshots.get(repo_meta.get_full_name().lower()),
+                plan,
+                git_mirror_dir,
+                spec_hash,
+            )
+
+        with self.tracer.span("update_repos", "batch", **batch_args):
+            self._run_in_pools(map(make_job, repos_metadata), max_workers_per_host)
+
+    def _skip_compliant_repo(
+        self,
+        repo_meta: RepoMetadata,
+        spec_hash: str,
+        snapshots: Dict[str, RepoSnapshot],
+    ) -> bool:
+        snapshot = snapshots.get(repo_meta.get_full_name().lower())
+        if not snapshot or not self.fleet_index.is_compliant(  # type: ignore
+            repo_meta.url, spec_hash, snapshot.file_shas
+        ):
+            return False
+        print(f"INFO | {repo_meta.name} unchanged since verified compliant, skipping")
+        self._record_repo_result(
+            repo_meta, {"repo": repo_meta.name, "updated": False, "pr": False}, []
+        )
+        return True
+
+    def _run_in_pools(
+        self,
+        jobs: Iterable[Tuple[str, Callable[[], None]]],
+        max_workers_per_host: Dict[str, int],
+    ):
+        # one pool per host keeps each host's limit independent of the others
+        executors = {
+            host: ThreadPoolExecutor(
+                max_workers=max(1, limit), thread_name_prefix=f"updater-{host}"
+            )
+            for host, limit in max_workers_per_host.items()
+        }
+        try:
+            futures = [executors[host].submit(job) for host, job in jobs]
+            wait(futures)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+    def _prefetch_snapshots(
+        self,
+        repos_metadata: List[RepoMetadata],
+        select_github: Callable[[RepoMetadata], Tuple[str, Github]],
+        head_branch: str,
+        include_text: bool = True,
+        extra_file_paths: Optional[Dict[str, tuple]] = None,
+    ) -> Dict[str, RepoSnapshot]:
+        repos_by_host: Dict[str, Tuple[Github, List[str]]] = {}
+        for repo_meta in repos_metadata:
+            host, gh = select_github(repo_meta)
+            repos_by_host.setdefault(host, (gh, []))[1].append(
+                repo_meta.get_full_name()
+            )
+
+        snapshots: Dict[str, RepoSnapshot] = {}
+        for host, (gh, full_names) in repos_by_host.items():
+            with self.tracer.span(
+                "prefetch", "batch", host=host, repos=len(full_names)
+            ):
+                snapshots.update(
+                    prefetch_repo_snapshots(
+                        gh,
+                        full_names,
+                        head_branch,
+                        include_text=include_text,
+                        extra_file_paths=extra_file_paths,
                     )
-                gh_repo = gh.get_repo(repo_meta.get_full_name())
-
-                repo_updater = RepoUpdater(gh_repo, head_branch)
-                repo_updater.update_in_github(
-                    pj_deps,
-                    pj_replace_only,
-                    sls_yml_changes,
-                    socless_python_version,
                 )
+            print(f"INFO | Prefetched {len(snapshots)} repo snapshots from {host}")
+        return snapshots
 
-                # ensure that if no branch was provided, we use the newly created branch name
-                head_branch = repo_updater.head_branch
-                self.metrics_for_all_repos.append(repo_updater.report_pr_metrics())
-                self.prs_for_all_repos = self.prs_for_all_repos + repo_updater.all_prs
-            except Exception as e:
-                print(
-                    f"ERROR | skipping repo due to error during update of {repo_meta.name} - {e}."
+    def _update_repo(
+        self,
+        gh: Github,
+        repo_meta: RepoMetadata,
+        head_branch: str,
+        update_kwargs: dict,
+        check_auth: bool = False,
+        snapshot: Optional[RepoSnapshot] = None,
+        plan: Optional[CampaignPlan] = None,
+        git_mirror_dir: str = "",
+        spec_hash: str = "",
+    ):
+        with self.tracer.span("repo", "batch", repo=repo_meta.get_full_name()):
+            try:
+                repo_updater = self._make_repo_updater(
+                    gh,
+                    repo_meta,
+                    head_branch,
+                    check_auth,
+                    snapshot,
+                    plan,
+                    git_mirror_dir,
                 )
-                self.errors.append((repo_meta, e))
 
-        self.report_all_metrics()
+                if plan:
+                    repo_plan = repo_updater.plan_changes(
+                        repo_meta.url, **update_kwargs
+                    )
+                    with self._results_lock:
+                        plan.repos.append(repo_plan)
+                    return
 
-    def update_with_regular_github(
+                repo_updater.update_in_github(**update_kwargs)
+                self._finish_repo(repo_meta, repo_updater, spec_hash)
+            except Exception as e:
+                self._record_repo_error(repo_meta, e)
+
+    def _make_repo_updater(
         self,
-        repo_list: Union[str, List[str]],
+        gh: Github,
+        repo_meta: RepoMetadata,
+        head_branch: str,
+        check_auth: bool = False,
+        snapshot: Optional[RepoSnapshot] = None,
+        plan: Optional[CampaignPlan] = None,
+        git_mirror_dir: str = "",
+    ) -> RepoUpdater:
+        if check_auth and not is_github_authenticated(gh):
+            raise UpdaterError(
+                f"Stopping update, github instance for {repo_meta.url} is not authenticated."
+            )
+        journal = self._get_repo_journal(repo_meta, plan)
+        if git_mirror_dir:
+            return self._make_git_mirror_updater(
+                gh, repo_meta, head_branch, git_mirror_dir, journal
+            )
+        if snapshot:
+            gh_repo = snapshot.to_repository(gh)
+        else:
+            gh_repo = gh.get_repo(repo_meta.get_full_name())
+        return RepoUpdater(
+            gh_repo,
+            head_branch,
+            snapshot=snapshot,
+            journal=journal,
+            tracer=self.tracer,
+            optimistic_branch=self.optimistic_branch,
+        )
+
+    def _finish_repo(
+        self, repo_meta: RepoMetadata, repo_updater: RepoUpdater, spec_hash: str = ""
+    ):
+        metrics = repo_updater.report_pr_metrics()
+        journal = self._get_repo_journal(repo_meta)
+        if journal:
+            journal.record_done(updated=metrics["updated"])
+        if spec_hash and not metrics["updated"]:
+            self.fleet_index.mark_compliant(  # type: ignore
+                repo_meta.url, spec_hash, repo_updater.read_shas
+            )
+        self._record_repo_result(repo_meta, metrics, repo_updater.all_prs)
+
+    def _make_git_mirror_updater(
+        self,
+        gh: Github,
+        repo_meta: RepoMetadata,
+        head_branch: str,
+        git_mirror_dir: str,
+        journal: Optional[RepoJournal] = None,
+    ) -> GitMirrorRepoUpdater:
+        full_name = repo_meta.get_full_name()
+        _, auth_header = get_github_credentials(gh)
+        mirror = GitMirror(
+            get_clone_url(gh, full_name),
+            git_mirror_dir,
+            auth_header=make_git_auth_header(auth_header),
+        )
+        mirror.sync()
+        # the mirror knows the default branch, so `get_repo` is not needed
+        gh_repo = make_lazy_repository(gh, full_name, mirror.default_branch())
+        return GitMirrorRepoUpdater(
+            gh_repo, mirror, head_branch, journal=journal, tracer=self.tracer
+        )
+
+    def _get_repo_journal(
+        self, repo_meta: RepoMetadata, plan: Optional[CampaignPlan] = None
+    ) -> Optional[RepoJournal]:
+        # plans never write, so there is nothing to journal
+        if self.journal is None or plan:
+            return None
+        return self.journal.for_repo(repo_meta.url)
+
+    def _restore_finished_repo(self, repo_meta: RepoMetadata) -> bool:
+        """Record the result of a repo a previous run of the campaign finished, if any."""
+        progress = self.journal.progress(repo_meta.url)  # type: ignore
+        if not progress.done:
+            return False
+        print(f"INFO | {repo_meta.name} already finished in this campaign, skipping")
+        prs = [progress.pr] if progress.pr else []
+        self._record_repo_result(
+            repo_meta,
+            {
+                "repo": repo_meta.name,
+                "updated": progress.updated,
+                "pr": progress.pr or False,
+            },
+            prs,
+        )
+        return True
+
+    def _record_repo_result(self, repo_meta: RepoMetadata, metrics: dict, prs: list):
+        with self._results_lock:
+            self.metrics_for_all_repos.append(metrics)
+            self.prs_for_all_repos.extend(prs)
+        self._emit_result(make_repo_result(repo_meta.url, metrics))
+
+    def _record_repo_error(self, repo_meta: RepoMetadata, e: Exception):
+        print(
+            f"ERROR | skipping repo due to error during update of {repo_meta.name} - {e}."
+        )
+        with self._results_lock:
+            self.errors.append((repo_meta, e))
+        self._emit_result(
+            make_repo_result(repo_meta.url, {"repo": repo_meta.name}, error=e)
+        )
+
+    def add_result_sink(self, sink: ResultSink):
+        with self._results_lock:
+            self.result_sinks.append(sink)
+
+    def remove_result_sink(self, sink: ResultSink):
+        with self._results_lock:
+            self.result_sinks.remove(sink)
+
+    def _emit_result(self, result: RepoResult):
+        with self._results_lock:
+            sinks = list(self.result_sinks)
+        for sink in sinks:
+            try:
+                sink.emit(result)
+            except Exception as e:
+                # a broken dashboard shouldn't stop the batch
+                print(f"WARN | result sink {type(sink).__name__} failed - {e}")
+
+    def iter_update(
+        self,
+        repo_list: Union[str, List[str], Iterable[RepoMetadata]],
+        enterprise: bool = False,
+        **kwargs,
+    ) -> Iterator[RepoResult]:
+        """Run a batch in the background, yielding each repo's `RepoResult` as it finishes.
+
+        Takes the arguments of `update_with_github_enterprise` if `enterprise`,
+        otherwise those of `update_with_regular_github`. An error that stops
+        the whole batch, e.g. a version that doesn't exist, is raised after
+        the results before it. Breaking out of the loop early does not stop
+        the batch, it is waited for.
+        """
+        update = (
+            self.update_with_github_enterprise
+            if enterprise
+            else self.update_with_regular_github
+        )
+        sink = QueueSink()
+        failures: List[BaseException] = []
+
+        def run_batch():
+            try:
+                update(repo_list, **kwargs)
+            except BaseException as e:
+                failures.append(e)
+            finally:
+                # marks the end of the batch
+                sink.queue.put(None)  # type: ignore
+
+        self.add_result_sink(sink)
+        batch = threading.Thread(target=run_batch, name="updater-batch", daemon=True)
+        batch.start()
+        try:
+            while True:
+                result = sink.queue.get()
+                if result is None:
+                    break
+                yield result
+        finally:
+            batch.join()
+            self.remove_result_sink(sink)
+        if failures:
+            raise failures[0]
+
+    async def aupdate_with_github_enterprise(
+        self,
+        repo_list: Union[str, List[str], Iterable[RepoMetadata]],
+        token: str = "",
+        domain: str = "",
+        pj_deps: dict = None,
+        pj_replace_only: bool = True,
+        sls_yml_changes: dict = None,
+        socless_python_version: str = "",
+        requirements_changes: dict = None,
+        head_branch="",
+        max_concurrency: int = 50,
+        max_ghe_concurrency: int = 50,
+    ):
+        """asyncio version of `update_with_github_enterprise`, see `AsyncRepoUpdater`."""
+        self.get_or_init_github_enterprise(token, domain)
+        ghe_domain = get_github_domain(self.github_enterprise)  # type: ignore
+
+        socless_python_version = self.resolve_versions(socless_python_version, pj_deps)
+
+        repos_metadata = self._parse_repos(repo_list)
+
+        github_enterprise = self.get_or_init_github_enterprise()
+        if not is_github_authenticated(github_enterprise):
+            raise UpdaterError(
+                f"Stopping update, github instance for {ghe_domain} is not authenticated."
+            )
+        instances = {
+            GITHUB_DOMAIN: (self.get_or_init_github(required=True), max_concurrency),
+            ghe_domain: (github_enterprise, max_ghe_concurrency),
+        }
+
+        await self._aupdate_batch(
+            repos_metadata,
+            lambda repo_meta: (
+                ghe_domain if ghe_domain in repo_meta.url else GITHUB_DOMAIN
+            ),
+            instances,
+            head_branch=head_branch,
+            update_kwargs=dict(
+                pj_deps=pj_deps,
+                pj_replace_only=pj_replace_only,
+                sls_yml_changes=sls_yml_changes,
+                socless_python_version=socless_python_version,
+                requirements_changes=requirements_changes,
+            ),
+        )
+
+        return self.report_all_metrics()
+
+    async def aupdate_with_regular_github(
+        self,
+        repo_list: Union[str, List[str], Iterable[RepoMetadata]],
         token: str = "",
         pj_deps: dict = None,
         pj_replace_only: bool = True,
         sls_yml_changes: dict = None,
         socless_python_version: str = "",
+        requirements_changes: dict = None,
         head_branch="",
+        max_concurrency: int = 50,
     ):
-        # TODO validate args to update _before_ starting the batch
-        # if socless_python_version:
-        # socless_python_version = validate_socless_python_release(
-        #     socless_python_version
-        # )
+        """asyncio version of `update_with_regular_github`, see `AsyncRepoUpdater`."""
+        repos_metadata = self._parse_repos(repo_list)
 
-        # update each repo
+        gh = self.get_or_init_github(token=token, required=True)
+        socless_python_version = self.resolve_versions(socless_python_version, pj_deps)
 
-        repos_metadata = parse_repo_names(cli_repo_input=repo_list)
-        repos_metadata.sort(key=lambda x: x.url)
-        self.all_repos = repos_metadata
+        await self._aupdate_batch(
+            repos_metadata,
+            lambda _: GITHUB_DOMAIN,
+            {GITHUB_DOMAIN: (gh, max_concurrency)},
+            head_branch=head_branch,
+            update_kwargs=dict(
+                pj_deps=pj_deps,
+                pj_replace_only=pj_replace_only,
+                sls_yml_changes=sls_yml_changes,
+                socless_python_version=socless_python_version,
+                requirements_changes=requirements_changes,
+            ),
+        )
 
-        for repo_meta in repos_metadata:
-            gh = self.get_or_init_github(token=token, required=True)
+        return self.report_all_metrics()
 
-            try:
-                gh_repo = gh.get_repo(repo_meta.get_full_name())
-
-                repo_updater = RepoUpdater(gh_repo, head_branch)
-                repo_updater.update_in_github(
-                    pj_deps,
-                    pj_replace_only,
-                    sls_yml_changes,
-                    socless_python_version,
-                )
+    async def _aupdate_batch(
+        self,
+        repos_metadata: List[RepoMetadata],
+        select_host: Callable[[RepoMetadata], str],
+        instances: Dict[str, Tuple[Github, int]],
+        head_branch: str,
+        update_kwargs: dict,
+    ):
+        require_aiohttp()
+        head_branch = head_branch or make_branch_name()
 
-                # ensure that if no branch was provided, we use the newly created branch name
-                head_branch = repo_updater.head_branch
-                self.metrics_for_all_repos.append(repo_updater.report_pr_metrics())
-                self.prs_for_all_repos = self.prs_for_all_repos + repo_updater.all_prs
-            except Exception as e:
-                print(
-                    f"ERROR | skipping repo due to error during update of {repo_meta.name} - {e}."
+        connector = aiohttp.TCPConnector(
+            limit=sum(max(1, limit) for _, limit in instances.values())
+        )
+        async with aiohttp.ClientSession(connector=connector) as session:
+            clients: Dict[str, Tuple[AsyncGithubClient, asyncio.Semaphore]] = {}
+            for host, (gh, limit) in instances.items():
+                base_url, auth_header = get_github_credentials(gh)
+                clients[host] = (
+                    AsyncGithubClient(
+                        session,
+                        base_url,
+                        auth_header,
+                        scheduler=self.scheduler,
+                        http_cache=self.http_cache,
+                        metrics=self.api_metrics,
+                    ),
+                    asyncio.Semaphore(max(1, limit)),
                 )
-                self.errors.append((repo_meta, e))
 
-        self.report_all_metrics()
+            async def update_repo(repo_meta: RepoMetadata):
+                client, semaphore = clients[select_host(repo_meta)]
+                async with semaphore:
+                    try:
+                        repo_updater = await AsyncRepoUpdater.from_full_name(
+                            client, repo_meta.get_full_name(), head_branch
+                        )
+                        await repo_updater.update_in_github(**update_kwargs)
+                        self._record_repo_result(
+                            repo_meta,
+                            repo_updater.report_pr_metrics(),
+                            repo_updater.all_prs,
+                        )
+                    except Exception as e:
+                        self._record_repo_error(repo_meta, e)
+
+            await asyncio.gather(*(update_repo(x) for x in repos_metadata))
 
     def report_all_metrics(self):
         # # report metrics
@@ -296,10 +1574,30 @@ class SoclessUpdater(SoclessGithubWrapper):
         for report in updated:
             print(report["pr"].html_url)
 
+        api_calls = self.api_metrics.report()
+        batch_calls = api_calls["batch"]
+        print(
+            f"INFO | Github requests: {batch_calls['requests']}"
+            f" ({batch_calls['rate_budget_consumed']} against the rate limit,"
+            f" {batch_calls['cache_hits']} cache hits),"
+            f" p50/p95/p99 latency: {batch_calls['latency_ms']['p50']}"
+            f"/{batch_calls['latency_ms']['p95']}"
+            f"/{batch_calls['latency_ms']['p99']}ms"
+        )
+
+        connections = self.transport.connection_stats()
+        for host, stats in connections.items():
+            print(
+                f"INFO | {host}: {stats['connections']} connections for {stats['requests']} requests"
+                f" ({stats['reuse_rate']:.0%} reused, pool size {stats['pool_maxsize']})"
+            )
+
         return {
             "all_results": self.metrics_for_all_repos,
             "skipped": skipped,
             "updated": updated,
+            "api_calls": api_calls,
+            "connections": connections,
         }
 
     def report_all_errors(self, raise_errors=False):
@@ -1,13 +1,82 @@
+import base64
 import uuid
 import collections.abc
 from dataclasses import dataclass
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 from github import Github, GithubException
+from github.GitCommit import GitCommit
+from github.GitRef import GitRef
+from github.GitTree import GitTree
+from github.InputGitTreeElement import InputGitTreeElement
 from github.PullRequest import PullRequest
+from github.Requester import Requester
 from github.Repository import Repository
 from github.ContentFile import ContentFile
 
-from socless_repo_updater.exceptions import UpdaterError, VersionUpdateException
+from socless_repo_updater.exceptions import UpdaterError
+from socless_repo_updater.models import FileChange
+
+CREATE_COMMIT_ON_BRANCH = """mutation ($input: CreateCommitOnBranchInput!) {
+  createCommitOnBranch(input: $input) { commit { oid } }
+}"""
+
+
+def get_requester(gh: Github) -> Requester:
+    # PyGithub 1.55 has no public accessor for the requester behind a Github instance
+    return gh._Github__requester  # type: ignore
+
+
+def get_github_credentials(gh: Github) -> Tuple[str, Optional[str]]:
+    """Return the (base_url, Authorization header) a Github instance was built with."""
+    requester = get_requester(gh)
+    return (
+        requester._Requester__base_url,  # type: ignore
+        requester._Requester__authorizationHeader,  # type: ignore
+    )
+
+
+def make_lazy_repository(gh: Github, full_name: str, default_branch: str) -> Repository:
+    """A `Repository` for a repo we already know about, built without `get_repo`."""
+    owner, name = full_name.split("/")
+    return Repository(
+        get_requester(gh),
+        {},
+        {
+            "url": f"/repos/{full_name}",
+            "name": name,
+            "full_name": full_name,
+            "default_branch": default_branch,
+            "owner": {"login": owner},
+        },
+        completed=False,
+    )
+
+
+def get_graphql_url(gh: Github) -> str:
+    base_url, _ = get_github_credentials(gh)
+    return make_graphql_url(base_url)
+
+
+def make_graphql_url(base_url: str) -> str:
+    """Github Enterprise serves GraphQL from /api/graphql instead of /api/v3/graphql."""
+    base_url = base_url.rstrip("/")
+    if base_url.endswith("/api/v3"):
+        return base_url[: -len("/v3")] + "/graphql"
+    return base_url + "/graphql"
+
+
+def run_graphql_query(gh: Github, query: str) -> dict:
+    """POST a GraphQL query through the same requester (and transport) as REST calls.
+
+    GraphQL reports missing repos and objects as `errors` alongside partial
+    `data`, so the partial data is returned and the errors are only logged.
+    """
+    _, response = get_requester(gh).requestJsonAndCheck(
+        "POST", get_graphql_url(gh), input={"query": query}
+    )
+    for error in response.get("errors") or []:
+        print(f"DEBUG | graphql error: {error.get('message')}")
+    return response.get("data") or {}
 
 
 def make_branch_name(name=""):
@@ -73,8 +142,17 @@ def check_pr_exists(
     gh_repo: Repository,
     base_branch: str,
     head_branch: str,
+    head_owner: str = "",
 ) -> Optional[PullRequest]:
-    for pull in gh_repo.get_pulls(state="open", sort="created", base=base_branch):
+    """Find the open PR from `head_branch` into `base_branch`.
+
+    When `head_owner` is given, Github filters by `owner:branch` server-side
+    so only matching PRs are paged through instead of every open PR.
+    """
+    filters = {"head": f"{head_owner}:{head_branch}"} if head_owner else {}
+    for pull in gh_repo.get_pulls(
+        state="open", sort="created", base=base_branch, **filters
+    ):
         if (
             pull.raw_data["base"]["ref"] == base_branch
             and pull.raw_data["head"]["ref"] == head_branch
@@ -83,6 +161,28 @@ def check_pr_exists(
     return None
 
 
+def get_or_create_pr(
+    gh_repo: Repository, default_branch: str, head_branch: str, head_owner: str = ""
+) -> PullRequest:
+    existing_pr = check_pr_exists(
+        gh_repo=gh_repo,
+        base_branch=default_branch,
+        head_branch=head_branch,
+        head_owner=head_owner,
+    )
+    if existing_pr:
+        print(f"PR already exists: {existing_pr.number}")
+        return existing_pr
+    else:
+        new_pr = gh_repo.create_pull(
+            title="CLI- dependency version bump",
+            body="updating dependencies, please check changed files",
+            base=default_branch,
+            head=head_branch,
+        )
+        return new_pr
+
+
 def commit_file_with_pr(
     gh_repo: Repository,
     gh_file_object: ContentFile,
@@ -92,6 +192,11 @@ def commit_file_with_pr(
     default_branch: str,
     commit_message: str,
 ) -> PullRequest:
+    """Commit one file to `head_branch` and return the branch's PR, opening it if needed.
+
+    `RepoUpdater` no longer uses this, it looks up the PR once after its
+    last commit, but callers outside the updater still can.
+    """
     _ = gh_repo.update_file(
         path=file_path,
         message=commit_message,
@@ -99,21 +204,111 @@ def commit_file_with_pr(
         sha=gh_file_object.sha,
         branch=head_branch,
     )
+    return get_or_create_pr(gh_repo, default_branch, head_branch)
 
-    existing_pr = check_pr_exists(
-        gh_repo=gh_repo, base_branch=default_branch, head_branch=head_branch
+
+def create_commit_from_changes(
+    gh_repo: Repository,
+    changes: List[FileChange],
+    parent_sha: str,
+    base_tree_sha: str,
+) -> GitCommit:
+    """Write `changes` as one commit on top of `parent_sha` using the Git Data API.
+
+    Only the new tree and commit are written, the parent is referenced by sha
+    without being fetched. No branch is moved.
+    """
+    base_tree = GitTree(gh_repo._requester, {}, {"sha": base_tree_sha}, completed=True)
+    parent = GitCommit(gh_repo._requester, {}, {"sha": parent_sha}, completed=True)
+    tree = gh_repo.create_git_tree(
+        [
+            InputGitTreeElement(
+                path=change.path,
+                mode=change.mode,
+                type="blob",
+                content=change.new_content,
+            )
+            for change in changes
+        ],
+        base_tree=base_tree,
     )
-    if existing_pr:
-        print(f"PR already exists: {existing_pr.number}")
-        return existing_pr
-    else:
-        new_pr = gh_repo.create_pull(
-            title="CLI- dependency version bump",
-            body="updating dependencies, please check changed files",
-            base=default_branch,
-            head=head_branch,
+    return gh_repo.create_git_commit(
+        message=build_combined_commit_message(changes), tree=tree, parents=[parent]
+    )
+
+
+def create_commit_on_branch(
+    gh_repo: Repository,
+    branch: str,
+    changes: List[FileChange],
+    expected_head_sha: str,
+) -> str:
+    """Write `changes` as one commit on `branch` with a single GraphQL mutation.
+
+    Github refuses the commit if `branch` no longer points to
+    `expected_head_sha`, so, like a non-forced ref update, a branch that
+    moved is never overwritten. Returns the new commit's sha.
+    """
+    headline, _, body = build_combined_commit_message(changes).partition("\n")
+    commit_input = {
+        "branch": {
+            "repositoryNameWithOwner": gh_repo.full_name,
+            "branchName": branch,
+        },
+        "message": {"headline": headline, "body": body.strip()},
+        "fileChanges": {
+            "additions": [
+                {
+                    "path": change.path,
+                    "contents": base64.b64encode(
+                        change.new_content.encode("utf-8")
+                    ).decode("utf-8"),
+                }
+                for change in changes
+            ]
+        },
+        "expectedHeadOid": expected_head_sha,
+    }
+    requester = gh_repo._requester
+    _, response = requester.requestJsonAndCheck(
+        "POST",
+        make_graphql_url(requester._Requester__base_url),  # type: ignore
+        input={"query": CREATE_COMMIT_ON_BRANCH, "variables": {"input": commit_input}},
+    )
+    errors = response.get("errors")
+    if errors:
+        messages = "; ".join(str(error.get("message")) for error in errors)
+        raise UpdaterError(
+            f"Could not commit to {branch} on {gh_repo.full_name} - {messages}"
         )
-        return new_pr
+    return response["data"]["createCommitOnBranch"]["commit"]["oid"]
+
+
+def is_reference_exists_error(e: GithubException) -> bool:
+    """Github answers creating a ref that already exists with a 422, as it does other invalid refs."""
+    message = e.data.get("message", "") if isinstance(e.data, dict) else ""
+    return e.status == 422 and "already exists" in str(message).lower()
+
+
+def make_lazy_git_ref(gh_repo: Repository, branch: str) -> GitRef:
+    """A `GitRef` for an existing branch that can be edited without reading it first."""
+    return GitRef(
+        gh_repo._requester,
+        {},
+        {
+            "ref": f"refs/heads/{branch}",
+            "url": f"{gh_repo.url}/git/refs/heads/{branch}",
+        },
+        completed=True,
+    )
+
+
+def build_combined_commit_message(changes: List[FileChange]) -> str:
+    if len(changes) == 1:
+        return changes[0].commit_message
+    summary = "updating " + ", ".join(change.path for change in changes)
+    details = "\n".join(f"- {change.commit_message}" for change in changes)
+    return f"{summary}\n\n{details}"
 
 
 def dict_merge(*args, add_keys=True):
@@ -143,41 +338,3 @@ def dict_merge(*args, add_keys=True):
             else:
                 rtn_dct[k] = v
     return rtn_dct
-
-
-def validate_socless_python_release(
-    public_gh: Github, release_tag_or_latest: str
-) -> str:
-    if release_tag_or_latest == "latest":
-        socless_python_repo = public_gh.get_repo("twilio-labs/socless_python")
-        release = socless_python_repo.get_latest_release().tag_name
-        return release
-    elif not release_tag_or_latest:
-        raise VersionUpdateException(
-            "No version tag or 'latest' specified for socless_python"
-        )
-    # elif not check_release_exists(
-    #     repo="socless_python",
-    #     org="twilio-labs",
-    #     release=release_tag_or_latest,
-    #     ghe=False,
-    # ):
-    #     raise VersionUpdateException(
-    #         f"Release {release_tag_or_latest} not found for twilio-labs/socless_python"
-    #     )
-
-    return release_tag_or_latest
-
-
-# def check_release_exists(repo: str, org: str, release: str, ghe=False):
-#     g = init_github(ghe=ghe)
-#     gh_repo = g.get_repo(full_name_or_id=f"{org}/{repo}")
-
-#     try:
-#         release_query = gh_repo.get_release(release)
-#         # release_query.tag_name is 1.1.0
-#         return release_query
-#     except GithubException as e:
-#         print(f"Release {release} not found for {org}/{repo}")
-#         print(e)
-#         return False
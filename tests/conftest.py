@@ -32,19 +32,46 @@ def pytest_addoption(parser):
         default=False,
         help="run slow tests that touch github.com",
     )
+    # `tox -- --benchmark`
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="run the large fleet benchmarks against the fake github server",
+    )
+    parser.addoption(
+        "--benchmark-latency",
+        type=float,
+        default=0.0,
+        help="seconds the fake github server waits before each response",
+    )
 
 
 def pytest_configure(config):
     # `tox -- --github`
     config.addinivalue_line("markers", "github: marks tests that touch github.com")
+    config.addinivalue_line(
+        "markers", "benchmark: marks large fleet benchmarks, run with --benchmark"
+    )
 
 
 def pytest_collection_modifyitems(config, items):
-    if config.getoption("--github"):
-        # `tox -- --github`
-        # --github given in cli: do not skip slow tests
+    for option in ["github", "benchmark"]:
+        if config.getoption(f"--{option}"):
+            # `tox -- --github`
+            # --github given in cli: do not skip slow tests
+            continue
+        skip = pytest.mark.skip(reason=f"need --{option} option to run")
+        for item in items:
+            if option in item.keywords:
+                item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter):
+    from .fake_github import BENCHMARK_RESULTS
+
+    if not BENCHMARK_RESULTS:
         return
-    skip_github = pytest.mark.skip(reason="need --github option to run")
-    for item in items:
-        if "github" in item.keywords:
-            item.add_marker(skip_github)
+    terminalreporter.section("fake github benchmark")
+    for line in BENCHMARK_RESULTS:
+        terminalreporter.write_line(line)
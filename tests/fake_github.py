@@ -0,0 +1,379 @@
+"""In-process stand-in for the Github REST endpoints `RepoUpdater` uses.
+
+Serves N synthetic repos cloned from `tests/mock_files/mock_socless_repo`
+over real HTTP, so PyGithub, the transport and the scheduler all run
+unmodified, and counts every request it answers.
+"""
+
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from .conftest import get_file_from_mock_repo
+from socless_repo_updater.file_types.handlers import FILE_HANDLERS
+
+Response = Tuple[int, object]
+
+# one line per benchmark run, printed in pytest's terminal summary
+BENCHMARK_RESULTS: List[str] = []
+
+
+def git_blob_sha(content: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def git_object_sha(*parts: str) -> str:
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FakeRepo:
+    owner: str
+    name: str
+    default_branch: str = "main"
+    # sha -> {path: content}
+    trees: Dict[str, Dict[str, bytes]] = field(default_factory=dict)
+    # sha -> (tree sha, parent shas)
+    commits: Dict[str, Tuple[str, List[str]]] = field(default_factory=dict)
+    branches: Dict[str, str] = field(default_factory=dict)
+    pulls: List[dict] = field(default_factory=list)
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.owner}/{self.name}"
+
+    def add_tree(self, files: Dict[str, bytes]) -> str:
+        sha = git_object_sha(
+            "tree", *(f"{path}:{git_blob_sha(c)}" for path, c in sorted(files.items()))
+        )
+        self.trees[sha] = dict(files)
+        return sha
+
+    def add_commit(self, tree_sha: str, parents: List[str], message: str) -> str:
+        sha = git_object_sha("commit", tree_sha, *parents, message)
+        self.commits[sha] = (tree_sha, parents)
+        return sha
+
+    def files_at(self, commit_sha: str) -> Dict[str, bytes]:
+        return self.trees[self.commits[commit_sha][0]]
+
+    def resolve(self, ref: str) -> Optional[str]:
+        if ref in self.branches:
+            return self.branches[ref]
+        return ref if ref in self.commits else None
+
+
+class FakeGithub:
+    """Routes requests to in-memory repos, see `FakeGithubServer` for the HTTP side."""
+
+    def __init__(self, repo_count: int, owner: str = "org", latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        seed = {
+            path: get_file_from_mock_repo(path).encode("utf-8")
+            for path in FILE_HANDLERS
+        }
+        self.repos: Dict[str, FakeRepo] = {}
+        for index in range(repo_count):
+            repo = FakeRepo(owner, f"repo{index}")
+            root = repo.add_commit(repo.add_tree(seed), [], "initial commit")
+            repo.branches[repo.default_branch] = root
+            self.repos[repo.full_name] = repo
+
+        repo_prefix = r"^/repos/(?P<owner>[^/]+)/(?P<name>[^/]+)"
+        self.routes: List[Tuple[str, str, re.Pattern, Callable[..., Response]]] = [
+            (method, name, re.compile(repo_prefix + pattern + "$"), handler)
+            for method, name, pattern, handler in [
+                ("GET", "get_repo", "", self.get_repo),
+                ("GET", "get_branch", "/branches/(?P<branch>.+)", self.get_branch),
+                ("GET", "get_contents", "/contents/(?P<path>.+)", self.get_contents),
+                ("PUT", "update_file", "/contents/(?P<path>.+)", self.update_file),
+                ("POST", "create_git_ref", "/git/refs", self.create_git_ref),
+                ("GET", "get_git_ref", "/git/refs/heads/(?P<branch>.+)", self.get_ref),
+                (
+                    "PATCH",
+                    "edit_git_ref",
+                    "/git/refs/heads/(?P<branch>.+)",
+                    self.edit_ref,
+                ),
+                (
+                    "GET",
+                    "get_git_commit",
+                    "/git/commits/(?P<sha>\\w+)",
+                    self.get_commit,
+                ),
+                ("GET", "get_git_tree", "/git/trees/(?P<sha>.+)", self.get_tree),
+                ("POST", "create_git_tree", "/git/trees", self.create_git_tree),
+                ("POST", "create_git_commit", "/git/commits", self.create_git_commit),
+                ("GET", "get_pulls", "/pulls", self.get_pulls),
+                ("POST", "create_pull", "/pulls", self.create_pull),
+            ]
+        ]
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def handle(self, method: str, raw_path: str, body: Optional[dict]) -> Response:
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(raw_path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if method == "POST" and url.path == "/graphql":
+            with self._lock:
+                self.calls["create_commit_on_branch"] += 1
+                return self.create_commit_on_branch((body or {})["variables"]["input"])
+        for route_method, name, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if route_method != method or not match:
+                continue
+            with self._lock:
+                self.calls[name] += 1
+                params = {
+                    key: unquote(value) for key, value in match.groupdict().items()
+                }
+                repo = self.repos.get(f"{params.pop('owner')}/{params.pop('name')}")
+                if repo is None:
+                    return 404, {"message": "Not Found"}
+                return handler(repo, query=query, body=body or {}, **params)
+        with self._lock:
+            self.calls[f"unhandled {method}"] += 1
+        return 404, {"message": f"Not Found: {method} {url.path}"}
+
+    # -- endpoints, called with the lock held --
+
+    def _repo_url(self, repo: FakeRepo) -> str:
+        return f"/repos/{repo.full_name}"
+
+    def _commit_json(self, repo: FakeRepo, sha: str) -> dict:
+        tree_sha, parents = repo.commits[sha]
+        return {
+            "sha": sha,
+            "url": f"{self._repo_url(repo)}/git/commits/{sha}",
+            "tree": {"sha": tree_sha},
+            "parents": [{"sha": parent} for parent in parents],
+            "message": "",
+        }
+
+    def _ref_json(self, repo: FakeRepo, branch: str) -> dict:
+        return {
+            "ref": f"refs/heads/{branch}",
+            "url": f"{self._repo_url(repo)}/git/refs/heads/{branch}",
+            "object": {"sha": repo.branches[branch], "type": "commit"},
+        }
+
+    def _content_json(self, repo: FakeRepo, path: str, content: bytes) -> dict:
+        return {
+            "type": "file",
+            "encoding": "base64",
+            "name": path.split("/")[-1],
+            "path": path,
+            "sha": git_blob_sha(content),
+            "content": base64.b64encode(content).decode("utf-8"),
+        }
+
+    def get_repo(self, repo: FakeRepo, **_) -> Response:
+        return 200, {
+            "url": self._repo_url(repo),
+            "name": repo.name,
+            "full_name": repo.full_name,
+            "default_branch": repo.default_branch,
+            "owner": {"login": repo.owner},
+        }
+
+    def get_branch(self, repo: FakeRepo, branch: str, **_) -> Response:
+        if branch not in repo.branches:
+            return 404, {"message": "Branch not found"}
+        sha = repo.branches[branch]
+        return 200, {
+            "name": branch,
+            "commit": {"sha": sha, "commit": {"tree": {"sha": repo.commits[sha][0]}}},
+        }
+
+    def get_contents(self, repo: FakeRepo, path: str, query: dict, **_) -> Response:
+        commit_sha = repo.resolve(query.get("ref", repo.default_branch))
+        if commit_sha is None:
+            return 404, {"message": f"No commit found for the ref {query.get('ref')}"}
+        files = repo.files_at(commit_sha)
+        if path not in files:
+            return 404, {"message": "Not Found"}
+        return 200, self._content_json(repo, path, files[path])
+
+    def update_file(self, repo: FakeRepo, path: str, body: dict, **_) -> Response:
+        branch = body.get("branch", repo.default_branch)
+        if branch not in repo.branches:
+            return 404, {"message": f"Branch {branch} not found"}
+        parent = repo.branches[branch]
+        files = repo.files_at(parent)
+        if path in files and git_blob_sha(files[path]) != body.get("sha"):
+            return 409, {"message": f"{path} does not match {body.get('sha')}"}
+        content = base64.b64decode(body["content"])
+        tree_sha = repo.add_tree({**files, path: content})
+        commit_sha = repo.add_commit(tree_sha, [parent], body["message"])
+        repo.branches[branch] = commit_sha
+        return 200, {
+            "content": self._content_json(repo, path, content),
+            "commit": self._commit_json(repo, commit_sha),
+        }
+
+    def create_git_ref(self, repo: FakeRepo, body: dict, **_) -> Response:
+        branch = body["ref"][len("refs/heads/") :]
+        if branch in repo.branches:
+            return 422, {"message": "Reference already exists"}
+        if body["sha"] not in repo.commits:
+            return 422, {"message": "Object does not exist"}
+        repo.branches[branch] = body["sha"]
+        return 201, self._ref_json(repo, branch)
+
+    def get_ref(self, repo: FakeRepo, branch: str, **_) -> Response:
+        if branch not in repo.branches:
+            return 404, {"message": "Not Found"}
+        return 200, self._ref_json(repo, branch)
+
+    def edit_ref(self, repo: FakeRepo, branch: str, body: dict, **_) -> Response:
+        if branch not in repo.branches:
+            return 422, {"message": "Reference does not exist"}
+        new_sha = body["sha"]
+        fast_forward = repo.branches[branch] in repo.commits[new_sha][1]
+        if not fast_forward and not body.get("force"):
+            return 422, {"message": "Update is not a fast forward"}
+        repo.branches[branch] = new_sha
+        return 200, self._ref_json(repo, branch)
+
+    def get_commit(self, repo: FakeRepo, sha: str, **_) -> Response:
+        if sha not in repo.commits:
+            return 404, {"message": "Not Found"}
+        return 200, self._commit_json(repo, sha)
+
+    def get_tree(self, repo: FakeRepo, sha: str, **_) -> Response:
+        # Github accepts a tree sha, a commit sha or a branch name here
+        commit_sha = repo.resolve(sha)
+        tree_sha = repo.commits[commit_sha][0] if commit_sha else sha
+        if tree_sha not in repo.trees:
+            return 404, {"message": "Not Found"}
+        return 200, {
+            "sha": tree_sha,
+            "url": f"{self._repo_url(repo)}/git/trees/{tree_sha}",
+            "truncated": False,
+            "tree": [
+                {
+                    "path": path,
+                    "mode": "100644",
+                    "type": "blob",
+                    "sha": git_blob_sha(content),
+                }
+                for path, content in sorted(repo.trees[tree_sha].items())
+            ],
+        }
+
+    def create_git_tree(self, repo: FakeRepo, body: dict, **_) -> Response:
+        files = dict(repo.trees[body["base_tree"]]) if "base_tree" in body else {}
+        for element in body["tree"]:
+            files[element["path"]] = element["content"].encode("utf-8")
+        sha = repo.add_tree(files)
+        return 201, {"sha": sha, "url": f"{self._repo_url(repo)}/git/trees/{sha}"}
+
+    def create_git_commit(self, repo: FakeRepo, body: dict, **_) -> Response:
+        sha = repo.add_commit(body["tree"], body["parents"], body["message"])
+        return 201, self._commit_json(repo, sha)
+
+    def create_commit_on_branch(self, commit_input: dict) -> Response:
+        # the only GraphQL request the updater makes against this fake
+        repo = self.repos.get(commit_input["branch"]["repositoryNameWithOwner"])
+        branch = commit_input["branch"]["branchName"]
+        if repo is None or branch not in repo.branches:
+            return 200, {"errors": [{"message": f"Could not resolve branch {branch}"}]}
+        parent = repo.branches[branch]
+        if commit_input["expectedHeadOid"] != parent:
+            return 200, {
+                "errors": [
+                    {"message": "Expected branch to point to a different commit"}
+                ]
+            }
+        files = dict(repo.files_at(parent))
+        for addition in commit_input["fileChanges"]["additions"]:
+            files[addition["path"]] = base64.b64decode(addition["contents"])
+        message = commit_input["message"]
+        sha = repo.add_commit(
+            repo.add_tree(files),
+            [parent],
+            f"{message['headline']}\n\n{message['body']}",
+        )
+        repo.branches[branch] = sha
+        return 200, {"data": {"createCommitOnBranch": {"commit": {"oid": sha}}}}
+
+    def get_pulls(self, repo: FakeRepo, query: dict, **_) -> Response:
+        return 200, [
+            pull
+            for pull in repo.pulls
+            if pull["base"]["ref"] == query.get("base", pull["base"]["ref"])
+            and f"{repo.owner}:{pull['head']['ref']}"
+            == query.get("head", f"{repo.owner}:{pull['head']['ref']}")
+        ]
+
+    def create_pull(self, repo: FakeRepo, body: dict, **_) -> Response:
+        number = len(repo.pulls) + 1
+        pull = {
+            "number": number,
+            "url": f"{self._repo_url(repo)}/pulls/{number}",
+            "html_url": f"https://github.com/{repo.full_name}/pull/{number}",
+            "state": "open",
+            "title": body["title"],
+            "base": {"ref": body["base"]},
+            "head": {"ref": body["head"]},
+        }
+        repo.pulls.append(pull)
+        return 201, pull
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeGithubServer"
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, data = self.server.fake.handle(self.command, self.path, body)
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = _respond
+
+    def log_message(self, format, *args):
+        return
+
+
+class FakeGithubServer(ThreadingHTTPServer):
+    """Serves a `FakeGithub` on a free localhost port from a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, fake: FakeGithub) -> None:
+        super().__init__(("127.0.0.1", 0), FakeGithubHandler)
+        self.fake = fake
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeGithubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
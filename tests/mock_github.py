@@ -0,0 +1,200 @@
+import base64
+import hashlib
+from types import SimpleNamespace
+from typing import Dict, List
+from github import GithubException
+from .conftest import get_file_from_mock_repo
+from socless_repo_updater.constants import (
+    PACKAGE_JSON,
+    REQUIREMENTS_FULL_PATH,
+    SERVERLESS_YML,
+)
+
+
+def blob_sha(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class MockRequester:
+    """Answers raw requests: non-forced ref updates of lazy `GitRef`s and GraphQL commits."""
+
+    def __init__(self, repo: "MockRepository") -> None:
+        self.repo = repo
+        self._Requester__base_url = "https://api.github.com"
+
+    def requestJsonAndCheck(self, verb, url, input=None):
+        if url == f"{self._Requester__base_url}/graphql":
+            assert verb == "POST", (verb, url)
+            return {}, self.repo.create_commit_on_branch(input["variables"]["input"])
+        prefix = f"{self.repo.url}/git/refs/heads/"
+        assert verb == "PATCH" and url.startswith(prefix), (verb, url)
+        branch = url[len(prefix) :]
+        self.repo.calls.append("edit_git_ref")
+        current_sha = self.repo._branch_or_404(branch)
+        if current_sha not in self.repo.parents.get(input["sha"], []):
+            raise GithubException(422, {"message": "Update is not a fast forward"}, {})
+        self.repo.branches[branch] = input["sha"]
+        return {}, {"ref": f"refs/heads/{branch}", "url": url}
+
+
+class MockRepository:
+    """In-memory stand-in for the parts of `github.Repository` the updater uses."""
+
+    def __init__(self, name: str = "mock_socless_repo") -> None:
+        self.name = name
+        self.full_name = f"org/{name}"
+        self.owner = SimpleNamespace(login="org")
+        self.url = f"https://api.github.com/repos/{self.full_name}"
+        # lazy PyGithub objects built from this repo send their writes here
+        self._requester = MockRequester(self)
+        self.default_branch = "main"
+        self.calls: List[str] = []
+        self.commits: Dict[str, Dict[str, str]] = {}
+        self.parents: Dict[str, List[str]] = {}
+        self.branches: Dict[str, str] = {}
+        self.pulls: List[SimpleNamespace] = []
+        # path -> git file mode, files not listed are 100644
+        self.modes: Dict[str, str] = {}
+        # path -> mode of each entry written by `create_git_tree`
+        self.written_modes: Dict[str, str] = {}
+        files = {
+            path: get_file_from_mock_repo(path)
+            for path in (PACKAGE_JSON, SERVERLESS_YML, REQUIREMENTS_FULL_PATH)
+        }
+        self.branches["main"] = self._add_commit(files)
+
+    def _add_commit(self, files: Dict[str, str]) -> str:
+        sha = hashlib.sha1(repr(sorted(files.items())).encode("utf-8")).hexdigest()
+        self.commits[sha] = dict(files)
+        return sha
+
+    def _branch_or_404(self, branch: str) -> str:
+        if branch not in self.branches:
+            raise GithubException(404, {"message": "Branch not found"}, {})
+        return self.branches[branch]
+
+    def get_branch(self, branch):
+        self.calls.append("get_branch")
+        sha = self._branch_or_404(branch)
+        return SimpleNamespace(
+            name=branch,
+            commit=SimpleNamespace(
+                sha=sha, commit=SimpleNamespace(tree=SimpleNamespace(sha=sha))
+            ),
+        )
+
+    def create_git_ref(self, ref, sha):
+        self.calls.append("create_git_ref")
+        branch = ref[len("refs/heads/") :]
+        if branch in self.branches:
+            raise GithubException(422, {"message": "Reference already exists"}, {})
+        if sha not in self.commits:
+            raise GithubException(422, {"message": "Object does not exist"}, {})
+        self.branches[branch] = sha
+
+    def get_contents(self, path, ref):
+        self.calls.append("get_contents")
+        sha = ref if ref in self.commits else self._branch_or_404(ref)
+        content = self.commits[sha][path]
+        return SimpleNamespace(
+            path=path,
+            sha=blob_sha(content),
+            decoded_content=content.encode("utf-8"),
+            content=base64.b64encode(content.encode("utf-8")).decode("utf-8"),
+        )
+
+    def update_file(self, path, message, content, sha, branch):
+        self.calls.append("update_file")
+        files = self.commits[self._branch_or_404(branch)]
+        if blob_sha(files[path]) != sha:
+            raise GithubException(409, {"message": "sha does not match"}, {})
+        self.branches[branch] = self._add_commit({**files, path: content})
+        return {"commit": SimpleNamespace(sha=self.branches[branch])}
+
+    def get_git_ref(self, ref):
+        self.calls.append("get_git_ref")
+        branch = ref[len("heads/") :]
+        repo = self
+
+        class MockRef:
+            object = SimpleNamespace(sha=self._branch_or_404(branch))
+
+            def edit(self, sha, force=False):
+                repo.calls.append("edit_git_ref")
+                repo.branches[branch] = sha
+
+        return MockRef()
+
+    def get_git_tree(self, sha, recursive=False):
+        self.calls.append("get_git_tree")
+        commit_sha = sha if sha in self.commits else self._branch_or_404(sha)
+        return SimpleNamespace(
+            raw_data={"truncated": False},
+            tree=[
+                SimpleNamespace(
+                    path=path, type="blob", mode=self.modes.get(path, "100644")
+                )
+                for path in sorted(self.commits[commit_sha])
+            ],
+        )
+
+    def get_git_commit(self, sha):
+        self.calls.append("get_git_commit")
+        return SimpleNamespace(sha=sha, tree=SimpleNamespace(sha=sha))
+
+    def create_git_tree(self, tree, base_tree):
+        self.calls.append("create_git_tree")
+        files = dict(self.commits[base_tree.sha])
+        for element in tree:
+            files[element._identity["path"]] = element._identity["content"]
+            self.written_modes[element._identity["path"]] = element._identity["mode"]
+        return SimpleNamespace(files=files)
+
+    def create_git_commit(self, message, tree, parents):
+        self.calls.append("create_git_commit")
+        sha = self._add_commit(tree.files)
+        self.parents[sha] = [parent.sha for parent in parents]
+        return SimpleNamespace(sha=sha)
+
+    def create_commit_on_branch(self, commit_input: dict) -> dict:
+        self.calls.append("create_commit_on_branch")
+        branch = commit_input["branch"]["branchName"]
+        head_sha = self._branch_or_404(branch)
+        if commit_input["expectedHeadOid"] != head_sha:
+            return {
+                "errors": [
+                    {"message": "Expected branch to point to a different commit"}
+                ]
+            }
+        files = dict(self.commits[head_sha])
+        for addition in commit_input["fileChanges"]["additions"]:
+            files[addition["path"]] = base64.b64decode(addition["contents"]).decode(
+                "utf-8"
+            )
+        sha = self._add_commit(files)
+        self.parents[sha] = [head_sha]
+        self.branches[branch] = sha
+        return {"data": {"createCommitOnBranch": {"commit": {"oid": sha}}}}
+
+    def get_pulls(self, state="open", sort="created", base="", head=""):
+        self.calls.append("get_pulls")
+        return [
+            pull
+            for pull in self.pulls
+            if pull.raw_data["base"]["ref"] == base
+            and (not head or f"org:{pull.raw_data['head']['ref']}" == head)
+        ]
+
+    def create_pull(self, title, body, base, head):
+        self.calls.append("create_pull")
+        number = len(self.pulls) + 1
+        pull = SimpleNamespace(
+            number=number,
+            html_url=f"https://github.com/{self.full_name}/pull/{number}",
+            raw_data={"base": {"ref": base}, "head": {"ref": head}},
+        )
+        self.pulls.append(pull)
+        return pull
+
+    def files_on(self, branch: str) -> Dict[str, str]:
+        return self.commits[self.branches[branch]]
@@ -0,0 +1,98 @@
+import asyncio
+import base64
+import pytest
+from github import GithubException
+from .conftest import get_file_from_mock_repo
+from socless_repo_updater.async_updater import AsyncRepoUpdater
+from socless_repo_updater.constants import PACKAGE_JSON, REQUIREMENTS_FULL_PATH
+
+
+class MockAsyncClient:
+    def __init__(self) -> None:
+        self.files = {PACKAGE_JSON: get_file_from_mock_repo(PACKAGE_JSON)}
+        self.pulls = []
+
+    async def get_branch(self, full_name, branch):
+        if branch != "main":
+            raise GithubException(404, {"message": "Branch not found"}, {})
+        return {"commit": {"sha": "abc123"}}
+
+    async def get_git_tree(self, full_name, tree_sha, recursive=False):
+        tree = [{"path": path, "type": "blob"} for path in self.files]
+        return {"tree": tree, "truncated": False}
+
+    async def create_git_ref(self, full_name, ref, sha):
+        return {"ref": ref}
+
+    async def get_contents(self, full_name, path, ref):
+        content = base64.b64encode(self.files[path].encode("utf-8")).decode("utf-8")
+        return {"path": path, "sha": "sha1", "content": content}
+
+    async def update_file(self, full_name, path, message, content, sha, branch):
+        self.files[path] = content
+        return {}
+
+    async def get_pulls(self, full_name, state="open", base="", head=""):
+        return self.pulls
+
+    async def create_pull(self, full_name, title, body, base, head):
+        pr = {
+            "number": 1,
+            "html_url": "https://github.com/org/repo/pull/1",
+            "base": {"ref": base},
+            "head": {"ref": head},
+        }
+        self.pulls.append(pr)
+        return pr
+
+
+def test_async_repo_updater_updates_package_json():
+    client = MockAsyncClient()
+    repo_data = {"full_name": "org/repo", "name": "repo", "default_branch": "main"}
+    repo_updater = AsyncRepoUpdater(client, repo_data, "my-branch")
+
+    asyncio.run(repo_updater.update_in_github(pj_deps={"serverless": "9.9.9"}))
+
+    assert '"serverless": "9.9.9"' in client.files[PACKAGE_JSON]
+    assert repo_updater.report_pr_metrics()["pr"].number == 1
+
+
+def test_async_repo_updater_updates_discovered_requirements_files():
+    client = MockAsyncClient()
+    client.files = {
+        REQUIREMENTS_FULL_PATH: get_file_from_mock_repo(REQUIREMENTS_FULL_PATH),
+        "functions/function_one/requirements.txt": "requests==2.0.0\n",
+    }
+    repo_data = {"full_name": "org/repo", "name": "repo", "default_branch": "main"}
+    repo_updater = AsyncRepoUpdater(client, repo_data, "my-branch")
+
+    asyncio.run(
+        repo_updater.update_in_github(
+            requirements_changes={"socless": "9.9.9", "requests": "2.31.0"}
+        )
+    )
+
+    assert "socless_python.git@9.9.9" in client.files[REQUIREMENTS_FULL_PATH]
+    assert client.files["functions/function_one/requirements.txt"] == (
+        "requests==2.31.0\n"
+    )
+
+
+def test_async_branch_errors_other_than_404_are_raised():
+    client = MockAsyncClient()
+    created = []
+
+    async def unavailable(full_name, branch):
+        raise GithubException(503, {"message": "Service Unavailable"}, {})
+
+    async def create_git_ref(full_name, ref, sha):
+        created.append(ref)
+
+    client.get_branch = unavailable
+    client.create_git_ref = create_git_ref
+    repo_data = {"full_name": "org/repo", "name": "repo", "default_branch": "main"}
+    repo_updater = AsyncRepoUpdater(client, repo_data, "my-branch")
+
+    with pytest.raises(GithubException):
+        asyncio.run(repo_updater._create_head_branch_if_nonexistent())
+    assert created == []
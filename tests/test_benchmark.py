@@ -0,0 +1,140 @@
+import json
+import os
+import time
+from typing import Optional
+import pytest
+from github import Github
+from .fake_github import BENCHMARK_RESULTS, FakeGithub, FakeGithubServer
+from socless_repo_updater.file_types.handlers import FILE_HANDLERS
+from socless_repo_updater.scheduler import RateLimitScheduler
+from socless_repo_updater.updater import RepoUpdater, SoclessUpdater
+
+# calls per repo each scenario may make, raise only when a change needs more
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "benchmark_budget.json")
+
+UPDATE_KWARGS = dict(
+    pj_deps={"serverless": "9.9.9"},
+    socless_python_version="9.9.9",
+)
+
+SCENARIOS = {
+    "per_file": {},
+    "atomic_commit": {"atomic_commit": True},
+    "pipeline": {"pipeline": True},
+    "optimistic_branch": {"optimistic_branch": True},
+    "optimistic_atomic": {"optimistic_branch": True, "atomic_commit": True},
+}
+
+
+class FakeRepoMetadata:
+    def __init__(self, full_name: str) -> None:
+        self.full_name = full_name
+        self.url = f"https://github.com/{full_name}"
+
+    def get_full_name(self):
+        return self.full_name
+
+
+def load_budget() -> dict:
+    with open(BUDGET_PATH) as f:
+        return json.load(f)
+
+
+def run_campaign(
+    repo_count: int,
+    scenario: str,
+    latency: float = 0.0,
+    update_kwargs: Optional[dict] = None,
+) -> dict:
+    fake = FakeGithub(repo_count, latency=latency)
+    options = SCENARIOS[scenario]
+    with FakeGithubServer(fake) as server:
+        # the fake answers as fast as it can, pacing would only measure the scheduler
+        updater = SoclessUpdater(
+            scheduler=RateLimitScheduler(requests_per_second=1e6, burst=10**6),
+            optimistic_branch=options.get("optimistic_branch", False),
+        )
+        gh = updater.transport.install(
+            Github(base_url=server.url, login_or_token="fake-token")
+        )
+        repos = [FakeRepoMetadata(full_name) for full_name in fake.repos]
+
+        start = time.perf_counter()
+        updater._update_batch(
+            repos,
+            lambda _: ("fake", gh),
+            {"fake": 8},
+            head_branch="benchmark",
+            update_kwargs={
+                **(update_kwargs or UPDATE_KWARGS),
+                "atomic_commit": options.get("atomic_commit", False),
+            },
+            pipeline=options.get("pipeline", False),
+        )
+        wall_time = time.perf_counter() - start
+
+    assert updater.errors == []
+    assert len(updater.prs_for_all_repos) == repo_count
+    calls_per_repo = fake.total_calls / repo_count
+    BENCHMARK_RESULTS.append(
+        f"{scenario:>14} | {repo_count:>5} repos | {wall_time:8.2f}s wall"
+        f" | {calls_per_repo:5.2f} calls/repo | {dict(fake.calls)}"
+    )
+    return dict(
+        fake=fake, updater=updater, wall_time=wall_time, calls_per_repo=calls_per_repo
+    )
+
+
+def test_fake_server_commits_to_every_repo():
+    result = run_campaign(3, "per_file")
+
+    for repo in result["fake"].repos.values():
+        files = repo.files_at(repo.branches["benchmark"])
+        assert b'"serverless": "9.9.9"' in files["package.json"]
+        assert b"9.9.9" in files["functions/requirements.txt"]
+        assert len(repo.pulls) == 1
+
+
+@pytest.mark.parametrize("scenario", ["per_file", "pipeline"])
+def test_fake_server_updates_serverless_yml_from_every_worker(scenario):
+    result = run_campaign(
+        40,
+        scenario,
+        update_kwargs={"sls_yml_changes": {"provider": {"runtime": "python3.9"}}},
+    )
+
+    for repo in result["fake"].repos.values():
+        files = repo.files_at(repo.branches["benchmark"])
+        assert b"runtime: python3.9" in files["serverless.yml"]
+
+
+def test_fake_server_lists_the_tree_for_file_discovery():
+    fake = FakeGithub(1)
+    with FakeGithubServer(fake) as server:
+        gh = Github(base_url=server.url, login_or_token="fake-token")
+        repo_updater = RepoUpdater(gh.get_repo("org/repo0"), "benchmark")
+        repo_updater.read_ref = "main"
+
+        assert repo_updater.list_files() == sorted(FILE_HANDLERS)
+        repo_updater.list_files()
+    assert fake.calls["get_git_tree"] == 1
+
+
+@pytest.mark.parametrize(
+    "repo_count",
+    [
+        10,
+        pytest.param(100, marks=pytest.mark.benchmark),
+        pytest.param(1000, marks=pytest.mark.benchmark),
+    ],
+)
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_api_calls_per_repo_within_budget(request, repo_count, scenario):
+    latency = request.config.getoption("--benchmark-latency")
+    result = run_campaign(repo_count, scenario, latency)
+
+    budget = load_budget()[scenario]
+    assert result["calls_per_repo"] <= budget, (
+        f"{scenario} made {result['calls_per_repo']:.2f} calls per repo,"
+        f" budget is {budget}: {dict(result['fake'].calls)}"
+    )
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from github import Github
+from socless_repo_updater.async_updater import AsyncGithubClient
+from socless_repo_updater.cache import HttpCache
+from socless_repo_updater.transport import GithubTransport
+
+
+def test_only_revalidatable_responses_are_stored():
+    cache = HttpCache(":memory:")
+    key = HttpCache.make_key("GET", "https://api.github.com/repos/o/r", "token a")
+
+    assert not cache.store(key, "url", 200, {}, "{}")
+    assert not cache.store(key, "url", 404, {"ETag": '"abc"'}, "{}")
+    assert cache.store(key, "url", 200, {"ETag": '"abc"'}, '{"a": 1}')
+
+    cached = cache.lookup(key)
+    assert cached.text == '{"a": 1}'
+    assert cached.conditional_headers() == {"If-None-Match": '"abc"'}
+
+
+def test_cache_keys_are_separated_by_token():
+    url = "https://api.github.com/repos/o/r"
+    assert HttpCache.make_key("GET", url, "token a") != HttpCache.make_key(
+        "GET", url, "token b"
+    )
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = HttpCache(":memory:", max_bytes=250)
+    for name in ("first", "second", "third"):
+        cache.store(name, name, 200, {"ETag": name}, "x" * 50)
+    cache.record_hit("first")
+    cache.store("fourth", "fourth", 200, {"ETag": "fourth"}, "x" * 50)
+
+    assert cache.lookup("second") is None
+    assert cache.lookup("first") is not None
+    assert cache.stats()["evictions"] >= 1
+    assert cache.stats()["bytes"] <= 250
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    full_responses = 0
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+        ETagHandler.full_responses += 1
+        body = json.dumps({"login": "octocat"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_transport_answers_304s_from_cache(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        cache = HttpCache(str(tmp_path / "cache.sqlite3"))
+        transport = GithubTransport(http_cache=cache)
+        gh = transport.install(
+            Github(
+                base_url=f"http://127.0.0.1:{server.server_port}", login_or_token="a"
+            )
+        )
+        for _ in range(3):
+            assert gh.get_user("octocat").login == "octocat"
+
+        assert ETagHandler.full_responses == 1
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+        assert HttpCache(str(tmp_path / "cache.sqlite3")).stats()["entries"] == 1
+    finally:
+        server.shutdown()
+
+
+def test_async_client_answers_304s_from_cache(tmp_path):
+    aiohttp = pytest.importorskip("aiohttp")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ETagHandler.full_responses = 0
+    cache = HttpCache(str(tmp_path / "cache.sqlite3"))
+
+    async def get_user_three_times():
+        async with aiohttp.ClientSession() as session:
+            client = AsyncGithubClient(
+                session,
+                base_url=f"http://127.0.0.1:{server.server_port}",
+                http_cache=cache,
+            )
+            return [await client.request("GET", "/users/octocat") for _ in range(3)]
+
+    try:
+        responses = asyncio.run(get_user_three_times())
+    finally:
+        server.shutdown()
+
+    assert [data["login"] for _, data in responses] == ["octocat"] * 3
+    assert ETagHandler.full_responses == 1
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,120 @@
+import threading
+from types import SimpleNamespace
+from github import GithubException
+from .test_updater import MockGithub, MockRepoUpdater
+from socless_repo_updater import discovery
+from socless_repo_updater import updater as updater_module
+from socless_repo_updater.discovery import (
+    RepoFilter,
+    build_marker_query,
+    discover_socless_repos,
+)
+from socless_repo_updater.updater import SoclessUpdater
+
+
+def make_gh_repo(name, archived=False, fork=False, topics=()):
+    return SimpleNamespace(
+        name=name,
+        full_name=f"org/{name}",
+        html_url=f"https://github.com/org/{name}",
+        owner=SimpleNamespace(login="org"),
+        archived=archived,
+        fork=fork,
+        _rawData={"topics": list(topics)},
+    )
+
+
+class MockOwnerGithub:
+    def __init__(self, repos, is_org=True) -> None:
+        self.repos = repos
+        self.is_org = is_org
+
+    def get_organization(self, login):
+        if not self.is_org:
+            raise GithubException(404, {"message": "Not Found"}, {})
+        return SimpleNamespace(get_repos=lambda type: iter(self.repos))
+
+    def get_user(self, login):
+        return SimpleNamespace(get_repos=lambda: iter(self.repos))
+
+
+def answer_marker_queries(monkeypatch, socless_names):
+    queries = []
+
+    def run_graphql_query(gh, query):
+        queries.append(query)
+        data = {}
+        for line in query.splitlines():
+            if "repository(" not in line:
+                continue
+            alias = line.strip().split(":")[0]
+            found = any(f'name: "{name}"' in line for name in socless_names)
+            data[alias] = {"f0": {"oid": "a"}, "f1": {"oid": "b"} if found else None}
+        return data
+
+    monkeypatch.setattr(discovery, "run_graphql_query", run_graphql_query)
+    return queries
+
+
+def test_build_marker_query():
+    query = build_marker_query(["org/one", "org/two"])
+    assert 'r1: repository(owner: "org", name: "two")' in query
+    assert '"HEAD:serverless.yml"' in query
+    assert '"HEAD:functions/requirements.txt"' in query
+
+
+def test_discovery_filters_and_checks_repos_in_batches(monkeypatch):
+    queries = answer_marker_queries(monkeypatch, ["a", "b", "c", "old", "tagged"])
+    repos = [
+        make_gh_repo("a"),
+        make_gh_repo("not-socless"),
+        make_gh_repo("b"),
+        make_gh_repo("old", archived=True),
+        make_gh_repo("copy", fork=True),
+        make_gh_repo("c"),
+    ]
+    found = discover_socless_repos(MockOwnerGithub(repos), "org", batch_size=2)
+    assert [repo.name for repo in found] == ["a", "b", "c"]
+    assert len(queries) == 2
+
+    repos.append(make_gh_repo("tagged", topics=["socless"]))
+    found = discover_socless_repos(
+        MockOwnerGithub(repos, is_org=False),
+        ["org"],
+        RepoFilter(include_archived=True, topics=("socless",)),
+    )
+    assert [repo.url for repo in found] == ["https://github.com/org/tagged"]
+
+
+def test_updates_start_before_discovery_finishes(monkeypatch):
+    monkeypatch.setattr(updater_module, "RepoUpdater", MockRepoUpdater)
+    first_updated = threading.Event()
+    original_update = MockRepoUpdater.update_in_github
+
+    def update_in_github(self, **kwargs):
+        original_update(self, **kwargs)
+        first_updated.set()
+
+    monkeypatch.setattr(MockRepoUpdater, "update_in_github", update_in_github)
+
+    def slow_discovery():
+        yield from discover_socless_repos(
+            MockOwnerGithub([make_gh_repo("first")]), "org"
+        )
+        # later pages are still being listed
+        assert first_updated.wait(timeout=5)
+        yield from discover_socless_repos(
+            MockOwnerGithub([make_gh_repo("second")]), "org"
+        )
+
+    answer_marker_queries(monkeypatch, ["first", "second"])
+    socless_updater = SoclessUpdater()
+    socless_updater._update_batch(
+        socless_updater._parse_repos(slow_discovery()),
+        lambda _: ("github.com", MockGithub()),
+        max_workers_per_host={"github.com": 2},
+        head_branch="my-branch",
+        update_kwargs={},
+    )
+    assert [meta.name for meta in socless_updater.all_repos] == ["first", "second"]
+    assert len(socless_updater.metrics_for_all_repos) == 2
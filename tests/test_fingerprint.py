@@ -0,0 +1,82 @@
+import json
+from .conftest import get_file_from_mock_repo
+from socless_repo_updater.constants import PACKAGE_JSON, SERVERLESS_YML
+from socless_repo_updater.file_types import handlers, serverless_yml
+from socless_repo_updater.fingerprint import (
+    FingerprintCache,
+    get_blob_sha,
+    make_fingerprint,
+)
+
+
+def test_fingerprints_ignore_formatting_and_key_order():
+    compact = '{"b": [1, 2], "a": {"c": "d"}}'
+    pretty = json.dumps({"a": {"c": "d"}, "b": [1, 2]}, indent=4)
+
+    assert make_fingerprint(json.loads(compact)) == make_fingerprint(json.loads(pretty))
+    assert make_fingerprint({"b": [2, 1]}) != make_fingerprint({"b": [1, 2]})
+    assert serverless_yml.yaml_files_are_equal("a: 1 # one\nb: x\n", "b: 'x'\na: 1\n")
+
+
+def test_blob_sha_matches_git():
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert get_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+
+def test_fingerprints_accept_mixed_key_types():
+    document = {1: "one", "two": {2: [1, 2], "b": True}}
+    reordered = {"two": {"b": True, 2: [1, 2]}, 1: "one"}
+
+    assert make_fingerprint(document) == make_fingerprint(reordered)
+    assert make_fingerprint({1: "one"}) != make_fingerprint({1: "one", "1": "one"})
+
+
+def test_current_targets_are_bounded():
+    cache = FingerprintCache(max_entries=2)
+    for target in ("first", "second", "third"):
+        cache.mark_current(target, "fingerprint")
+
+    assert not cache.is_current("first", "fingerprint")
+    assert cache.is_current("third", "fingerprint")
+
+
+def test_fingerprints_are_parsed_once_per_blob():
+    cache = FingerprintCache()
+    parses = []
+
+    def parse(content):
+        parses.append(content)
+        return json.loads(content)
+
+    assert cache.fingerprint(b'{"a": 1}', parse) == cache.fingerprint(
+        b'{"a": 1}', parse
+    )
+    assert len(parses) == 1
+    assert cache.hits == 1
+
+    assert not cache.is_known_current(b'{"a": 1}', "target")
+    cache.mark_current("target", make_fingerprint({"a": 1}))
+    assert cache.is_known_current(b'{"a": 1}', "target")
+    assert not cache.is_known_current(b'{"a": 2}', "target")
+
+
+def test_transforms_skip_parsing_files_known_to_be_current(monkeypatch):
+    cache = FingerprintCache()
+    monkeypatch.setattr(handlers, "FINGERPRINTS", cache)
+    spec = {"pj_deps": {"serverless": "9.9.9"}, "pj_replace_only": True}
+    package_json = get_file_from_mock_repo(PACKAGE_JSON).encode("utf-8")
+
+    new_package_json, _ = handlers.transform_package_json(package_json, spec)
+    # the updated file is already known to be in the target state
+    monkeypatch.setattr(handlers.json, "loads", None)
+    assert handlers.transform_package_json(new_package_json.encode(), spec) is None
+    assert cache.hits == 1
+
+    monkeypatch.undo()
+    monkeypatch.setattr(handlers, "FINGERPRINTS", cache)
+    sls_spec = {"sls_yml_changes": {"provider": {"runtime": "python3.7"}}}
+    serverless = get_file_from_mock_repo(SERVERLESS_YML).encode("utf-8")
+    assert handlers.transform_serverless_yml(serverless, sls_spec) is None
+    monkeypatch.setattr(handlers, "load_serverless_yml", None)
+    assert handlers.transform_serverless_yml(serverless, sls_spec) is None
+    assert cache.hits == 2
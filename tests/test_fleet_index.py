@@ -0,0 +1,119 @@
+from .mock_github import MockRepository, blob_sha
+from .test_updater import make_repo_meta
+from socless_repo_updater.constants import REQUIREMENTS_FULL_PATH
+from socless_repo_updater.fleet_index import FleetIndex, make_spec_hash
+from socless_repo_updater.prefetch import RepoSnapshot
+from socless_repo_updater.updater import SoclessUpdater
+
+
+class MockGithub:
+    def __init__(self) -> None:
+        self.repos = {}
+
+    def get_repo(self, full_name):
+        return self.repos.setdefault(full_name, MockRepository(full_name))
+
+
+def make_snapshots(gh_repo: MockRepository, repo_meta):
+    snapshot = RepoSnapshot(
+        full_name=repo_meta.get_full_name(),
+        default_branch="main",
+        default_branch_sha=gh_repo.branches["main"],
+        head_branch="my-branch",
+        file_shas={
+            path: blob_sha(content)
+            for path, content in gh_repo.files_on("main").items()
+        },
+    )
+    return {repo_meta.get_full_name().lower(): snapshot}
+
+
+def run_campaign(fleet_index, gh, snapshots, update_kwargs):
+    socless_updater = SoclessUpdater(fleet_index=fleet_index)
+    socless_updater._prefetch_snapshots = lambda *args, **kwargs: snapshots
+    socless_updater._update_batch(
+        [make_repo_meta("repo")],
+        lambda _: ("github.com", gh),
+        max_workers_per_host={"github.com": 1},
+        head_branch="my-branch",
+        update_kwargs=update_kwargs,
+    )
+    return socless_updater
+
+
+def test_spec_hash_ignores_delivery_options():
+    spec = dict(pj_deps={"a": "1"}, socless_python_version="1.5.0")
+    assert make_spec_hash(spec) == make_spec_hash({**spec, "atomic_commit": True})
+    assert make_spec_hash(spec) != make_spec_hash({**spec, "pj_deps": {"a": "2"}})
+
+
+def test_fleet_index_requires_same_spec_and_blobs():
+    fleet_index = FleetIndex(":memory:")
+    fleet_index.mark_compliant("repo", "spec", {"a.txt": "1"})
+
+    assert fleet_index.is_compliant("repo", "spec", {"a.txt": "1", "b.txt": "2"})
+    assert not fleet_index.is_compliant("repo", "other-spec", {"a.txt": "1"})
+    assert not fleet_index.is_compliant("repo", "spec", {"a.txt": "changed"})
+    assert not fleet_index.is_compliant("other-repo", "spec", {"a.txt": "1"})
+    assert fleet_index.skipped == 1
+
+
+def test_compliant_repo_is_skipped_on_the_next_run():
+    fleet_index = FleetIndex(":memory:")
+    gh_repo = MockRepository("org/repo")
+    snapshots = make_snapshots(gh_repo, make_repo_meta("repo"))
+    compliant = {"socless_python_version": "1.5.0"}
+
+    first = MockGithub()
+    first.repos["org/repo"] = gh_repo
+    run_campaign(fleet_index, first, snapshots, compliant)
+    assert "get_contents" in gh_repo.calls
+
+    second = MockGithub()
+    result = run_campaign(fleet_index, second, snapshots, compliant)
+    assert second.repos == {}
+    assert result.metrics_for_all_repos == [
+        {"repo": "repo", "updated": False, "pr": False}
+    ]
+
+    # a new spec has to be verified again
+    third = MockGithub()
+    run_campaign(fleet_index, third, snapshots, {"socless_python_version": "9.9.9"})
+    assert "update_file" in third.repos["org/repo"].calls
+
+    # and so does a repo whose files changed
+    snapshots["org/repo"].file_shas[REQUIREMENTS_FULL_PATH] = "0" * 40
+    fourth = MockGithub()
+    run_campaign(fleet_index, fourth, snapshots, compliant)
+    assert "get_contents" in fourth.repos["org/repo"].calls
+
+
+def test_repos_are_not_skipped_when_files_are_discovered():
+    fleet_index = FleetIndex(":memory:")
+    gh_repo = MockRepository("org/repo")
+    snapshots = make_snapshots(gh_repo, make_repo_meta("repo"))
+    discovering = {"requirements_changes": {"requests": "2.31.0"}}
+
+    first = MockGithub()
+    first.repos["org/repo"] = gh_repo
+    run_campaign(fleet_index, first, snapshots, discovering)
+
+    # a requirements file added since the first run still gets updated
+    gh_repo.branches["main"] = gh_repo._add_commit(
+        {
+            **gh_repo.files_on("main"),
+            "functions/new/requirements.txt": "requests==2.0.0\n",
+        }
+    )
+    del gh_repo.branches["my-branch"]
+    snapshots = make_snapshots(gh_repo, make_repo_meta("repo"))
+    second = MockGithub()
+    second.repos["org/repo"] = gh_repo
+    result = run_campaign(fleet_index, second, snapshots, discovering)
+
+    assert fleet_index.skipped == 0
+    assert result.metrics_for_all_repos[-1]["updated"] is True
+    assert (
+        gh_repo.files_on("my-branch")["functions/new/requirements.txt"]
+        == "requests==2.31.0\n"
+    )
@@ -0,0 +1,172 @@
+import shutil
+import subprocess
+import pytest
+from .conftest import PATH_TO_LOCAL_MOCK_REPO
+from .mock_github import MockRepository
+from socless_repo_updater.constants import (
+    PACKAGE_JSON,
+    REQUIREMENTS_FULL_PATH,
+    SERVERLESS_YML,
+)
+from socless_repo_updater.exceptions import GitMirrorError
+from socless_repo_updater.git_mirror import GitMirror, make_git_auth_header
+from socless_repo_updater.models import FileChange
+from socless_repo_updater.updater import GitMirrorRepoUpdater
+
+AUTHOR = ("Test Author", "author@example.com")
+
+
+def git(*args, cwd):
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """A bare repo holding the mock socless repo, standing in for Github."""
+    work = tmp_path / "work"
+    shutil.copytree(PATH_TO_LOCAL_MOCK_REPO, work)
+    git("init", "--quiet", "--initial-branch", "main", cwd=work)
+    git("add", "-A", cwd=work)
+    git(
+        "-c",
+        f"user.name={AUTHOR[0]}",
+        "-c",
+        f"user.email={AUTHOR[1]}",
+        "commit",
+        "--quiet",
+        "-m",
+        "initial",
+        cwd=work,
+    )
+    remote_path = tmp_path / "remote.git"
+    git("clone", "--bare", "--quiet", str(work), str(remote_path), cwd=tmp_path)
+    return remote_path
+
+
+def make_mirror(remote, tmp_path) -> GitMirror:
+    return GitMirror(str(remote), str(tmp_path / "mirrors"), author=AUTHOR)
+
+
+def test_mirror_reads_files_in_one_batch(remote, tmp_path):
+    mirror = make_mirror(remote, tmp_path)
+    mirror.sync()
+
+    assert mirror.default_branch() == "main"
+    files = mirror.read_files(
+        mirror.resolve_branch("main"), [PACKAGE_JSON, "missing.txt", SERVERLESS_YML]
+    )
+    assert list(files) == [PACKAGE_JSON, SERVERLESS_YML]
+    with open(f"{PATH_TO_LOCAL_MOCK_REPO}/{PACKAGE_JSON}", "rb") as f:
+        expected = f.read()
+    assert files[PACKAGE_JSON].decoded_content == expected
+    # blob shas match the ones the Contents API reports
+    assert files[PACKAGE_JSON].sha == git(
+        "hash-object", f"{PATH_TO_LOCAL_MOCK_REPO}/{PACKAGE_JSON}", cwd="."
+    )
+    assert mirror.resolve_branch("nope") is None
+
+
+def test_mirror_skips_paths_that_are_not_files(remote, tmp_path):
+    mirror = make_mirror(remote, tmp_path)
+    mirror.sync()
+
+    files = mirror.read_files(
+        mirror.resolve_branch("main"), ["functions", REQUIREMENTS_FULL_PATH]
+    )
+    assert list(files) == [REQUIREMENTS_FULL_PATH]
+    with open(f"{PATH_TO_LOCAL_MOCK_REPO}/{REQUIREMENTS_FULL_PATH}", "rb") as f:
+        assert files[REQUIREMENTS_FULL_PATH].decoded_content == f.read()
+
+
+def test_mirror_sync_fetches_incrementally(remote, tmp_path):
+    mirror = make_mirror(remote, tmp_path)
+    mirror.sync()
+    before = mirror.resolve_branch("main")
+
+    other = make_mirror(remote, tmp_path / "other")
+    other.sync()
+    files = other.read_files(before, [PACKAGE_JSON])
+    change = FileChange(PACKAGE_JSON, files[PACKAGE_JSON].sha, "{}", "empty json")
+    pushed = other.commit_files(before, [change], "empty json")
+    other.push(pushed, "main")
+
+    mirror.sync()
+    assert mirror.resolve_branch("main") == before
+    mirror.sync(force=True)
+    assert mirror.resolve_branch("main") == pushed
+
+
+def test_mirror_commits_keep_file_modes(remote, tmp_path):
+    mirror = make_mirror(remote, tmp_path)
+    mirror.sync()
+    main_sha = mirror.resolve_branch("main")
+    script = FileChange("run.sh", "", "#!/bin/sh\n", "add script", mode="100755")
+    with_script = mirror.commit_files(main_sha, [script], "add script")
+
+    edited = FileChange("run.sh", "", "#!/bin/sh\necho\n", "edit script")
+    commit_sha = mirror.commit_files(with_script, [edited], "edit script")
+
+    modes = mirror.list_file_modes(commit_sha)
+    assert modes["run.sh"] == "100755"
+    assert modes[PACKAGE_JSON] == "100644"
+    assert mirror.list_files(commit_sha) == list(modes)
+
+
+def test_git_mirror_repo_updater_pushes_one_commit(remote, tmp_path):
+    gh_repo = MockRepository()
+    repo_updater = GitMirrorRepoUpdater(
+        gh_repo, make_mirror(remote, tmp_path), "my-branch"
+    )
+    repo_updater.update_in_github(
+        pj_deps={"serverless": "9.9.9"}, socless_python_version="9.9.9"
+    )
+
+    # only the PR goes through the API, and a new branch can't have one yet
+    assert gh_repo.calls == ["create_pull"]
+    assert git("rev-list", "--count", "main..my-branch", cwd=remote) == "1"
+    package_json = git("show", f"my-branch:{PACKAGE_JSON}", cwd=remote)
+    assert '"serverless": "9.9.9"' in package_json
+    requirements = git("show", f"my-branch:{REQUIREMENTS_FULL_PATH}", cwd=remote)
+    assert "socless_python.git@9.9.9#egg=socless" in requirements
+    assert repo_updater.report_pr_metrics()["updated"] is True
+
+
+def test_git_mirror_push_is_never_forced(remote, tmp_path):
+    mirror = make_mirror(remote, tmp_path)
+    mirror.sync()
+    main_sha = mirror.resolve_branch("main")
+    tree_only = mirror.commit_files(main_sha, [], "no changes")
+
+    mirror.push(tree_only, "main")
+    with pytest.raises(GitMirrorError):
+        # not a descendant of the new remote head
+        mirror.push(main_sha, "main")
+
+
+def test_make_git_auth_header_uses_basic_auth():
+    assert make_git_auth_header(None) is None
+    assert make_git_auth_header("token abc") == "Basic eC1hY2Nlc3MtdG9rZW46YWJj"
+    assert make_git_auth_header("Basic xyz") == "Basic xyz"
+
+
+def test_git_mirror_repo_updater_updates_discovered_requirements(remote, tmp_path):
+    seed = make_mirror(remote, tmp_path / "seed")
+    seed.sync()
+    function_requirements = "functions/function_one/requirements.txt"
+    new_file = FileChange(function_requirements, "", "requests==2.0.0\n", "add")
+    seed.push(seed.commit_files(seed.resolve_branch("main"), [new_file], "add"), "main")
+
+    mirror = make_mirror(remote, tmp_path)
+    repo_updater = GitMirrorRepoUpdater(MockRepository(), mirror, "my-branch")
+    assert function_requirements in repo_updater.list_files()
+    repo_updater.update_in_github(
+        requirements_changes={"requests": "2.31.0", "socless": "9.9.9"}
+    )
+
+    assert git("show", f"my-branch:{function_requirements}", cwd=remote) == (
+        "requests==2.31.0"
+    )
+    requirements = git("show", f"my-branch:{REQUIREMENTS_FULL_PATH}", cwd=remote)
+    assert "socless_python.git@9.9.9#egg=socless" in requirements
@@ -0,0 +1,89 @@
+import pytest
+from github import GithubException
+from .mock_github import MockRepository
+from .test_updater import MockGithub, MockRepoUpdater, make_repo_meta
+from socless_repo_updater import updater as updater_module
+from socless_repo_updater.constants import PACKAGE_JSON, REQUIREMENTS_FULL_PATH
+from socless_repo_updater.exceptions import UpdaterError
+from socless_repo_updater.journal import CampaignJournal
+from socless_repo_updater.updater import RepoUpdater, SoclessUpdater
+
+REPO_URL = "https://github.com/org/mock_socless_repo"
+UPDATE_KWARGS = dict(pj_deps={"serverless": "9.9.9"}, socless_python_version="9.9.9")
+
+
+def test_journal_replays_progress_and_ignores_torn_lines(tmp_path):
+    journal = CampaignJournal("campaign", str(tmp_path))
+    assert journal.start("my-branch") == "my-branch"
+    repo_journal = journal.for_repo(REPO_URL)
+    repo_journal.record_branch_created()
+    repo_journal.record_file_committed(PACKAGE_JSON, "abc")
+    with open(journal.path, "a") as f:
+        f.write('{"step": "pr_ope')
+
+    reopened = CampaignJournal("campaign", str(tmp_path))
+    assert reopened.start("other-branch") == "my-branch"
+    progress = reopened.progress(REPO_URL)
+    assert progress.branch_created is True
+    assert progress.committed_files == {PACKAGE_JSON: "abc"}
+    assert progress.pr is None and progress.done is False
+
+
+@pytest.mark.parametrize("atomic_commit", [False, True])
+def test_resumed_repo_skips_finished_steps(tmp_path, atomic_commit):
+    gh_repo = MockRepository()
+    journal = CampaignJournal("campaign", str(tmp_path))
+
+    def fail_create_pull(*args, **kwargs):
+        raise GithubException(502, {"message": "Bad gateway"}, {})
+
+    create_pull = gh_repo.create_pull
+    gh_repo.create_pull = fail_create_pull
+    with pytest.raises(GithubException):
+        RepoUpdater(
+            gh_repo, "my-branch", journal=journal.for_repo(REPO_URL)
+        ).update_in_github(**UPDATE_KWARGS, atomic_commit=atomic_commit)
+
+    gh_repo.create_pull = create_pull
+    gh_repo.calls.clear()
+    resumed_journal = CampaignJournal("campaign", str(tmp_path)).for_repo(REPO_URL)
+    repo_updater = RepoUpdater(gh_repo, "my-branch", journal=resumed_journal)
+    repo_updater.update_in_github(**UPDATE_KWARGS, atomic_commit=atomic_commit)
+
+    # files and branch were finished by the first run, only the PR is left,
+    # so no (empty) commit is made
+    assert gh_repo.calls == ["get_pulls", "create_pull"]
+    assert set(resumed_journal.progress.committed_files) == {
+        PACKAGE_JSON,
+        REQUIREMENTS_FULL_PATH,
+    }
+    assert resumed_journal.progress.pr.number == repo_updater.all_prs[0].number
+
+
+def test_campaign_skips_repos_finished_by_previous_run(monkeypatch, tmp_path):
+    monkeypatch.setattr(updater_module, "RepoUpdater", MockRepoUpdater)
+    repos = [make_repo_meta(f"repo{i}") for i in range(3)]
+    journal = CampaignJournal("campaign", str(tmp_path))
+    journal.start("my-branch")
+    journal.for_repo(repos[0].url).record_done(updated=False)
+
+    socless_updater = SoclessUpdater(journal_dir=str(tmp_path))
+    head_branch = socless_updater._start_campaign("campaign", "")
+    assert head_branch == "my-branch"
+    socless_updater._update_batch(
+        repos,
+        lambda _: ("github.com", MockGithub()),
+        max_workers_per_host={"github.com": 1},
+        head_branch=head_branch,
+        update_kwargs={},
+    )
+
+    assert [report["repo"] for report in socless_updater.metrics_for_all_repos] == [
+        "repo0",
+        "org/repo1",
+        "org/repo2",
+    ]
+    assert CampaignJournal("campaign", str(tmp_path)).progress(repos[2].url).done
+
+    with pytest.raises(UpdaterError):
+        socless_updater._start_campaign("campaign", "other-branch")
@@ -0,0 +1,68 @@
+from copy import deepcopy
+import pytest
+from socless_repo_updater.merge_plan import (
+    APPENDED,
+    INSERTED,
+    REPLACED,
+    compile_merge_plan,
+    get_merge_plan,
+)
+from socless_repo_updater.utils import dict_merge
+
+DOCUMENT = {
+    "service": "socless-template",
+    "provider": {"runtime": "python3.7", "timeout": 60, "tags": {}},
+    "plugins": ["sls-apb", {"name": "packager"}],
+    "custom": {"sls_apb": {"logging": True}, "empty": None},
+}
+
+UPDATE = {
+    "provider": {"runtime": "python3.9", "tags": {"team": "secops"}, "new": 1},
+    "plugins": ["sls-apb", {"name": "packager"}, "new-plugin", "new-plugin"],
+    "custom": {"empty": {"a": 1}, "sls_apb": {}},
+    "missing": {"nested": True},
+}
+
+
+@pytest.mark.parametrize("add_keys", [True, False])
+def test_plan_matches_dict_merge(add_keys):
+    expected = dict_merge(deepcopy(DOCUMENT), deepcopy(UPDATE), add_keys=add_keys)
+
+    document = deepcopy(DOCUMENT)
+    compile_merge_plan(UPDATE, add_keys).apply(document)
+
+    assert document == expected
+
+
+def test_plan_reports_each_change():
+    document = deepcopy(DOCUMENT)
+    changes = compile_merge_plan(UPDATE).apply(document)
+
+    assert [(change.key, change.value, change.action) for change in changes] == [
+        ("runtime", "python3.9", REPLACED),
+        ("tags", {"team": "secops"}, INSERTED),
+        (1, "new-plugin", APPENDED),
+        ("empty", {"a": 1}, INSERTED),
+    ]
+    # applying again finds nothing left to do
+    assert compile_merge_plan(UPDATE).apply(document) == []
+
+
+def test_plans_are_compiled_once_and_never_share_state():
+    update = {"plugins": [{"name": "new"}]}
+    plan = get_merge_plan(update)
+    assert get_merge_plan(deepcopy(update)) is plan
+
+    first, second = {"plugins": ["a"]}, {"plugins": ["b"]}
+    plan.apply(first)
+    plan.apply(second)
+    first["plugins"][1]["name"] = "changed"
+    assert second["plugins"][1] == {"name": "new"}
+    assert plan.ops[0].value == [{"name": "new"}]
+
+
+def test_mismatched_kinds_are_rejected():
+    with pytest.raises(TypeError):
+        compile_merge_plan({"provider": {"runtime": 3}}).apply(deepcopy(DOCUMENT))
+    with pytest.raises(TypeError):
+        compile_merge_plan({"service": {"name": "x"}}).apply(deepcopy(DOCUMENT))
@@ -0,0 +1,61 @@
+import json
+from .test_benchmark import run_campaign
+from socless_repo_updater.metrics import ApiMetrics, parse_endpoint, percentile
+
+
+def test_urls_are_reduced_to_endpoint_templates():
+    assert parse_endpoint(
+        "https://api.github.com/repos/o/r/contents/functions/requirements.txt?ref=x"
+    ) == ("/repos/{owner}/{repo}/contents/{path}", "o/r")
+    assert parse_endpoint(
+        "https://ghe.example.com/api/v3/repos/o/r/git/refs/heads/my-branch"
+    ) == ("/repos/{owner}/{repo}/git/refs/{ref}", "o/r")
+    assert parse_endpoint("https://api.github.com/repos/o/r/pulls/12/files") == (
+        "/repos/{owner}/{repo}/pulls/{number}/files",
+        "o/r",
+    )
+    assert parse_endpoint("https://api.github.com/repos/o/r/pulls?base=main") == (
+        "/repos/{owner}/{repo}/pulls",
+        "o/r",
+    )
+    assert parse_endpoint("https://ghe.example.com/api/graphql") == ("/graphql", None)
+
+
+def test_percentiles_and_rollups():
+    assert percentile([], 50) == 0.0
+    assert percentile([float(n) for n in range(1, 101)], 95) == 95.0
+
+    metrics = ApiMetrics()
+    metrics.record("GET", "https://api.github.com/repos/o/r", 200, 0.01, 100)
+    metrics.record("GET", "https://api.github.com/repos/o/r", 304, 0.02, 0, True)
+    metrics.record("GET", "https://api.github.com/rate_limit", 200, 0.03, 10)
+
+    batch = metrics.batch_report()
+    assert batch["requests"] == 3
+    assert batch["cache_hits"] == 1
+    assert batch["rate_budget_consumed"] == 2
+    assert batch["latency_ms"]["p50"] == 20.0
+    assert batch["endpoints"]["GET /repos/{owner}/{repo}"]["bytes"] == 100
+    assert list(metrics.repo_reports()) == ["o/r"]
+    assert json.loads(metrics.to_json(include_calls=True))["calls"][2]["repo"] is None
+
+
+def test_batch_report_accounts_for_every_request():
+    result = run_campaign(2, "per_file")
+    report = result["updater"].report_all_metrics()["api_calls"]
+
+    assert report["batch"]["requests"] == result["fake"].total_calls
+    repo_report = report["repos"]["org/repo0"]
+    assert repo_report["requests"] == 10
+    assert (
+        repo_report["endpoints"]["PUT /repos/{owner}/{repo}/contents/{path}"][
+            "requests"
+        ]
+        == 2
+    )
+    assert (
+        report["batch"]["endpoints"]["GET /repos/{owner}/{repo}/branches/{branch}"][
+            "errors"
+        ]
+        == 2
+    )
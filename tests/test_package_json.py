@@ -1,7 +1,11 @@
 import json
 from .conftest import get_file_from_mock_repo
 from socless_repo_updater.constants import PACKAGE_JSON
-from socless_repo_updater.file_types.package_json import update_package_json_contents
+from socless_repo_updater.file_types.package_json import (
+    get_dependency_changes,
+    patch_package_json_text,
+    update_package_json_contents,
+)
 
 
 def load_mock_package_json() -> dict:
@@ -41,3 +45,54 @@ def test_package_json_replace_only_false():
     )
     assert modified_package_json["dependencies"]["serverless"] == "9.9.9"
     assert modified_package_json["dependencies"][new_dependency_name] == "0.1.0"
+
+
+def test_untouched_sections_are_shared_not_copied():
+    package_json = load_mock_package_json()
+    modified_package_json = update_package_json_contents(
+        package_json, {"serverless": "9.9.9"}
+    )
+    assert modified_package_json["scripts"] is package_json["scripts"]
+    assert package_json["dependencies"]["serverless"] == "2.35.0"
+
+
+def test_dev_and_peer_dependencies_are_updated():
+    package_json = {
+        "dependencies": {"a": "1.0.0"},
+        "devDependencies": {"b": "1.0.0"},
+        "peerDependencies": {"a": "^1.0.0"},
+    }
+    changes = get_dependency_changes(
+        package_json, {"a": "2.0.0", "b": "1.0.0", "c": "3.0.0"}, False
+    )
+    assert changes == {
+        "dependencies": {"a": "2.0.0", "c": "3.0.0"},
+        "peerDependencies": {"a": "2.0.0"},
+    }
+
+
+def test_only_changed_values_are_rewritten():
+    text = get_file_from_mock_repo(PACKAGE_JSON)
+    changes = get_dependency_changes(json.loads(text), {"serverless": "9.9.9"})
+    patched = patch_package_json_text(text, changes)
+    assert patched == text.replace('"serverless": "2.35.0"', '"serverless": "9.9.9"')
+
+
+def test_other_layouts_are_kept():
+    text = (
+        '{\n\t"name": "x",\n\t"devDependencies": {\n\t\t"b" :"1.0.0"\n\t},'
+        ' "dependencies": {"a": "1.0.0"}}\n'
+    )
+    patched = patch_package_json_text(
+        text,
+        {
+            "dependencies": {"a": "2.0.0", "new": "ü"},
+            "devDependencies": {"b": "2.0.0", "c": "1.0.0"},
+        },
+    )
+    assert patched == (
+        '{\n\t"name": "x",\n\t"devDependencies": {\n\t\t"b" :"2.0.0",\n\t\t"c" :"1.0.0"\n\t},'
+        ' "dependencies": {"a": "2.0.0", "new": "ü"}}\n'
+    )
+    assert patch_package_json_text(text, {"peerDependencies": {"a": "1"}}) is None
+    assert patch_package_json_text("{not json", {"dependencies": {"a": "1"}}) is None
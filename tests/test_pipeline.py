@@ -0,0 +1,130 @@
+import threading
+import time
+import pytest
+from .mock_github import MockRepository
+from socless_repo_updater.file_types import handlers
+from socless_repo_updater.file_types.handlers import FileHandler
+from socless_repo_updater.pipeline import RepoPipeline
+from socless_repo_updater.tracing import Tracer
+from socless_repo_updater.updater import RepoUpdater
+
+UPDATE_KWARGS = dict(pj_deps={"serverless": "9.9.9"}, socless_python_version="9.9.9")
+
+
+def bump_version(content: bytes, spec: dict):
+    if content.decode() == spec["version"]:
+        return None
+    return spec["version"], f"bump VERSION to {spec['version']}"
+
+
+def test_registered_handler_plugs_into_repo_updater(monkeypatch):
+    monkeypatch.setitem(
+        handlers.FILE_HANDLERS,
+        "VERSION",
+        FileHandler("VERSION", "version", bump_version),
+    )
+    gh_repo = MockRepository()
+    gh_repo.commits[gh_repo.branches["main"]]["VERSION"] = "1.0.0"
+
+    changes = RepoUpdater(gh_repo, "main").collect_changes()
+    assert changes == []
+
+    spec = {"version": "2.0.0", "socless_python_version": "9.9.9"}
+    repo_updater = RepoUpdater(gh_repo, "main")
+    changes = repo_updater.transform_files(repo_updater.fetch_files(spec), spec)
+    assert [change.path for change in changes] == [
+        "functions/requirements.txt",
+        "VERSION",
+    ]
+    assert changes[1].new_content == "2.0.0"
+
+
+def test_pipeline_updates_every_repo():
+    repos = {f"repo{i}": MockRepository(f"repo{i}") for i in range(6)}
+    done, errors = [], []
+
+    with RepoPipeline({"github.com": 2}) as repo_pipeline:
+        for name, gh_repo in repos.items():
+            repo_pipeline.submit(
+                "github.com",
+                lambda gh_repo=gh_repo: RepoUpdater(gh_repo, "my-branch"),
+                {**UPDATE_KWARGS, "atomic_commit": True},
+                on_done=done.append,
+                on_error=errors.append,
+            )
+
+    assert errors == []
+    assert len(done) == 6
+    for gh_repo in repos.values():
+        assert gh_repo.calls.count("create_commit_on_branch") == 1
+        assert '"serverless": "9.9.9"' in gh_repo.files_on("my-branch")["package.json"]
+
+
+def test_pipeline_traces_each_transform():
+    tracer = Tracer()
+    with RepoPipeline({"github.com": 2}) as repo_pipeline:
+        repo_pipeline.submit(
+            "github.com",
+            lambda: RepoUpdater(MockRepository(), "my-branch", tracer=tracer),
+            UPDATE_KWARGS,
+            on_done=lambda _: None,
+            on_error=lambda e: pytest.fail(str(e)),
+        )
+
+    transforms = [
+        e["args"]["path"]
+        for e in tracer.to_dict()["traceEvents"]
+        if e["ph"] == "X" and e["name"] == "transform"
+    ]
+    assert transforms == ["package.json", "functions/requirements.txt"]
+
+
+class SlowUpdater:
+    lock = threading.Lock()
+    in_pipeline = 0
+    max_in_pipeline = 0
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        with SlowUpdater.lock:
+            SlowUpdater.in_pipeline += 1
+            SlowUpdater.max_in_pipeline = max(
+                SlowUpdater.max_in_pipeline, SlowUpdater.in_pipeline
+            )
+
+    def fetch_files(self, spec):
+        if self.name == "broken":
+            raise ValueError("broken repo")
+        return []
+
+    def transform_files(self, fetched, spec):
+        return []
+
+    def commit_changes(self, changes, atomic_commit=False):
+        # the slowest stage, so repos pile up in front of it
+        time.sleep(0.01)
+
+    def leave(self, *args):
+        with SlowUpdater.lock:
+            SlowUpdater.in_pipeline -= 1
+
+
+def test_pipeline_applies_backpressure_and_routes_errors():
+    done, errors = [], []
+    names = [f"repo{i}" for i in range(10)] + ["broken"]
+
+    with RepoPipeline({"github.com": 4}, max_pending=3) as repo_pipeline:
+        for name in names:
+            updater = SlowUpdater(name)
+            repo_pipeline.submit(
+                "github.com",
+                lambda updater=updater: updater,
+                {},
+                on_done=lambda u: (done.append(u.name), u.leave()),
+                on_error=lambda e, u=updater: (errors.append(str(e)), u.leave()),
+            )
+
+    assert sorted(done) == sorted(names[:-1])
+    assert errors == ["broken repo"]
+    # one more than max_pending, the updater built while submit waits for a slot
+    assert SlowUpdater.max_in_pipeline <= 4
@@ -0,0 +1,175 @@
+import re
+from types import SimpleNamespace
+import pytest
+from .mock_github import MockRepository, blob_sha
+from socless_repo_updater.constants import PACKAGE_JSON, REQUIREMENTS_FULL_PATH
+from socless_repo_updater import prefetch
+from socless_repo_updater import updater as updater_module
+from socless_repo_updater.exceptions import PlanConflictError
+from socless_repo_updater.plan import CampaignPlan, find_plan_conflict
+from socless_repo_updater.prefetch import RepoSnapshot
+from socless_repo_updater.updater import RepoUpdater, SoclessUpdater
+
+READ_CALLS = ("get_branch", "get_contents", "get_git_ref", "get_git_commit")
+WRITE_CALLS = ("update_file", "create_git_ref", "create_git_tree", "create_git_commit")
+
+UPDATE_KWARGS = dict(pj_deps={"serverless": "9.9.9"}, socless_python_version="9.9.9")
+
+
+def make_plan(gh_repo: MockRepository):
+    return RepoUpdater(gh_repo, "my-branch").plan_changes(
+        "https://github.com/org/mock_socless_repo", **UPDATE_KWARGS
+    )
+
+
+def test_plan_changes_only_reads():
+    gh_repo = MockRepository()
+    repo_plan = make_plan(gh_repo)
+
+    assert not set(gh_repo.calls) & set(WRITE_CALLS)
+    assert "my-branch" not in gh_repo.branches
+    assert [planned.path for planned in repo_plan.files] == [
+        PACKAGE_JSON,
+        REQUIREMENTS_FULL_PATH,
+    ]
+    assert repo_plan.head_branch_exists is False
+    assert repo_plan.base_commit_sha == gh_repo.branches["main"]
+    assert '+    "serverless": "9.9.9"' in repo_plan.files[0].diff
+
+
+def test_campaign_plan_round_trips_through_file(tmp_path):
+    plan = CampaignPlan(head_branch="my-branch", repos=[make_plan(MockRepository())])
+    plan_path = str(tmp_path / "plan.json")
+    plan.write(plan_path)
+
+    assert CampaignPlan.read(plan_path) == plan
+
+
+def test_apply_plan_only_writes():
+    gh_repo = MockRepository()
+    repo_plan = make_plan(gh_repo)
+    gh_repo.calls.clear()
+
+    repo_updater = RepoUpdater(gh_repo, "my-branch")
+    repo_updater.apply_plan(repo_plan)
+
+    assert not set(gh_repo.calls) & set(READ_CALLS)
+    assert gh_repo.calls.count("create_git_commit") == 1
+    assert gh_repo.calls.count("create_pull") == 1
+    files = gh_repo.files_on("my-branch")
+    assert files[PACKAGE_JSON] == repo_plan.files[0].new_content
+    assert len(repo_updater.all_prs) == 1
+
+
+def test_apply_plan_keeps_file_modes():
+    gh_repo = MockRepository()
+    gh_repo.modes[REQUIREMENTS_FULL_PATH] = "100755"
+    repo_plan = make_plan(gh_repo)
+    assert [planned.mode for planned in repo_plan.files] == ["100644", "100755"]
+
+    RepoUpdater(gh_repo, "my-branch").apply_plan(repo_plan)
+
+    assert gh_repo.written_modes == {
+        PACKAGE_JSON: "100644",
+        REQUIREMENTS_FULL_PATH: "100755",
+    }
+
+
+def test_apply_plan_refuses_moved_head_branch():
+    gh_repo = MockRepository()
+    gh_repo.create_git_ref("refs/heads/my-branch", gh_repo.branches["main"])
+    repo_plan = make_plan(gh_repo)
+    assert repo_plan.head_branch_exists is True
+
+    # someone pushes to the head branch between plan and apply
+    gh_repo.update_file(
+        PACKAGE_JSON,
+        "manual edit",
+        "{}",
+        gh_repo.get_contents(PACKAGE_JSON, "my-branch").sha,
+        "my-branch",
+    )
+    moved_sha = gh_repo.branches["my-branch"]
+
+    with pytest.raises(PlanConflictError):
+        RepoUpdater(gh_repo, "my-branch").apply_plan(repo_plan)
+    assert gh_repo.branches["my-branch"] == moved_sha
+
+
+def test_find_plan_conflict_compares_blob_shas():
+    repo_plan = make_plan(MockRepository())
+    snapshot = RepoSnapshot(
+        full_name=repo_plan.full_name,
+        default_branch="main",
+        default_branch_sha=repo_plan.base_commit_sha,
+        head_branch="my-branch",
+        file_shas={planned.path: planned.base_sha for planned in repo_plan.files},
+    )
+    assert find_plan_conflict(repo_plan, snapshot) is None
+
+    snapshot.file_shas[PACKAGE_JSON] = "0" * 40
+    assert PACKAGE_JSON in find_plan_conflict(repo_plan, snapshot)
+    assert find_plan_conflict(repo_plan, None)
+
+
+FUNCTION_REQUIREMENTS = "functions/function_one/requirements.txt"
+
+
+def answer_prefetch_query(gh_repo: MockRepository, query: str) -> dict:
+    """What Github's GraphQL API would answer for a one-repo prefetch of `gh_repo`."""
+
+    main_sha = gh_repo.branches["main"]
+    repo_data = {
+        "nameWithOwner": gh_repo.full_name,
+        "defaultBranchRef": {
+            "name": "main",
+            "target": {"oid": main_sha, "tree": {"oid": main_sha}},
+        },
+        "headRef": None,
+    }
+    for alias, ref, path in re.findall(
+        r'(\w+): object\(expression: "([^":]+):([^"]+)"\)', query
+    ):
+        # the head branch doesn't exist yet, only HEAD resolves
+        files = gh_repo.files_on("main") if ref == "HEAD" else {}
+        repo_data[alias] = {"oid": blob_sha(files[path])} if path in files else None
+    return {"r0": repo_data}
+
+
+def test_apply_plan_verifies_discovered_files(monkeypatch, tmp_path):
+    gh_repo = MockRepository()
+    gh_repo.branches["main"] = gh_repo._add_commit(
+        {**gh_repo.files_on("main"), FUNCTION_REQUIREMENTS: "requests==2.0.0\n"}
+    )
+    repo_plan = RepoUpdater(gh_repo, "my-branch").plan_changes(
+        "https://github.com/org/mock_socless_repo",
+        requirements_changes={"requests": "2.31.0"},
+    )
+    assert [planned.path for planned in repo_plan.files] == [FUNCTION_REQUIREMENTS]
+    plan_path = str(tmp_path / "plan.json")
+    CampaignPlan(head_branch="my-branch", repos=[repo_plan]).write(plan_path)
+
+    monkeypatch.setattr(
+        prefetch,
+        "run_graphql_query",
+        lambda gh, query: answer_prefetch_query(gh_repo, query),
+    )
+    monkeypatch.setattr(updater_module, "make_lazy_repository", lambda *_: gh_repo)
+    monkeypatch.setattr(
+        updater_module,
+        "parse_repo_names",
+        lambda cli_repo_input: [
+            SimpleNamespace(
+                url=url,
+                name="mock_socless_repo",
+                get_full_name=lambda: gh_repo.full_name,
+            )
+            for url in cli_repo_input
+        ],
+    )
+    socless_updater = SoclessUpdater()
+    monkeypatch.setattr(socless_updater, "get_or_init_github", lambda **_: None)
+    socless_updater.apply_plan(plan_path)
+
+    assert socless_updater.errors == []
+    assert gh_repo.files_on("my-branch")[FUNCTION_REQUIREMENTS] == "requests==2.31.0\n"
@@ -0,0 +1,61 @@
+from .conftest import get_file_from_mock_repo
+from .mock_github import MockRepository, blob_sha
+from socless_repo_updater.constants import PACKAGE_JSON, SERVERLESS_YML
+from socless_repo_updater.prefetch import (
+    build_prefetch_query,
+    get_prefetch_file_paths,
+    parse_repo_snapshot,
+)
+from socless_repo_updater.updater import RepoUpdater
+
+
+def make_repo_data(head_exists: bool) -> dict:
+    repo_data = {
+        "nameWithOwner": "org/mock_socless_repo",
+        "defaultBranchRef": {"name": "main", "target": {"oid": "main-sha"}},
+        "headRef": {"target": {"oid": "head-sha"}} if head_exists else None,
+    }
+    for index, path in enumerate(get_prefetch_file_paths()):
+        content = get_file_from_mock_repo(path)
+        blob = {
+            "oid": blob_sha(content),
+            "text": content,
+            "isBinary": False,
+            "isTruncated": False,
+        }
+        repo_data[f"default{index}"] = blob
+        repo_data[f"head{index}"] = blob if head_exists else None
+    return repo_data
+
+
+def test_build_prefetch_query_batches_repos_with_aliases():
+    query = build_prefetch_query(["org/one", "org/two"], "my-branch")
+    assert 'r0: repository(owner: "org", name: "one")' in query
+    assert 'r1: repository(owner: "org", name: "two")' in query
+    assert 'ref(qualifiedName: "refs/heads/my-branch")' in query
+    assert '"HEAD:package.json"' in query
+    assert '"my-branch:functions/requirements.txt"' in query
+
+
+def test_parse_repo_snapshot():
+    snapshot = parse_repo_snapshot(make_repo_data(head_exists=False), "my-branch")
+    assert snapshot.default_branch == "main"
+    assert snapshot.default_branch_sha == "main-sha"
+    assert not snapshot.head_branch_exists
+    assert snapshot.files[SERVERLESS_YML].decoded_content == get_file_from_mock_repo(
+        SERVERLESS_YML
+    ).encode("utf-8")
+
+
+def test_repo_updater_reads_from_snapshot():
+    gh_repo = MockRepository()
+    snapshot = parse_repo_snapshot(make_repo_data(head_exists=False), "my-branch")
+    snapshot.default_branch_sha = gh_repo.branches["main"]
+
+    repo_updater = RepoUpdater(gh_repo, "my-branch", snapshot=snapshot)
+    repo_updater.update_in_github(pj_deps={"serverless": "9.9.9"}, atomic_commit=True)
+
+    assert "get_contents" not in gh_repo.calls
+    assert "get_branch" not in gh_repo.calls
+    assert gh_repo.calls.count("create_git_ref") == 1
+    assert '"serverless": "9.9.9"' in gh_repo.files_on("my-branch")[PACKAGE_JSON]
@@ -0,0 +1,173 @@
+from types import SimpleNamespace
+import pytest
+from github import GithubException
+from socless_repo_updater.exceptions import VersionUpdateException
+from socless_repo_updater.releases import (
+    GITHUB,
+    NPM,
+    ReleaseCache,
+    ReleaseResolver,
+    ReleaseTarget,
+    get_pj_deps_targets,
+)
+
+
+class MockGithub:
+    def __init__(self, tags, branches=None, commits=()) -> None:
+        self.tags = tags
+        self.branches = branches or {}
+        self.commits = commits
+        self.calls = []
+
+    def get_repo(self, full_name):
+        github = self
+
+        class MockRepo:
+            def get_latest_release(self):
+                github.calls.append(("latest", full_name))
+                return SimpleNamespace(tag_name=github.tags[full_name][-1])
+
+            url = f"https://api.github.com/repos/{full_name}"
+            _requester = SimpleNamespace(
+                requestJsonAndCheck=lambda verb, url: github.get_ref(full_name, url)
+            )
+
+            def get_commit(self, sha):
+                github.calls.append(("commit", full_name))
+                if sha not in github.commits:
+                    raise GithubException(422, {"message": "No commit found"}, {})
+
+        return MockRepo()
+
+    def get_ref(self, full_name, url):
+        # like Github, /git/refs/ answers a missing ref with the refs it prefixes
+        prefix = f"https://api.github.com/repos/{full_name}/git/"
+        endpoint, ref = url[len(prefix) :].split("/", 1)
+        self.calls.append((ref, full_name))
+        kind, name = ref.split("/", 1)
+        refs = self.tags if kind == "tags" else self.branches
+        matches = [
+            {"ref": f"refs/{kind}/{existing}"}
+            for existing in refs.get(full_name, [])
+            if existing == name or (endpoint == "refs" and existing.startswith(name))
+        ]
+        if not matches:
+            raise GithubException(404, {"message": "Not Found"}, {})
+        if endpoint == "refs" and matches != [{"ref": f"refs/{ref}"}]:
+            return {}, matches
+        return {}, matches[0]
+
+
+def make_resolver(gh, cache=None, npm_versions=()):
+    resolver = ReleaseResolver(lambda host: gh, cache)
+
+    def get(url, timeout):
+        gh.calls.append(("npm", url))
+        found = url.rsplit("/", 2)[-2:] in [list(v) for v in npm_versions]
+        return SimpleNamespace(
+            status_code=200 if found else 404, raise_for_status=lambda: None
+        )
+
+    resolver.session = SimpleNamespace(get=get)
+    return resolver
+
+
+def test_pj_deps_targets():
+    targets = get_pj_deps_targets(
+        {
+            "serverless": "2.35.0",
+            "sls-apb": "git+https://github.com/twilio-labs/sls-apb.git#1.3.0",
+            "private": "git+ssh://git@ghe.example.com/org/private#v1",
+            "ranged": "^1.0.0",
+            "untagged": "git+https://github.com/org/untagged.git",
+            "ranged-git": "git+https://github.com/org/ranged.git#semver:^1.2.0",
+        }
+    )
+    assert targets == {
+        "serverless": ReleaseTarget(NPM, "serverless", "2.35.0"),
+        "sls-apb": ReleaseTarget(GITHUB, "twilio-labs/sls-apb", "1.3.0"),
+        "private": ReleaseTarget(GITHUB, "org/private", "v1", "ghe.example.com"),
+    }
+
+
+def test_versions_are_resolved_once_and_cached_across_runs(tmp_path):
+    gh = MockGithub({"twilio-labs/socless_python": ["1.5.0", "1.6.0"]})
+    cache_path = str(tmp_path / "releases.sqlite3")
+    resolver = make_resolver(
+        gh, ReleaseCache(cache_path), npm_versions=[("serverless", "2.35.0")]
+    )
+
+    assert resolver.resolve_update_versions("latest", {"serverless": "2.35.0"}) == (
+        "1.6.0"
+    )
+    assert len(gh.calls) == 2
+
+    # a new run with the same cache makes no lookups
+    rerun = make_resolver(gh, ReleaseCache(cache_path))
+    assert rerun.resolve_update_versions("latest", {"serverless": "2.35.0"}) == "1.6.0"
+    assert rerun.resolve_update_versions("1.5.0") == "1.5.0"
+    assert len(gh.calls) == 3
+
+    expired = make_resolver(gh, ReleaseCache(cache_path, ttl=-1))
+    expired.resolve_update_versions("latest")
+    assert len(gh.calls) == 4
+
+
+def test_every_bad_version_is_reported_at_once():
+    gh = MockGithub({"twilio-labs/socless_python": ["1.5.0"]})
+    resolver = make_resolver(gh)
+
+    with pytest.raises(VersionUpdateException) as e:
+        resolver.resolve_update_versions(
+            "9.9.9",
+            {
+                "serverless": "9.9.9",
+                "sls-apb": "git+https://github.com/twilio-labs/sls-apb.git#0.0.1",
+            },
+        )
+    message = str(e.value)
+    assert "Tag 9.9.9 not found for twilio-labs/socless_python" in message
+    assert "Tag 0.0.1 not found for twilio-labs/sls-apb" in message
+    assert "Version 9.9.9 not found for npm package serverless" in message
+
+    # failures aren't cached
+    with pytest.raises(VersionUpdateException):
+        resolver.resolve_update_versions("9.9.9")
+    assert gh.calls.count(("tags/9.9.9", "twilio-labs/socless_python")) == 2
+
+
+def test_branches_and_commits_are_accepted_for_git_dependencies():
+    gh = MockGithub(
+        {"org/tagged": ["release-2021"]},
+        branches={"org/branch": ["master"]},
+        commits=("0a1b2c3d",),
+    )
+    resolver = make_resolver(gh)
+    resolver.resolve_update_versions(
+        pj_deps={
+            "tagged": "git+https://github.com/org/tagged.git#release-2021",
+            "branch": "git+https://github.com/org/branch.git#master",
+            "commit": "git+https://github.com/org/commit.git#0a1b2c3d",
+        }
+    )
+
+    with pytest.raises(VersionUpdateException) as e:
+        resolver.resolve_update_versions(
+            pj_deps={"gone": "git+https://github.com/org/branch.git#deleted"}
+        )
+    assert "No tag, branch or commit deleted found for org/branch" in str(e.value)
+
+
+def test_refs_that_only_prefix_an_existing_ref_are_rejected():
+    gh = MockGithub(
+        {"twilio-labs/socless_python": ["1.2.0"]}, branches={"org/branch": ["master"]}
+    )
+    resolver = make_resolver(gh)
+
+    with pytest.raises(VersionUpdateException) as e:
+        resolver.resolve_update_versions(
+            "1.2", {"typo": "git+https://github.com/org/branch.git#mast"}
+        )
+    message = str(e.value)
+    assert "Tag 1.2 not found for twilio-labs/socless_python" in message
+    assert "No tag, branch or commit mast found for org/branch" in message
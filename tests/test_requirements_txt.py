@@ -1,8 +1,12 @@
 from .conftest import get_file_from_mock_repo
-from socless_repo_updater.constants import REQUIREMENTS_FULL_PATH
+from .mock_github import MockRepository
+from socless_repo_updater.constants import PACKAGE_JSON, REQUIREMENTS_FULL_PATH
 from socless_repo_updater.file_types.requirements_txt import (
+    get_requirements_update,
+    update_requirements,
     update_socless_python_in_requirements_txt,
 )
+from socless_repo_updater.updater import RepoUpdater
 
 
 def load_mock_requirements_txt() -> str:
@@ -19,3 +23,96 @@ def test_requirements_txt():
         "git+https://github.com/twilio-labs/socless_python.git@9.9.9#egg=socless"
         in modified_requirements_txt
     )
+
+
+def update(content: bytes, versions: dict):
+    return update_requirements(content, get_requirements_update(versions))
+
+
+def test_many_packages_are_updated_in_one_pass():
+    requirements_txt = (
+        b"# pinned deps\n"
+        b"requests==2.0.0  # http\n"
+        b"Boto3[crt] >=1.0,<2.0 ; python_version >= '3.7'\n"
+        b"-r ../requirements.txt\n"
+        b"unrelated==1.0\n"
+        b"-e git+https://github.com/org/my_lib.git@v1.0#egg=my-lib\n"
+        b"socless @ git+ssh://git@github.com/twilio-labs/socless_python.git@1.5.0\r\n"
+        b"simplejson\n"
+    )
+    new_requirements_txt, updated = update(
+        requirements_txt,
+        {
+            "requests": "2.31.0",
+            "boto3": "1.28.0",
+            "my-lib": "v2.0",
+            "socless": "9.9.9",
+            "SimpleJSON": "3.19.1",
+            "not-listed": "1.0",
+        },
+    )
+    assert new_requirements_txt == (
+        b"# pinned deps\n"
+        b"requests==2.31.0  # http\n"
+        b"Boto3[crt]==1.28.0 ; python_version >= '3.7'\n"
+        b"-r ../requirements.txt\n"
+        b"unrelated==1.0\n"
+        b"-e git+https://github.com/org/my_lib.git@v2.0#egg=my-lib\n"
+        b"socless @ git+ssh://git@github.com/twilio-labs/socless_python.git@9.9.9\r\n"
+        b"simplejson==3.19.1\n"
+    )
+    assert updated == ["requests", "boto3", "my-lib", "socless", "simplejson"]
+
+
+def test_unchanged_requirements_return_none():
+    requirements_txt = get_file_from_mock_repo(REQUIREMENTS_FULL_PATH).encode()
+    assert update(requirements_txt, {"requests": "2.31.0"}) is None
+    assert update(requirements_txt, {"socless": "1.5.0"}) is None
+
+    new_requirements_txt, updated = update(requirements_txt, {"socless": "9.9.9"})
+    assert new_requirements_txt.decode() == update_socless_python_in_requirements_txt(
+        requirements_txt, "9.9.9"
+    )
+    assert updated == ["socless"]
+
+
+def test_compiled_updates_are_shared():
+    assert get_requirements_update({"a": "1", "b": "2"}) is get_requirements_update(
+        {"b": "2", "a": "1"}
+    )
+
+
+def test_requirements_changes_update_every_requirements_file():
+    gh_repo = MockRepository()
+    function_requirements = "requests==2.0.0\n"
+    main = gh_repo.files_on("main")
+    gh_repo.branches["main"] = gh_repo._add_commit(
+        {
+            **main,
+            "functions/function_one/requirements.txt": function_requirements,
+            "functions/function_one/lambda_function.py": "",
+        }
+    )
+    repo_updater = RepoUpdater(gh_repo, "my-branch")
+    repo_updater.update_in_github(
+        requirements_changes={"socless": "9.9.9", "requests": "2.31.0"},
+        atomic_commit=True,
+    )
+
+    # the tree is listed once to find every requirements file
+    assert gh_repo.calls.count("get_git_tree") == 1
+    files = gh_repo.files_on("my-branch")
+    assert "socless_python.git@9.9.9#egg=socless" in files[REQUIREMENTS_FULL_PATH]
+    assert files["functions/function_one/requirements.txt"] == "requests==2.31.0\n"
+    assert files[PACKAGE_JSON] == main[PACKAGE_JSON]
+
+
+def test_socless_python_version_alone_does_not_list_the_tree():
+    gh_repo = MockRepository()
+    RepoUpdater(gh_repo, "my-branch").update_in_github(socless_python_version="9.9.9")
+
+    assert "get_git_tree" not in gh_repo.calls
+    assert (
+        "socless_python.git@9.9.9#egg=socless"
+        in gh_repo.files_on("my-branch")[REQUIREMENTS_FULL_PATH]
+    )
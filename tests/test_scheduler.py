@@ -0,0 +1,211 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from github import Github
+from socless_repo_updater.scheduler import RateLimitScheduler, make_budget_key
+from socless_repo_updater.transport import GithubTransport, TransportConfig
+from socless_repo_updater.utils import get_requester
+
+KEY = make_budget_key("api.github.com", "token abc")
+
+
+class MockClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_budget_key_does_not_contain_token():
+    host, token_id = make_budget_key("api.github.com", "token supersecret")
+    assert host == "api.github.com"
+    assert "supersecret" not in token_id
+    assert make_budget_key("api.github.com", None)[1] == "anonymous"
+
+
+def test_token_bucket_paces_after_burst():
+    scheduler = RateLimitScheduler(requests_per_second=2, burst=2, clock=MockClock())
+    assert scheduler.reserve(KEY) == 0
+    assert scheduler.reserve(KEY) == 0
+    assert scheduler.reserve(KEY) == 0.5
+    assert scheduler.reserve(KEY) == 1.0
+
+
+def test_exhausted_primary_budget_blocks_until_reset():
+    clock = MockClock()
+    scheduler = RateLimitScheduler(clock=clock)
+    headers = {
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": str(clock.now + 30),
+    }
+    assert scheduler.observe(KEY, 200, headers) is None
+    assert scheduler.reserve(KEY) == 30
+
+    delay = scheduler.observe(
+        KEY, 403, headers, '{"message": "API rate limit exceeded"}'
+    )
+    assert delay == 31
+    assert scheduler.budget()[f"{KEY[0]}/{KEY[1]}"]["remaining"] == 0
+
+
+def test_retry_after_and_secondary_limits_back_off():
+    clock = MockClock()
+    scheduler = RateLimitScheduler(secondary_backoff=10, clock=clock)
+    assert scheduler.observe(KEY, 429, {"Retry-After": "7"}) == 7
+    assert scheduler.reserve(KEY) == 7
+
+    body = '{"message": "You have exceeded a secondary rate limit"}'
+    assert scheduler.observe(KEY, 403, {}, body, attempt=0) == 10
+    assert scheduler.observe(KEY, 403, {}, body, attempt=2) == 40
+
+
+def test_permission_errors_and_exhausted_retries_are_not_retried():
+    scheduler = RateLimitScheduler(max_retries=1, clock=MockClock())
+    assert (
+        scheduler.observe(KEY, 403, {}, '{"message": "Must have admin rights"}') is None
+    )
+    assert scheduler.observe(KEY, 429, {"Retry-After": "1"}, attempt=1) is None
+
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_GET(self):
+        RateLimitedHandler.calls += 1
+        if RateLimitedHandler.calls == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"login": "octocat"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Remaining", "4999")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_transport_retries_rate_limited_pygithub_requests():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RateLimitedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        transport = GithubTransport()
+        gh = transport.install(
+            Github(
+                base_url=f"http://127.0.0.1:{server.server_port}", login_or_token="abc"
+            )
+        )
+        assert gh.get_user("octocat").login == "octocat"
+        assert RateLimitedHandler.calls == 2
+        (budget,) = transport.scheduler.budget().values()
+        assert budget["remaining"] == 4999
+        assert budget["throttled_responses"] == 1
+    finally:
+        server.shutdown()
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    accept_encodings = []
+    calls = 0
+
+    def do_GET(self):
+        KeepAliveHandler.calls += 1
+        KeepAliveHandler.accept_encodings.append(self.headers.get("Accept-Encoding"))
+        if KeepAliveHandler.calls == 1:
+            # e.g. a load balancer in front of GHE
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"login": "octocat"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_transport_reuses_pooled_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        transport = GithubTransport(
+            config=TransportConfig(host_pool_sizes={"127.0.0.1": 4}, retry_backoff=0)
+        )
+        gh = transport.install(
+            Github(
+                base_url=f"http://127.0.0.1:{server.server_port}", login_or_token="abc"
+            )
+        )
+        for _ in range(3):
+            assert gh.get_user("octocat").login == "octocat"
+
+        # the 503 was retried by the adapter, on the same connection
+        assert KeepAliveHandler.calls == 4
+        assert set(KeepAliveHandler.accept_encodings) == {"gzip, deflate"}
+        stats = transport.connection_stats()["127.0.0.1"]
+        assert stats["pool_maxsize"] == 4
+        assert stats["connections"] == 1
+        assert stats["reused"] == stats["requests"] - 1
+    finally:
+        server.shutdown()
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"login": self.path.rsplit("/", 1)[-1]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_transport_connections_are_not_shared_between_threads():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        # unpaced, so the requests actually overlap
+        scheduler = RateLimitScheduler(requests_per_second=1e6, burst=10**6)
+        gh = GithubTransport(scheduler).install(
+            Github(
+                base_url=f"http://127.0.0.1:{server.server_port}", login_or_token="abc"
+            )
+        )
+        requester = get_requester(gh)
+        assert (
+            requester._Requester__createConnection()
+            is not requester._Requester__createConnection()
+        )
+
+        mismatches = []
+
+        def get_users(worker):
+            for index in range(25):
+                login = f"user{worker}-{index}"
+                if gh.get_user(login).login != login:
+                    mismatches.append(login)
+
+        threads = [threading.Thread(target=get_users, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert mismatches == []
+    finally:
+        server.shutdown()
@@ -1,8 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
 from .conftest import get_file_from_mock_repo
 from socless_repo_updater.constants import SERVERLESS_YML
 from socless_repo_updater.file_types.serverless_yml import (
+    apply_serverless_yml_changes,
+    load_yaml,
     update_serverless_yml_content,
-    yaml,
 )
 
 
@@ -47,3 +50,102 @@ def load_mock_serverless_yml() -> str:
 
 #     assert modified_yaml["custom"]["sls_apb"]["new_key"] == "new_value"
 #     assert modified_yaml["custom"]["sls_apb"]["logging"] is True
+
+
+def changed_lines(before: str, after: str) -> list:
+    return [
+        (old, new)
+        for old, new in zip(before.splitlines(), after.splitlines())
+        if old != new
+    ]
+
+
+def test_scalar_changes_are_spliced_into_the_original_text():
+    serverless_yml = load_mock_serverless_yml()
+    new_serverless_yml = apply_serverless_yml_changes(
+        serverless_yml,
+        {
+            "provider": {"runtime": "python3.9", "timeout": 30},
+            "resources": {
+                "Resources": {
+                    "SoclessTemplateIntegrationTestcase": {
+                        "Properties": {"Type": "SecureString"}
+                    }
+                }
+            },
+        },
+    )
+
+    assert changed_lines(serverless_yml, new_serverless_yml) == [
+        ("  runtime: python3.7", "  runtime: python3.9"),
+        ("  timeout: 60", "  timeout: 30"),
+        (
+            "        Type: String # test case is stored in plaintext in github, so not using a securestring here. Do not use secrets in the test case",
+            "        Type: SecureString # test case is stored in plaintext in github, so not using a securestring here. Do not use secrets in the test case",
+        ),
+    ]
+
+
+def test_list_items_are_appended_in_place():
+    serverless_yml = load_mock_serverless_yml()
+    new_serverless_yml = apply_serverless_yml_changes(
+        serverless_yml, {"plugins": ["sls-apb", "new-plugin", "needs: quotes"]}
+    )
+
+    assert (
+        new_serverless_yml.replace('  - new-plugin\n  - "needs: quotes"\n', "")
+        == serverless_yml
+    )
+    assert load_yaml(new_serverless_yml)["plugins"][-1] == "needs: quotes"
+
+
+def test_quoted_values_keep_their_quotes():
+    serverless_yml = "a: \"old\" # keep\nb: 'it''s'\n"
+    new_serverless_yml = apply_serverless_yml_changes(
+        serverless_yml, {"a": "new", "b": "isn't"}
+    )
+    assert new_serverless_yml == "a: \"new\" # keep\nb: 'isn''t'\n"
+
+
+def test_unchanged_and_structural_changes():
+    serverless_yml = load_mock_serverless_yml()
+    assert (
+        apply_serverless_yml_changes(
+            serverless_yml, {"provider": {"runtime": "python3.7"}, "missing": 1}
+        )
+        is None
+    )
+    assert update_serverless_yml_content(serverless_yml, {"missing": 1}) == (
+        serverless_yml
+    )
+
+    new_serverless_yml = apply_serverless_yml_changes(
+        serverless_yml, {"custom": {"sls_apb": {"new_key": "new_value"}}}, add_keys=True
+    )
+    modified_yaml = load_yaml(new_serverless_yml)
+    assert modified_yaml["custom"]["sls_apb"]["new_key"] == "new_value"
+    assert modified_yaml["custom"]["sls_apb"]["logging"] is True
+
+
+def test_mismatched_types_are_rejected():
+    with pytest.raises(TypeError):
+        apply_serverless_yml_changes(load_mock_serverless_yml(), {"provider": "aws"})
+
+
+def test_changes_can_be_applied_from_many_threads():
+    serverless_yml = load_mock_serverless_yml()
+    expected = apply_serverless_yml_changes(
+        serverless_yml, {"provider": {"runtime": "python3.9"}, "new_key": "value"}, True
+    )
+
+    def apply(_):
+        return apply_serverless_yml_changes(
+            serverless_yml,
+            {"provider": {"runtime": "python3.9"}, "new_key": "value"},
+            True,
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(apply, range(32)))
+
+    assert results == [expected] * 32
@@ -0,0 +1,61 @@
+import json
+import threading
+from .mock_github import MockRepository
+from socless_repo_updater.tracing import NULL_TRACER, Tracer
+from socless_repo_updater.updater import RepoUpdater
+
+
+def test_spans_export_as_chrome_trace_events(tmp_path):
+    tracer = Tracer()
+    with tracer.span("outer", repo="org/a"):
+        with tracer.span("inner"):
+            pass
+
+    def work():
+        with tracer.span("other"):
+            pass
+
+    worker = threading.Thread(target=work, name="worker")
+    worker.start()
+    worker.join()
+
+    trace_path = tmp_path / "trace.json"
+    tracer.write(str(trace_path))
+    trace = json.loads(trace_path.read_text())
+
+    spans = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert set(spans) == {"outer", "inner", "other"}
+    assert spans["outer"]["args"] == {"repo": "org/a"}
+    assert spans["outer"]["ts"] <= spans["inner"]["ts"]
+    assert spans["outer"]["dur"] >= spans["inner"]["dur"]
+    thread_names = [e for e in trace["traceEvents"] if e["ph"] == "M"]
+    assert [e["args"]["name"] for e in thread_names] == ["MainThread", "worker"]
+    assert spans["other"]["tid"] != spans["outer"]["tid"]
+
+
+def test_null_tracer_records_nothing():
+    with NULL_TRACER.span("anything", repo="org/a"):
+        pass
+    assert NULL_TRACER.span("a") is NULL_TRACER.span("b")
+    assert NULL_TRACER.to_dict()["traceEvents"] == []
+
+
+def test_repo_updater_traces_each_phase():
+    tracer = Tracer()
+    repo_updater = RepoUpdater(MockRepository(), "my-branch", tracer=tracer)
+    repo_updater.update_in_github(
+        pj_deps={"serverless": "9.9.9"}, socless_python_version="9.9.9"
+    )
+
+    events = [e for e in tracer.to_dict()["traceEvents"] if e["ph"] == "X"]
+    assert [(e["name"], e["args"].get("path")) for e in events] == [
+        ("create_branch", None),
+        ("fetch_file", "package.json"),
+        ("fetch_file", "functions/requirements.txt"),
+        ("transform", "package.json"),
+        ("transform", "functions/requirements.txt"),
+        ("commit_file", "package.json"),
+        ("commit_file", "functions/requirements.txt"),
+        ("pr_lookup", None),
+    ]
+    assert {e["args"]["repo"] for e in events} == {"org/mock_socless_repo"}
@@ -0,0 +1,262 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from github import GithubException
+from .mock_github import MockRepository
+from socless_repo_updater import updater as updater_module
+from socless_repo_updater.constants import (
+    PACKAGE_JSON,
+    REQUIREMENTS_FULL_PATH,
+    SERVERLESS_YML,
+)
+from socless_repo_updater.exceptions import UpdaterError
+from socless_repo_updater.models import FileChange
+from socless_repo_updater.results import CallbackSink, JsonlSink, ResultSink
+from socless_repo_updater.updater import RepoUpdater, SoclessUpdater
+from socless_repo_updater.utils import commit_file_with_pr
+
+
+class MockGithub:
+    def get_repo(self, full_name):
+        return full_name
+
+
+class MockRepoUpdater:
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def __init__(self, gh_repo, head_branch="", **kwargs):
+        self.gh_repo = gh_repo
+        self.head_branch = head_branch
+        self.all_prs = [f"pr-{gh_repo}"]
+
+    def update_in_github(self, **kwargs):
+        if self.gh_repo.endswith("broken"):
+            raise ValueError("broken repo")
+        with MockRepoUpdater.lock:
+            MockRepoUpdater.in_flight += 1
+            MockRepoUpdater.max_in_flight = max(
+                MockRepoUpdater.max_in_flight, MockRepoUpdater.in_flight
+            )
+        time.sleep(0.01)
+        with MockRepoUpdater.lock:
+            MockRepoUpdater.in_flight -= 1
+
+    def report_pr_metrics(self):
+        return {"repo": self.gh_repo, "updated": True, "pr": self.all_prs[0]}
+
+
+class MockRepoMetadata:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.url = f"https://github.com/org/{name}"
+
+    def get_full_name(self):
+        return f"org/{self.name}"
+
+
+def make_repo_meta(name: str) -> MockRepoMetadata:
+    return MockRepoMetadata(name)
+
+
+def test_update_batch_is_bounded_and_collects_all_results(monkeypatch):
+    monkeypatch.setattr(updater_module, "RepoUpdater", MockRepoUpdater)
+    repos = [make_repo_meta(f"repo{i}") for i in range(20)]
+    repos.append(make_repo_meta("broken"))
+
+    socless_updater = SoclessUpdater()
+    socless_updater._update_batch(
+        repos,
+        lambda _: ("github.com", MockGithub()),
+        max_workers_per_host={"github.com": 4},
+        head_branch="my-branch",
+        update_kwargs={},
+    )
+
+    assert MockRepoUpdater.max_in_flight <= 4
+    assert len(socless_updater.metrics_for_all_repos) == 20
+    assert len(socless_updater.prs_for_all_repos) == 20
+    assert [meta.name for meta, _ in socless_updater.errors] == ["broken"]
+
+
+def test_repo_updater_commits_each_file_separately_by_default():
+    gh_repo = MockRepository()
+    repo_updater = RepoUpdater(gh_repo, "my-branch")
+    repo_updater.update_in_github(
+        pj_deps={"serverless": "9.9.9"}, socless_python_version="9.9.9"
+    )
+
+    assert gh_repo.calls.count("update_file") == 2
+    assert gh_repo.calls.count("get_pulls") == 1
+    assert gh_repo.calls.count("create_pull") == 1
+    assert '"serverless": "9.9.9"' in gh_repo.files_on("my-branch")[PACKAGE_JSON]
+    assert repo_updater.report_pr_metrics()["updated"] is True
+
+
+def test_repo_updater_atomic_commit_writes_one_commit():
+    gh_repo = MockRepository()
+    repo_updater = RepoUpdater(gh_repo, "my-branch")
+    repo_updater.update_in_github(
+        pj_deps={"serverless": "9.9.9"},
+        socless_python_version="9.9.9",
+        atomic_commit=True,
+    )
+
+    assert "update_file" not in gh_repo.calls
+    # one write: no tree, commit or ref requests
+    assert gh_repo.calls.count("create_commit_on_branch") == 1
+    assert "create_git_tree" not in gh_repo.calls
+    assert "edit_git_ref" not in gh_repo.calls
+    assert gh_repo.calls.count("create_pull") == 1
+    files = gh_repo.files_on("my-branch")
+    assert '"serverless": "9.9.9"' in files[PACKAGE_JSON]
+    assert "socless_python.git@9.9.9#egg=socless" in files[REQUIREMENTS_FULL_PATH]
+    assert files[SERVERLESS_YML] == gh_repo.files_on("main")[SERVERLESS_YML]
+
+
+def test_repo_updater_reuses_existing_pr_for_head_branch():
+    gh_repo = MockRepository()
+    gh_repo.create_pull("title", "body", base="main", head="other-branch")
+    existing_pr = gh_repo.create_pull("title", "body", base="main", head="my-branch")
+
+    repo_updater = RepoUpdater(gh_repo, "my-branch")
+    repo_updater.update_in_github(
+        pj_deps={"serverless": "9.9.9"}, socless_python_version="9.9.9"
+    )
+
+    assert gh_repo.calls.count("create_pull") == 2
+    assert repo_updater.all_prs == [existing_pr]
+
+
+def test_commit_file_with_pr_accepts_a_content_file():
+    gh_repo = MockRepository()
+    gh_file = gh_repo.get_contents(PACKAGE_JSON, ref="main")
+
+    pr = commit_file_with_pr(
+        gh_repo,
+        gh_file,
+        "{}",
+        PACKAGE_JSON,
+        head_branch="main",
+        default_branch="main",
+        commit_message="update package.json",
+    )
+
+    assert gh_repo.files_on("main")[PACKAGE_JSON] == "{}"
+    assert gh_repo.pulls == [pr]
+
+
+def test_optimistic_branch_creation_skips_the_head_branch_probe():
+    gh_repo = MockRepository()
+    repo_updater = RepoUpdater(gh_repo, "my-branch", optimistic_branch=True)
+    repo_updater.update_in_github(pj_deps={"serverless": "9.9.9"}, atomic_commit=True)
+
+    assert gh_repo.calls[:2] == ["get_branch", "create_git_ref"]
+    assert gh_repo.calls.count("get_branch") == 1
+    # the new branch's commit is known, so it isn't read back before committing
+    assert "get_git_ref" not in gh_repo.calls
+    assert "get_git_commit" not in gh_repo.calls
+    assert '"serverless": "9.9.9"' in gh_repo.files_on("my-branch")[PACKAGE_JSON]
+
+
+def test_optimistic_branch_creation_accepts_an_existing_branch():
+    gh_repo = MockRepository()
+    gh_repo.branches["my-branch"] = gh_repo.branches["main"]
+    repo_updater = RepoUpdater(gh_repo, "my-branch", optimistic_branch=True)
+    repo_updater.update_in_github(pj_deps={"serverless": "9.9.9"}, atomic_commit=True)
+
+    assert gh_repo.calls.count("create_git_ref") == 1
+    # the existing branch's commit is read once, before committing
+    assert gh_repo.calls.count("get_branch") == 2
+    assert '"serverless": "9.9.9"' in gh_repo.files_on("my-branch")[PACKAGE_JSON]
+
+
+def test_atomic_commit_refuses_a_head_branch_that_moved():
+    gh_repo = MockRepository()
+    repo_updater = RepoUpdater(gh_repo, "my-branch")
+    repo_updater._create_head_branch_if_nonexistent()
+    moved_sha = gh_repo._add_commit({"other.txt": "pushed meanwhile"})
+    gh_repo.branches["my-branch"] = moved_sha
+
+    change = FileChange(
+        path=PACKAGE_JSON,
+        base_sha="",
+        new_content="{}",
+        commit_message="update package.json",
+    )
+    with pytest.raises(UpdaterError):
+        repo_updater._commit_changes_atomically([change])
+    assert gh_repo.branches["my-branch"] == moved_sha
+
+
+def test_branch_errors_are_classified_by_status():
+    gh_repo = MockRepository()
+
+    def unavailable(branch):
+        raise GithubException(503, {"message": "Service Unavailable"}, {})
+
+    gh_repo.get_branch = unavailable
+    with pytest.raises(GithubException):
+        RepoUpdater(gh_repo, "my-branch")._create_head_branch_if_nonexistent()
+    assert "create_git_ref" not in gh_repo.calls
+
+    gh_repo = MockRepository()
+    with pytest.raises(GithubException):
+        # a 422 for anything but an existing ref is still an error
+        RepoUpdater(gh_repo, "my-branch")._create_head_branch("not-a-commit")
+    assert "my-branch" not in gh_repo.branches
+
+
+class MockPrRepoUpdater(MockRepoUpdater):
+    def __init__(self, gh_repo, head_branch="", **kwargs):
+        super().__init__(gh_repo, head_branch)
+        self.all_prs = [
+            SimpleNamespace(html_url=f"https://github.com/{gh_repo}/pull/1")
+        ]
+
+
+def test_iter_update_yields_results_as_repos_finish(monkeypatch, tmp_path):
+    monkeypatch.setattr(updater_module, "RepoUpdater", MockPrRepoUpdater)
+    monkeypatch.setattr(
+        updater_module,
+        "parse_repo_names",
+        lambda cli_repo_input: [make_repo_meta(name) for name in cli_repo_input],
+    )
+    jsonl_path = str(tmp_path / "results.jsonl")
+    called_back = []
+    socless_updater = SoclessUpdater(
+        result_sinks=[JsonlSink(jsonl_path), CallbackSink(called_back.append)]
+    )
+    monkeypatch.setattr(socless_updater, "get_or_init_github", lambda **_: MockGithub())
+
+    results = socless_updater.iter_update(["repo0", "repo1", "broken"], max_workers=2)
+    first = next(results)
+    assert first.url.startswith("https://github.com/org/")
+    results = [first, *results]
+
+    assert sorted(result.url for result in results) == [
+        "https://github.com/org/broken",
+        "https://github.com/org/repo0",
+        "https://github.com/org/repo1",
+    ]
+    (failed,) = [result for result in results if not result.ok]
+    assert failed.error == "broken repo" and not failed.updated
+    assert {result.pr_url for result in results if result.ok} == {
+        "https://github.com/org/repo0/pull/1",
+        "https://github.com/org/repo1/pull/1",
+    }
+    assert len(socless_updater.result_sinks) == 2
+    assert [result.repo for result in called_back] == [r.repo for r in results]
+    with open(jsonl_path) as f:
+        assert [json.loads(line)["repo"] for line in f] == [r.repo for r in results]
+
+
+def test_result_sinks_must_implement_emit():
+    class NoEmitSink(ResultSink):
+        pass
+
+    with pytest.raises(TypeError):
+        NoEmitSink()